@@ -1,44 +1,131 @@
+import asyncio
 from typing import List
 from fastapi import APIRouter, Depends
 from services.ticker_categories_crud import get_ticker_categories
 from services.stock_analyzer import StockRequest, analyze_stock
 from models.tickerScores import TickerScore
-from services.ticker_score_crud import create_ticker_score, delete_old_ticker_scores, get_ticker_scores, soft_delete_ticker_score
-from services.scores import add_ticker_to_file_and_db, calculate_ticker_scores_multiframe
-from services.ticker import fetch_yahoo_data
+from services.ticker_score_crud import create_ticker_score, delete_old_ticker_scores, get_ticker_scores, upsert_ticker_scores, soft_delete_ticker_score, ticker_scores_to_columns, ticker_scores_to_float64_columns
+from services.scores import add_ticker_to_file_and_db, calculate_ticker_scores_multiframe, load_score_batches, load_ticker_info, load_tickers, score_record, score_ticker_batch
+from services.ticker import COMPACT_FRAME_INTERVALS, SQUEEZE_LABELS, build_ticker_frame, fetch_yahoo_data, serialize_ticker_frame, serialize_ticker_frame_columnar, ticker_frame_columns
 import pandas as pd
-from fastapi import HTTPException
-import yfinance as yf #type: ignore
+import orjson
+from fastapi import Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from database import get_db
 from sqlalchemy.orm import Session
 from requests import request
 from datetime import datetime, timedelta
 from database import SessionLocal
 from services.tradeBook_crud import get_trades
-from schemas.tradeBook_schema import backTestCreate
+from schemas.tradeBook_schema import backTestCreate, backTestPortfolio, backTestSweep
 from services.analyze_data import back_test_the_stock
+from services.backtest import INDICATOR_SIGNALS, SWEEP_MAX_COMBINATIONS, SWEEP_RANK_KEYS, portfolio_backtest, sweep_backtests
 # Import the function from the original script
 from services.dashboard import get_stock_data
+from services.resample import validate_derived
+from services.score_history import MAX_HISTORY_POINTS, aligned_score_history, as_utc, score_history
+from utils.binary_encoding import ARROW_STREAM, FLOAT64_BUFFERS, arrow_response, float64_buffers_response, negotiate_binary
+from utils.memory import MemoryProbe, frame_memory_report
+from utils.metrics import metrics
+from utils.single_flight import SingleFlight
+from utils.executors import CPU_WORKERS, EndpointLimit, run_cpu, run_io
+from utils.streaming import EVENT_STREAM, encode_stream_item, negotiate_stream
 
 router = APIRouter()
 
+# How many requests of each heavy endpoint may run at once; the rest queue.
+ticker_scores_limit = EndpointLimit('ticker_scores', 1)
+single_ticker_score_limit = EndpointLimit('single_ticker_score', 2)
+back_test_limit = EndpointLimit('back_test', 2)
+back_test_sweep_limit = EndpointLimit('back_test_sweep', 1)
+back_test_portfolio_limit = EndpointLimit('back_test_portfolio', 1)
+analyze_limit = EndpointLimit('analyze', 4)
+
+data_flight = SingleFlight('data')
+stock_data_flight = SingleFlight('stock_data')
+
+def _data_response(ticker, interval, ema_period, vwap_period, vwap_std_dev, shape, compact):
+    if shape != 'rows':
+        data = build_ticker_frame(ticker, interval, ema_period=ema_period, vwap_period=vwap_period, vwap_std_dev=vwap_std_dev, compact=compact)
+        if shape == ARROW_STREAM:
+            return arrow_response(ticker_frame_columns(data), dictionaries={'ttm_waves.squeeze': SQUEEZE_LABELS})
+        if shape == FLOAT64_BUFFERS:
+            return float64_buffers_response(
+                ticker_frame_columns(data),
+                headers={'X-Squeeze-Labels': ','.join(SQUEEZE_LABELS)}
+            )
+        return Response(
+            content=orjson.dumps(serialize_ticker_frame_columnar(data), option=orjson.OPT_SERIALIZE_NUMPY),
+            media_type='application/json'
+        )
+
+    candlestick_data, macd_data, vwap_signals, ttm_waves_data, ttm_squeeze_signals = fetch_yahoo_data(
+        ticker, interval, ema_period=ema_period, vwap_period=vwap_period, vwap_std_dev=vwap_std_dev, compact=compact
+    )
+    return {
+        'candlestick': candlestick_data,
+        # 'ema': ema_data,
+        'macd': macd_data,
+        # 'vwap': vwap_data,
+        'vwap_signals': vwap_signals,
+        'ttm_waves':ttm_waves_data,
+        'ttm_squeeze_signals': ttm_squeeze_signals
+    }
+
 @router.get('/data/{ticker}/{interval}/{ema_period}/{vwap_period}/{vwap_std_dev}')
-def get_data(ticker: str, interval: str, ema_period: int, vwap_period: int, vwap_std_dev: float):
+def get_data(ticker: str, interval: str, ema_period: int, vwap_period: int, vwap_std_dev: float, format: str = 'rows', compact: bool = None, accept: str = Header(None)):
     try:
-        candlestick_data, macd_data, vwap_signals, ttm_waves_data, ttm_squeeze_signals = fetch_yahoo_data(
-            ticker, interval, ema_period=ema_period, vwap_period=vwap_period, vwap_std_dev=vwap_std_dev
+        if compact is None:
+            compact = interval in COMPACT_FRAME_INTERVALS
+        shape = negotiate_binary(accept) or ('columnar' if format == 'columnar' else 'rows')
+        # Identical requests arriving together (a market open with many tabs
+        # on the same symbol) share one download and pipeline run.
+        key = (ticker, interval, ema_period, vwap_period, vwap_std_dev, shape, compact)
+        return data_flight.do(
+            key,
+            lambda: _data_response(ticker, interval, ema_period, vwap_period, vwap_std_dev, shape, compact)
         )
+    except Exception as e:
+        print(f"Error in get_data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.get('/data-memory/{ticker}/{interval}/{ema_period}/{vwap_period}/{vwap_std_dev}')
+def get_data_memory(ticker: str, interval: str, ema_period: int, vwap_period: int, vwap_std_dev: float):
+    # Bytes per column of the full and compact frames for one chart request,
+    # plus what building and serializing it did to the process, to choose
+    # COMPACT_FRAME_INTERVALS from.
+    try:
+        with MemoryProbe() as full_probe:
+            data = build_ticker_frame(ticker, interval, ema_period=ema_period, vwap_period=vwap_period, vwap_std_dev=vwap_std_dev)
+            serialize_ticker_frame(data)
+        full_report = frame_memory_report(data)
+        del data
+
+        with MemoryProbe() as compact_probe:
+            compact = build_ticker_frame(ticker, interval, ema_period=ema_period, vwap_period=vwap_period, vwap_std_dev=vwap_std_dev, compact=True)
+            serialize_ticker_frame(compact)
         return {
-            'candlestick': candlestick_data,
-            # 'ema': ema_data,
-            'macd': macd_data,
-            # 'vwap': vwap_data,
-            'vwap_signals': vwap_signals,
-            'ttm_waves':ttm_waves_data,
-            'ttm_squeeze_signals': ttm_squeeze_signals
+            'ticker': ticker,
+            'interval': interval,
+            'compact_default': interval in COMPACT_FRAME_INTERVALS,
+            'full': {**full_report, 'request': full_probe.report()},
+            'compact': {**frame_memory_report(compact), 'request': compact_probe.report()},
         }
     except Exception as e:
-        print(f"Error in get_data: {str(e)}")
+        print(f"Error in get_data_memory: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.get('/resample-check/{ticker}/{interval}')
+def get_resample_check(ticker: str, interval: str, days: int = 30):
+    # How bars built locally for a derived interval compare with the ones
+    # Yahoo serves, to decide what goes in DERIVED_INTERVALS.
+    try:
+        end_date = datetime.now()
+        return validate_derived([ticker], interval, end_date - timedelta(days=days), end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in get_resample_check: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 # @router.get('/symbols')
@@ -47,45 +134,175 @@ def get_data(ticker: str, interval: str, ema_period: int, vwap_period: int, vwap
 #         symbols = [line.strip() for line in f]
 #     return symbols
 
+def _run_back_test(stockname, interval, quantity, indicator):
+    # The back test is a coroutine full of blocking DB calls; it gets its own
+    # loop on an I/O thread instead of holding up the server's.
+    return asyncio.run(back_test_the_stock(stockname, interval, quantity, indicator))
+
 @router.post('/back-test')
 async def analyze_the_stock(request: backTestCreate):
     try:
-        await back_test_the_stock(request.stockname, request.interval, request.quantity, request.indicator)
+        async with back_test_limit:
+            await run_io(_run_back_test, request.stockname, request.interval, request.quantity, request.indicator)
         return HTTPException(status_code=200, detail=f"Back test done...")
     except Exception as e:
         print(e)
         return HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+def _check_sweep(request):
+    grids = {
+        'tickers': request.tickers, 'intervals': request.intervals, 'indicators': request.indicators,
+        'stoploss_pcts': request.stoploss_pcts, 'target_pcts': request.target_pcts, 'quantities': request.quantities,
+    }
+    for name, values in grids.items():
+        if not values:
+            raise HTTPException(status_code=400, detail=f"{name} must not be empty")
+    unknown = [indicator for indicator in request.indicators if indicator not in INDICATOR_SIGNALS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown indicators: {', '.join(unknown)}. Must be one of: {', '.join(INDICATOR_SIGNALS)}")
+    if request.rank_by not in SWEEP_RANK_KEYS:
+        raise HTTPException(status_code=400, detail=f"rank_by must be one of: {', '.join(SWEEP_RANK_KEYS)}")
+    if min(request.stoploss_pcts) <= 0 or min(request.target_pcts) <= 0 or min(request.quantities) <= 0:
+        raise HTTPException(status_code=400, detail="Stoploss %, target % and quantity must be positive")
+    if request.limit is not None and request.limit <= 0:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    combinations = 1
+    for values in grids.values():
+        combinations *= len(values)
+    if combinations > SWEEP_MAX_COMBINATIONS:
+        raise HTTPException(status_code=400, detail=f"{combinations} combinations requested; at most {SWEEP_MAX_COMBINATIONS} allowed")
+
+@router.post('/back-test/sweep')
+async def sweep_back_tests(request: backTestSweep):
+    # Ranked summary of every grid combination; no trades are written.
+    _check_sweep(request)
+    try:
+        async with back_test_sweep_limit:
+            return await sweep_backtests(
+                list(dict.fromkeys(request.tickers)), list(dict.fromkeys(request.intervals)), list(dict.fromkeys(request.indicators)),
+                list(dict.fromkeys(request.stoploss_pcts)), list(dict.fromkeys(request.target_pcts)), list(dict.fromkeys(request.quantities)),
+                rank_by=request.rank_by, limit=request.limit
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.post('/back-test/portfolio')
+async def portfolio_back_test(request: backTestPortfolio):
+    # One pool of capital over many tickers (tickers.txt unless given); nothing
+    # is written to trade_book.
+    if request.indicator not in INDICATOR_SIGNALS:
+        raise HTTPException(status_code=400, detail=f"indicator must be one of: {', '.join(INDICATOR_SIGNALS)}")
+    if request.initial_capital <= 0 or request.max_positions <= 0 or request.position_pct <= 0:
+        raise HTTPException(status_code=400, detail="initial_capital, max_positions and position_pct must be positive")
+    if request.stoploss_pct <= 0 or request.target_pct <= 0:
+        raise HTTPException(status_code=400, detail="Stoploss % and target % must be positive")
+    try:
+        tickers = list(dict.fromkeys(request.tickers or load_tickers('tickers.txt')[0]))
+        async with back_test_portfolio_limit:
+            return await portfolio_backtest(
+                tickers, request.interval, request.indicator, request.initial_capital,
+                request.max_positions, request.position_pct, request.stoploss_pct, request.target_pct
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
 @router.get("/trades")
 def fetch_trades(db: Session = Depends(get_db)):
     return get_trades(db)
 
+@router.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
 @router.get("/stock-data/{ticker}")
 def get_stock_info(ticker: str):
     try:
-        stock_data = get_stock_data(ticker)
+        stock_data = stock_data_flight.do(ticker, lambda: get_stock_data(ticker))
         return stock_data
     except Exception as e:
         print(f"Error in get_stock_info: {str(e)}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
     
+def _store_ticker_scores(db, scores_df, results):
+    stored_scores = upsert_ticker_scores(db, results)
+    trends = {row['ticker_symbol']: row['score_change_trend'] for row in stored_scores}
+    scores_df['score_change_trend'] = scores_df['ticker_symbol'].map(trends)
+    return stored_scores
+
+def _store_score_results(results):
+    # Persists one streamed batch with its own session; the request's session
+    # is closed before a streaming body starts.
+    db = SessionLocal()
+    try:
+        trends = {row['ticker_symbol']: row['score_change_trend'] for row in upsert_ticker_scores(db, results)}
+        for result in results:
+            result['score_change_trend'] = trends.get(result['ticker_symbol'])
+    finally:
+        db.close()
+
+async def _score_batch_job(ticker_batch, ticker_names, ticker_categories, use_cache):
+    # Ticker info comes from this process's fundamentals cache, the scores
+    # from the process pool.
+    ticker_info = await run_io(load_ticker_info, ticker_batch)
+    return await run_cpu(score_ticker_batch, ticker_batch, ticker_names, ticker_categories, use_cache=use_cache, ticker_info=ticker_info)
+
+async def _stream_ticker_scores(media_type, store_scores, use_cache):
+    # Each batch is scored in the process pool (a few ahead of the one being
+    # sent), stored, written out and dropped, so memory doesn't grow with the
+    # ticker list. Results come out in tickers.txt order.
+    async with ticker_scores_limit:
+        pending = []
+        try:
+            ticker_batches, ticker_names, ticker_categories = await run_io(load_score_batches)
+            if media_type == EVENT_STREAM:
+                yield encode_stream_item(media_type, {'batches': len(ticker_batches)}, event='start')
+            sent = 0
+            next_batch = 0
+            while next_batch < len(ticker_batches) or pending:
+                while next_batch < len(ticker_batches) and len(pending) < CPU_WORKERS:
+                    pending.append(asyncio.ensure_future(
+                        _score_batch_job(ticker_batches[next_batch], ticker_names, ticker_categories, use_cache)
+                    ))
+                    next_batch += 1
+                results = await pending.pop(0)
+                if store_scores:
+                    await run_io(_store_score_results, results)
+                for result in results:
+                    yield encode_stream_item(media_type, score_record(result), event='score')
+                sent += len(results)
+                del results
+            if media_type == EVENT_STREAM:
+                yield encode_stream_item(media_type, {'tickers': sent}, event='done')
+        except Exception as e:
+            # The status line is long gone; report the failure in the stream.
+            print(f"Error streaming ticker scores: {str(e)}")
+            yield encode_stream_item(media_type, {'error': str(e)}, event='error')
+        finally:
+            for future in pending:
+                future.cancel()
+
 @router.post("/ticker-scores")
 async def create_ticker_scores(
     db: Session = Depends(get_db),
-    store_scores: bool = True
+    store_scores: bool = True,
+    stream: str = None,
+    use_cache: bool = True,
+    accept: str = Header(None)
 ):
     try:
-        scores_df, results = calculate_ticker_scores_multiframe()
- 
-        if store_scores:
-            stored_scores = []
+        # ?stream=ndjson|sse (or the matching Accept) sends each ticker as soon
+        # as its batch is scored instead of one body at the end.
+        media_type = negotiate_stream(accept, stream)
+        if media_type is not None:
+            return StreamingResponse(_stream_ticker_scores(media_type, store_scores, use_cache), media_type=media_type)
 
-            for result in results:
-                stored_score = create_ticker_score(db, result)
-                stored_scores.append(stored_score)
+        async with ticker_scores_limit:
+            ticker_batches, _, _ = await run_io(load_score_batches)
+            ticker_info = await run_io(load_ticker_info, [ticker for ticker_batch in ticker_batches for ticker in ticker_batch])
+            scores_df, results = await run_cpu(calculate_ticker_scores_multiframe, use_cache=use_cache, ticker_info=ticker_info)
 
-                ticker_idx = scores_df[scores_df['ticker_symbol'] == result['ticker_symbol']].index[0]
-                scores_df.at[ticker_idx, 'score_change_trend'] = stored_score.score_change_trend
+            if store_scores:
+                await run_io(_store_ticker_scores, db, scores_df, results)
         
         return scores_df.to_dict(orient='records')
     
@@ -95,14 +312,56 @@ async def create_ticker_scores(
 @router.get("/stored-ticker-scores")
 def retrieve_stored_ticker_scores(
     db: Session = Depends(get_db),
-    ticker_symbol: str = None
+    ticker_symbol: str = None,
+    accept: str = Header(None)
 ):
     try:
         stored_scores = get_ticker_scores(db, ticker_symbol)
+
+        binary = negotiate_binary(accept)
+        if binary == ARROW_STREAM:
+            return arrow_response(ticker_scores_to_columns(stored_scores))
+        if binary == FLOAT64_BUFFERS:
+            return float64_buffers_response(
+                ticker_scores_to_float64_columns(stored_scores),
+                headers={'X-Tickers': ','.join(score.ticker_symbol for score in stored_scores)}
+            )
         return stored_scores
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+def _check_history_range(start, end):
+    if start is not None and end is not None and as_utc(start) > as_utc(end):
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+@router.get("/ticker-scores/history")
+def retrieve_ticker_score_history_bulk(
+    symbols: List[str] = Query(...),
+    start: datetime = Query(None, alias="from"),
+    end: datetime = Query(None, alias="to"),
+    max_points: int = Query(500, ge=1, le=MAX_HISTORY_POINTS),
+    db: Session = Depends(get_db)
+):
+    _check_history_range(start, end)
+    try:
+        return aligned_score_history(db, list(dict.fromkeys(symbols)), start, end, max_points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.get("/ticker-scores/{symbol}/history")
+def retrieve_ticker_score_history(
+    symbol: str,
+    start: datetime = Query(None, alias="from"),
+    end: datetime = Query(None, alias="to"),
+    max_points: int = Query(500, ge=1, le=MAX_HISTORY_POINTS),
+    db: Session = Depends(get_db)
+):
+    _check_history_range(start, end)
+    try:
+        return score_history(db, symbol, start, end, max_points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
 @router.delete("/clean-old-ticker-scores")
 def clean_old_ticker_scores(
     db: Session = Depends(get_db),
@@ -121,57 +380,62 @@ async def calculate_single_ticker_score(
     db: Session = Depends(get_db)
 ):
     try:
-        valid_category_ids = {1, 2, 3, 4, 5} 
-        if category_id not in valid_category_ids:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Invalid category ID. Must be one of: {', '.join(map(str, valid_category_ids))}"
-            )
+        async with single_ticker_score_limit:
+            valid_category_ids = {1, 2, 3, 4, 5} 
+            if category_id not in valid_category_ids:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid category ID. Must be one of: {', '.join(map(str, valid_category_ids))}"
+                )
             
-        existing_score = db.query(TickerScore).filter(
-            TickerScore.ticker_symbol == ticker_symbol
-        ).first()
-        
-        if existing_score:
-            return HTTPException(
-                status_code=400, 
-                detail=f"Ticker {ticker_symbol} already exists in database"
+            existing_score = await run_io(
+                lambda: db.query(TickerScore).filter(TickerScore.ticker_symbol == ticker_symbol).first()
             )
-
-        # Pass the db session to the function
-        was_added, message = add_ticker_to_file_and_db(
-            ticker=ticker_symbol, 
-            category_id=category_id,
-            db=db
-        )
         
-        if not was_added and "already exists" not in message:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Failed to add ticker: {message}"
-            )
+            if existing_score:
+                return HTTPException(
+                    status_code=400, 
+                    detail=f"Ticker {ticker_symbol} already exists in database"
+                )
 
-        scores_df, results = calculate_ticker_scores_multiframe(
-            single_ticker=ticker_symbol,
-            category_id=category_id
-        )
+            # Pass the db session to the function
+            was_added, message = await run_io(
+                add_ticker_to_file_and_db,
+                ticker=ticker_symbol, 
+                category_id=category_id,
+                db=db
+            )
         
-        if not results:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"No data found for ticker {ticker_symbol}"
+            if not was_added and "already exists" not in message:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Failed to add ticker: {message}"
+                )
+
+            ticker_info = await run_io(load_ticker_info, [ticker_symbol])
+            scores_df, results = await run_cpu(
+                calculate_ticker_scores_multiframe,
+                single_ticker=ticker_symbol,
+                category_id=category_id,
+                ticker_info=ticker_info
             )
+        
+            if not results:
+                raise HTTPException(
+                    status_code=404, 
+                    detail=f"No data found for ticker {ticker_symbol}"
+                )
 
-        stored_score = create_ticker_score(db, results[0]) if was_added else None
+            stored_score = await run_io(create_ticker_score, db, results[0]) if was_added else None
         
-        response = {**results[0]}
-        if stored_score:
-            response.update({
-                'score_change_trend': stored_score.score_change_trend,
-                'created_at': stored_score.created_at
-            })
+            response = {**results[0]}
+            if stored_score:
+                response.update({
+                    'score_change_trend': stored_score.score_change_trend,
+                    'created_at': stored_score.created_at
+                })
             
-        return response
+            return response
         
     except Exception as e:
         raise HTTPException(
@@ -201,7 +465,8 @@ def soft_delete_ticker(
 @router.post("/analyze")
 async def analyze_endpoint(request: StockRequest):
     try:
-        return analyze_stock(request.ticker)
+        async with analyze_limit:
+            return await run_io(analyze_stock, request.ticker)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
@@ -0,0 +1,76 @@
+"""
+Time a scoring run's writes through upsert_ticker_scores against the old path,
+create_ticker_score once per ticker, on a SQLite file:
+
+    python benchmarks/bench_score_writes.py [--tickers 100 500 2000] [--repeats 3]
+
+Each run writes a day's scores twice (a fresh day, then the same day again, so
+both the inserts and the updates are timed) and counts the statements and
+commits each path sends.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# database.py needs a URL to import; the runs use their own engines.
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from database import Base
+import models.latestTickerScores, models.symbols, models.tickerScores, models.ticker_categories, models.tradeBook # noqa: F401
+from services.ticker_score_crud import create_ticker_score, upsert_ticker_scores
+
+def create_loop(db, results):
+    return [create_ticker_score(db, result) for result in results]
+
+# name -> writer of one run's results
+WRITERS = {
+    'upsert': upsert_ticker_scores,
+    'create loop': create_loop,
+}
+
+def results_for(tickers, created_at):
+    return [
+        {'ticker_symbol': f'T{index:05d}', 'ticker_name': f'Ticker {index}', 'long_score': index % 7, 'short_score': -(index % 5),
+         'd_score': 1.0, 'w_score': 2.0, 'current_price': 10.0 + index, 'created_at': created_at}
+        for index in range(tickers)
+    ]
+
+def timed_run(writer, tickers, directory):
+    engine = create_engine(f"sqlite:///{os.path.join(directory, f'{writer.__name__}_{tickers}.db')}")
+    Base.metadata.create_all(engine)
+    counts = {'statements': 0, 'commits': 0}
+    event.listen(engine, 'before_cursor_execute', lambda *args: counts.__setitem__('statements', counts['statements'] + 1))
+    event.listen(engine, 'commit', lambda *args: counts.__setitem__('commits', counts['commits'] + 1))
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    day = datetime(2024, 6, 3, 14, tzinfo=timezone.utc)
+    started = time.perf_counter()
+    try:
+        writer(db, results_for(tickers, day))
+        writer(db, results_for(tickers, day + timedelta(hours=2)))
+    finally:
+        db.close()
+        engine.dispose()
+    return time.perf_counter() - started, counts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tickers', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'writer':<14}{'tickers':>9}{'ms':>10}{'statements':>12}{'commits':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for tickers in args.tickers:
+            for name, writer in WRITERS.items():
+                runs = [timed_run(writer, tickers, directory) for _ in range(args.repeats)]
+                seconds, counts = min(runs, key=lambda run: run[0])
+                print(f"{name:<14}{tickers:>9}{seconds * 1000:>10.1f}{counts['statements']:>12}{counts['commits']:>9}")
+
+if __name__ == '__main__':
+    main()
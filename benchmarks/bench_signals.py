@@ -0,0 +1,74 @@
+"""
+Time the array kernels in services/ticker.py against the per-row reference
+loops they replaced, on synthetic bars:
+
+    python benchmarks/bench_signals.py [--bars 1000 10000 100000] [--reference-max-bars N]
+
+The reference loops take minutes at 100k bars; --reference-max-bars skips
+them above that size.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ticker import (
+    calculate_rsi_exit_signals, calculate_rsi_exit_signals_reference,
+    calculate_yellow_cross_signals, calculate_yellow_cross_signals_reference,
+)
+
+# name -> (kernel, per-row reference)
+SIGNALS = {
+    'yellow_cross': (calculate_yellow_cross_signals, calculate_yellow_cross_signals_reference),
+    'rsi_exit': (calculate_rsi_exit_signals, calculate_rsi_exit_signals_reference),
+}
+
+def synthetic_frame(bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    series = pd.Series(close)
+    change = series.diff()
+    gain = change.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-change.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    macd = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+    return pd.DataFrame({
+        'Close': close,
+        'Open': close * np.exp(rng.normal(0, 0.007, bars)),
+        'RSI': (100 - 100 / (1 + gain / loss)).to_numpy(),
+        'MACDh_12_26_9': (macd - macd.ewm(span=9, adjust=False).mean()).to_numpy(),
+    }, index=pd.date_range('2015-01-02', periods=bars, freq='15min', tz='UTC'))
+
+def best_of(fn, data, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        frame = data.copy()
+        started = time.perf_counter()
+        fn(frame)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bars', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--reference-max-bars', type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'signal':<14}{'bars':>8}{'kernel ms':>12}{'reference ms':>15}{'speedup':>10}")
+    for name, (kernel, reference) in SIGNALS.items():
+        for bars in args.bars:
+            data = synthetic_frame(bars)
+            kernel_seconds = best_of(kernel, data, 5)
+            if bars <= args.reference_max_bars:
+                reference_seconds = best_of(reference, data, 1)
+                reference_ms = f'{reference_seconds * 1000:.1f}'
+                speedup = f'{reference_seconds / kernel_seconds:.0f}x'
+            else:
+                reference_ms = speedup = '-'
+            print(f'{name:<14}{bars:>8}{kernel_seconds * 1000:>12.3f}{reference_ms:>15}{speedup:>10}')
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,13 @@ from websocket import ConnectionManager
 from fastapi.middleware.cors import CORSMiddleware
 from urllib.parse import urlencode
 from api.router import router
+from utils.executors import run_io, shutdown_executors
+from services.ticker_score_crud import SCORE_RETENTION_DAYS, SCORE_RETENTION_INTERVAL_MINUTES, delete_old_ticker_scores
 import asyncio
 # import uvloop  # Import uvloop
 from apscheduler.schedulers.asyncio import AsyncIOScheduler #type: ignore
 from apscheduler.jobstores.memory import MemoryJobStore #type: ignore
-from database import engine, Base
+from database import engine, Base, SessionLocal
 
 # Set UVLoop as the event loop policy BEFORE any other imports or operations
 # asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
@@ -34,6 +36,7 @@ async def lifespan(app: FastAPI):
     seed_database()
     scheduler.start()
     yield
+    shutdown_executors()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -69,6 +72,22 @@ async def websocket_endpoint(websocket: WebSocket):
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
+def prune_ticker_scores():
+    db = SessionLocal()
+    try:
+        return delete_old_ticker_scores(db, SCORE_RETENTION_DAYS)
+    finally:
+        db.close()
+
+# Retention runs here instead of after every score write.
+@scheduler.scheduled_job('interval', minutes=SCORE_RETENTION_INTERVAL_MINUTES, id='prune_ticker_scores')
+async def scheduled_prune_ticker_scores():
+    try:
+        deleted = await run_io(prune_ticker_scores)
+        print(f"Pruned {deleted} ticker scores older than {SCORE_RETENTION_DAYS} days")
+    except Exception as e:
+        print(f"Error pruning ticker scores: {e}")
+
 # @scheduler.scheduled_job('interval', seconds=60 * 15)
 # async def scheduled_job_2():
 #     result = await fetch_and_analyze_data(manager,"15m")
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from database import Base
+
+class LatestTickerScore(Base):
+    # The newest ticker_scores row of each ticker, same columns (id is that
+    # row's id), kept current by the score writes in the same transaction.
+    # GET /stored-ticker-scores reads this instead of grouping the history.
+    __tablename__ = 'latest_ticker_scores'
+
+    ticker_symbol = Column(String, primary_key=True)
+    id = Column(Integer, nullable=False)
+    ticker_name = Column(String)
+    is_deleted = Column(Boolean, default=False)
+
+    w_score = Column(Integer, nullable=True)
+    w_squeeze = Column(String, nullable=True)
+    d_score = Column(Integer, nullable=True)
+    d_squeeze = Column(String, nullable=True)
+    five_d_score = Column(Integer, nullable=True)
+    five_d_squeeze = Column(String, nullable=True)
+    one_h_score = Column(Integer, nullable=True)
+    one_h_squeeze = Column(String, nullable=True)
+    ninety_m_score = Column(Integer, nullable=True)
+    ninety_m_squeeze = Column(String, nullable=True)
+    thirty_m_score = Column(Integer, nullable=True)
+    thirty_m_squeeze = Column(String, nullable=True)
+    fifteen_m_score = Column(Integer, nullable=True)
+    fifteen_m_squeeze = Column(String, nullable=True)
+
+    long_score = Column(Integer, nullable=True)
+    short_score = Column(Integer, nullable=True)
+    long_rank = Column(String, nullable=True)
+    short_rank = Column(String, nullable=True)
+    trend = Column(String, nullable=True)
+    score_change_trend = Column(String, nullable=True)
+    current_price = Column(Float, nullable=True)
+    sector = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True))
+    score_date = Column(Date, nullable=True)
+
+    category_id = Column(Integer, ForeignKey('ticker_categories.id'))
+    category = relationship("TickerCategory")
+
+# The dashboard's listing: live tickers, newest first.
+Index(
+    'ix_latest_ticker_scores_live_created_at',
+    LatestTickerScore.created_at,
+    postgresql_where=LatestTickerScore.is_deleted == False,
+    sqlite_where=LatestTickerScore.is_deleted == False,
+)
@@ -1,10 +1,13 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 
 class TickerScore(Base):
     __tablename__ = 'ticker_scores'
+    # One row per ticker per day (date(created_at) as the database reads it);
+    # bulk writes upsert on it.
+    __table_args__ = (UniqueConstraint('ticker_symbol', 'score_date', name='uq_ticker_scores_ticker_date'),)
 
     id = Column(Integer, primary_key=True, index=True)
     ticker_symbol = Column(String, index=True)
@@ -35,7 +38,18 @@ class TickerScore(Base):
     current_price = Column(Float, nullable=True)
     sector = Column(String, nullable=True)
 
-    created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc), index=True)
+    score_date = Column(Date, nullable=True)
 
     category_id = Column(Integer, ForeignKey('ticker_categories.id'))
-    category = relationship("TickerCategory")
\ No newline at end of file
+    category = relationship("TickerCategory")
+
+# Per-ticker history in time order: previous-score lookups and history reads.
+# On PostgreSQL it also carries the history columns, so score history is read
+# from the index alone.
+Index(
+    'ix_ticker_scores_history',
+    TickerScore.ticker_symbol,
+    TickerScore.created_at,
+    postgresql_include=['long_score', 'short_score', 'is_deleted']
+)
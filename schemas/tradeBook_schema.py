@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 # Schema for creating a new trade (with optional fields)
 class TradebookCreate(BaseModel):
@@ -29,4 +29,24 @@ class backTestCreate(BaseModel):
     interval: str
     quantity: int
     indicator: str
-    
\ No newline at end of file
+    
+
+class backTestSweep(BaseModel):
+    tickers: List[str]
+    intervals: List[str] = ["15m"]
+    indicators: List[str] = ["TTM"]
+    stoploss_pcts: List[float] = [10]
+    target_pcts: List[float] = [30]
+    quantities: List[int] = [100]
+    rank_by: str = "pnl"
+    limit: Optional[int] = None
+
+class backTestPortfolio(BaseModel):
+    tickers: Optional[List[str]] = None
+    interval: str = "15m"
+    indicator: str = "TTM"
+    initial_capital: float = 100000
+    max_positions: int = 10
+    position_pct: float = 10
+    stoploss_pct: float = 10
+    target_pct: float = 30
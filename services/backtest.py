@@ -0,0 +1,530 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pytz
+from sqlalchemy.orm import Session
+from models.tradeBook import Tradebook
+from services.ticker import build_ticker_frame, serialize_ticker_frame_columnar
+from services.trades import calculate_percentage
+from utils.executors import run_cpu
+from utils.metrics import metrics
+
+# Section of serialize_ticker_frame_columnar and the flags in it that make an
+# up / down signal for each indicator back_test_the_stock trades on.
+INDICATOR_SIGNALS = {
+    'TTM': ('ttm_squeeze_signals', ('squeeze_signal_up', 'ripster_signal_up'), ('squeeze_signal_down', 'ripster_signal_down')),
+    'Ripster': ('vwap_signals', ('ripster_signal_up',), ('ripster_signal_down',)),
+}
+DEFAULT_STOPLOSS_PCT = 10
+DEFAULT_TARGET_PCT = 30
+# Parameter sweeps: combinations per process-pool task, and the most one
+# request may ask for.
+SWEEP_CHUNK_SIZE = int(os.environ.get('BACKTEST_SWEEP_CHUNK_SIZE', '64'))
+SWEEP_MAX_COMBINATIONS = int(os.environ.get('BACKTEST_SWEEP_MAX_COMBINATIONS', '20000'))
+SWEEP_RANK_KEYS = {
+    'pnl': lambda row: -row['pnl'],
+    'win_rate': lambda row: -row['win_rate'],
+    'max_drawdown': lambda row: row['max_drawdown'],
+    'trades': lambda row: -row['trades'],
+}
+
+# Per trade type, as in services/trades.py: which signal opens and which closes
+# it, whether the opening signal's pass runs first in a bar (SignalUp is
+# handled before SignalDown), and the remark a closing signal leaves.
+SIDES = {
+    'long': {'opens': 'up', 'closes': 'down', 'open_first': True, 'remarks': "Signal Up detected."},
+    'short': {'opens': 'down', 'closes': 'up', 'open_first': False, 'remarks': "Signal Down detected."},
+}
+
+def frame_signals(data, indicator):
+    # (epoch seconds, close prices, up, down) arrays of a ticker frame, or
+    # None for an indicator with no signals.
+    if indicator not in INDICATOR_SIGNALS:
+        return None
+    section, up_flags, down_flags = INDICATOR_SIGNALS[indicator]
+    columns = serialize_ticker_frame_columnar(data)
+    signals = columns[section]
+    up = np.logical_or.reduce([signals[name] for name in up_flags])
+    down = np.logical_or.reduce([signals[name] for name in down_flags])
+    return columns['time'], np.asarray(signals['price'], dtype='float64'), up, down
+
+def backtest_signals(stockname, interval, indicator):
+    return frame_signals(build_ticker_frame(stockname, interval), indicator)
+
+def _epoch(value):
+    # Trade times from SQLite come back naive; they are UTC.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _new_trade(side, entry_time, price, quantity, stoploss_pct, target_pct):
+    sign = 1 if side == 'long' else -1
+    return {
+        'tradetype': side,
+        'entry_price': price,
+        'entry_time': entry_time,
+        'stoploss': round(price + calculate_percentage(price, -sign * stoploss_pct)),
+        'target': round(price + calculate_percentage(price, sign * target_pct)),
+        'quantity': quantity,
+        'capital': quantity * round(price, 2),
+        'exit_price': "--",
+        'exit_time': None,
+        'pnl': "--",
+        'ROI': None,
+        'profit': None,
+        'remarks': None,
+        'status': "Ongoing",
+    }
+
+def _seeded_trade(record):
+    # An Ongoing trade_book row as a simulation trade; numbers stay in their
+    # stored (string) form until a close reads them, as in services/trades.py.
+    trade = {name: getattr(record, name) for name in (
+        'tradetype', 'entry_price', 'stoploss', 'target', 'quantity', 'capital',
+        'exit_price', 'exit_time', 'pnl', 'ROI', 'profit', 'remarks', 'status'
+    )}
+    trade['entry_time'] = _epoch(record.entry_time)
+    trade['record'] = record
+    return trade
+
+def _close(trade, exit_time, price, remarks):
+    entry_price = float(trade['entry_price'])
+    pnl = round(price - entry_price, 2) if trade['tradetype'] == 'long' else round(entry_price - price, 2)
+    roi = float(trade['quantity']) * pnl
+    trade.update(
+        exit_price=price,
+        exit_time=exit_time,
+        pnl=pnl,
+        ROI=roi,
+        profit=str(round((roi / float(trade['capital'])) * 100, 2)) + "%",
+        status="Closed",
+        remarks=remarks,
+    )
+
+def _exit_remarks(trade, price):
+    # What process_*_sl_target does with an Ongoing trade at this price.
+    target = float(trade['target'])
+    stoploss = float(trade['stoploss'])
+    if trade['tradetype'] == 'long':
+        if price >= target:
+            return "Target achieved."
+        if price <= stoploss:
+            return "Stoploss triggered."
+    else:
+        if price <= target:
+            return "Target achieved."
+        if price >= stoploss:
+            return "Stoploss triggered."
+    return None
+
+def _exit_mask(trade, prices, closes, times):
+    target = float(trade['target'])
+    stoploss = float(trade['stoploss'])
+    if trade['tradetype'] == 'long':
+        hit = (prices >= target) | (prices <= stoploss)
+    else:
+        hit = (prices <= target) | (prices >= stoploss)
+    return hit | (closes & (times >= trade['entry_time']))
+
+def _first(mask):
+    index = int(np.argmax(mask)) if len(mask) else 0
+    return index if len(mask) and mask[index] else None
+
+def simulate_side(side, times, prices, up, down, quantity, stoploss_pct=DEFAULT_STOPLOSS_PCT, target_pct=DEFAULT_TARGET_PCT, open_trade=None, taken_times=()):
+    """
+    Replay back_test_the_stock's rules for one trade type over the signal
+    arrays without touching the database. open_trade is the Ongoing trade
+    carried in, taken_times the entry times (epoch seconds) this indicator
+    already has a trade for. Only bars where something can happen are
+    visited: the next opening signal while flat, the next stoploss, target or
+    closing signal while in a trade. Returns every trade touched, open_trade
+    first when it closed; times are epoch seconds.
+    """
+    rules = SIDES[side]
+    opens = up if rules['opens'] == 'up' else down
+    closes = down if rules['closes'] == 'down' else up
+    taken = set(taken_times)
+    free = opens & ~np.isin(times, list(taken)) if taken else opens
+    stages = ('open', 'close') if rules['open_first'] else ('close', 'open')
+
+    trades = []
+    trade = open_trade
+    position = 0
+    while position < len(times):
+        if trade is None:
+            offset = _first(free[position:])
+        else:
+            offset = _first(_exit_mask(trade, prices[position:], closes[position:], times[position:]))
+        if offset is None:
+            break
+        bar = position + offset
+        bar_time = times[bar].item()
+        price = prices[bar].item()
+
+        if trade is not None:
+            remarks = _exit_remarks(trade, price)
+            if remarks:
+                _close(trade, bar_time, price, remarks)
+                trade = None
+        for stage in stages:
+            if stage == 'open' and opens[bar] and trade is None and bar_time not in taken:
+                trade = _new_trade(side, bar_time, price, quantity, stoploss_pct, target_pct)
+                trades.append(trade)
+                taken.add(bar_time)
+            elif stage == 'close' and closes[bar] and trade is not None and bar_time >= trade['entry_time']:
+                _close(trade, bar_time, price, rules['remarks'])
+                trade = None
+        position = bar + 1
+
+    if open_trade is not None and open_trade['status'] == "Closed":
+        return [open_trade] + trades
+    return trades
+
+def _trade_time(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, tz=pytz.UTC) if epoch_seconds is not None else None
+
+def run_backtest(db: Session, stockname, interval, quantity, indicator, times, prices, up, down, stoploss_pct=DEFAULT_STOPLOSS_PCT, target_pct=DEFAULT_TARGET_PCT):
+    # Simulates both trade types in memory, carrying in the Ongoing back test
+    # trades already in trade_book, then writes the result with one bulk
+    # insert and one commit. Returns the new trades.
+    started = time.perf_counter()
+    ongoing = (
+        db.query(Tradebook)
+        .filter_by(stockname=stockname, status="Ongoing", back_testing=True, interval=interval)
+        .order_by(Tradebook.id)
+        .all()
+    )
+    taken_times = {'long': set(), 'short': set()}
+    if len(times):
+        for tradetype, entry_time in (
+            db.query(Tradebook.tradetype, Tradebook.entry_time)
+            .filter_by(stockname=stockname, back_testing=True, interval=interval, indicator=indicator)
+            .filter(Tradebook.entry_time >= _trade_time(times[0].item()), Tradebook.entry_time <= _trade_time(times[-1].item()))
+        ):
+            if tradetype in taken_times:
+                taken_times[tradetype].add(_epoch(entry_time))
+
+    new_trades = []
+    closed = 0
+    for side in SIDES:
+        record = next((trade for trade in ongoing if trade.tradetype == side), None)
+        open_trade = _seeded_trade(record) if record is not None else None
+        for trade in simulate_side(side, times, prices, up, down, quantity, stoploss_pct, target_pct, open_trade, taken_times[side]):
+            closed += trade['status'] == "Closed"
+            if 'record' in trade:
+                record = trade['record']
+                for name in ('exit_price', 'pnl', 'ROI', 'profit', 'remarks', 'status'):
+                    setattr(record, name, trade[name])
+                record.exit_time = _trade_time(trade['exit_time'])
+            else:
+                new_trades.append(trade)
+
+    # Row order of the per-bar loop: by entry, a bar's long before its short.
+    new_trades.sort(key=lambda trade: (trade['entry_time'], trade['tradetype'] != 'long'))
+    rows = [
+        {
+            **{name: value for name, value in trade.items() if name not in ('entry_time', 'exit_time')},
+            'stockname': stockname,
+            'entry_time': _trade_time(trade['entry_time']),
+            'exit_time': _trade_time(trade['exit_time']),
+            'indicator': indicator,
+            'back_testing': True,
+            'interval': interval,
+        }
+        for trade in new_trades
+    ]
+    db.bulk_insert_mappings(Tradebook, rows)
+    db.commit()
+
+    seconds = time.perf_counter() - started
+    metrics.observe('backtest.seconds', seconds)
+    print(f"Back test {stockname} {interval} {indicator}: {len(times)} bars, {len(rows)} new trades, {closed} closed in {seconds:.3f}s")
+    return rows
+
+def summarize_trades(trades):
+    # Realized PnL, win rate (%), max drawdown of the realized PnL curve in
+    # exit order, and closed / still open trade counts.
+    closed = sorted((trade for trade in trades if trade['status'] == "Closed"), key=lambda trade: trade['exit_time'])
+    roi = np.array([trade['ROI'] for trade in closed], dtype='float64')
+    equity = np.concatenate(([0.0], np.cumsum(roi)))
+    return {
+        'pnl': round(float(roi.sum()), 2),
+        'win_rate': round(float((roi > 0).mean()) * 100, 2) if len(roi) else 0.0,
+        'max_drawdown': round(float((np.maximum.accumulate(equity) - equity).max()), 2),
+        'trades': len(closed),
+        'open_trades': len(trades) - len(closed),
+    }
+
+def sweep_signals(ticker, interval, indicators):
+    # One ticker frame per (ticker, interval), whatever the number of
+    # indicators and parameter combinations swept over it.
+    data = build_ticker_frame(ticker, interval)
+    return {indicator: frame_signals(data, indicator) for indicator in indicators}
+
+def sweep_combinations(signals, combinations):
+    # [(stoploss_pct, target_pct, quantity)] over one signal set; nothing is
+    # written to trade_book.
+    summaries = []
+    for stoploss_pct, target_pct, quantity in combinations:
+        trades = []
+        for side in SIDES:
+            trades.extend(simulate_side(side, *signals, quantity, stoploss_pct, target_pct))
+        summaries.append({
+            'stoploss_pct': stoploss_pct,
+            'target_pct': target_pct,
+            'quantity': quantity,
+            **summarize_trades(trades),
+        })
+    return summaries
+
+async def sweep_backtests(tickers, intervals, indicators, stoploss_pcts, target_pcts, quantities, rank_by='pnl', limit=None):
+    """
+    Back test every combination of the grids on the CPU process pool and
+    return them ranked by rank_by. Signals are computed once per (ticker,
+    interval); the combinations are then simulated in chunks of
+    SWEEP_CHUNK_SIZE against those arrays.
+    """
+    started = time.perf_counter()
+    pairs = list(itertools.product(tickers, intervals))
+    signal_sets = await asyncio.gather(
+        *(run_cpu(sweep_signals, ticker, interval, indicators) for ticker, interval in pairs),
+        return_exceptions=True
+    )
+
+    errors = []
+    tasks = []
+    labels = []
+    grid = list(itertools.product(stoploss_pcts, target_pcts, quantities))
+    for (ticker, interval), signals in zip(pairs, signal_sets):
+        if isinstance(signals, Exception):
+            errors.append({'ticker': ticker, 'interval': interval, 'error': str(signals)})
+            continue
+        for indicator in indicators:
+            if signals[indicator] is None:
+                continue
+            for start in range(0, len(grid), SWEEP_CHUNK_SIZE):
+                tasks.append(run_cpu(sweep_combinations, signals[indicator], grid[start:start + SWEEP_CHUNK_SIZE]))
+                labels.append({'ticker': ticker, 'interval': interval, 'indicator': indicator})
+
+    results = [
+        {**label, **summary}
+        for label, summaries in zip(labels, await asyncio.gather(*tasks))
+        for summary in summaries
+    ]
+    results.sort(key=SWEEP_RANK_KEYS[rank_by])
+    for rank, row in enumerate(results, 1):
+        row['rank'] = rank
+
+    seconds = time.perf_counter() - started
+    metrics.observe('backtest.sweep_seconds', seconds)
+    print(f"Swept {len(results)} back tests over {len(pairs)} ticker/interval pairs in {seconds:.2f}s")
+    return {
+        'combinations': len(results),
+        'results': results[:limit] if limit else results,
+        'errors': errors,
+    }
+
+def _ticker_book(ticker, times, prices, up, down):
+    return {
+        'ticker': ticker,
+        'times': times,
+        'prices': prices,
+        # Prices positions are marked at; a missing close keeps the last one.
+        'marks': pd.Series(prices).ffill().to_numpy(),
+        'up': up,
+        'down': down,
+        'signals': up | down,
+        'long': None,
+        'short': None,
+        'pnl': 0.0,
+        'trades': 0,
+    }
+
+def _next_event(book, start):
+    # The ticker's next bar at or after start where anything can happen: any
+    # signal (it may open a trade), or a stoploss, target or closing signal
+    # of a trade it holds.
+    mask = book['signals'][start:]
+    for side in SIDES:
+        trade = book[side]
+        if trade is not None:
+            closes = book['down'] if SIDES[side]['closes'] == 'down' else book['up']
+            mask = mask | _exit_mask(trade, book['prices'][start:], closes[start:], book['times'][start:])
+    offset = _first(mask)
+    return None if offset is None else start + offset
+
+def simulate_portfolio(signal_sets, initial_capital, max_positions, position_pct, stoploss_pct=DEFAULT_STOPLOSS_PCT, target_pct=DEFAULT_TARGET_PCT):
+    """
+    Trade many tickers from one pool of cash. signal_sets is [(ticker,
+    (times, prices, up, down))] in priority order. Every ticker's stream of
+    bars is merged into one time-ordered heap; a ticker's next bar is pushed
+    when its current one is done, so only bars where something can happen are
+    visited. Bars run by the back test's rules. A new trade is sized to
+    position_pct of initial_capital and is skipped when max_positions are open
+    or the cash isn't there. A closing signal on a bar with no close exits at
+    the ticker's latest close; no trade is opened there. Equity is sampled
+    after every event time and at every bar of a ticker with an open trade in
+    between, open trades marked at their ticker's latest close, so drawdowns
+    between events are counted.
+    """
+    books = [_ticker_book(ticker, *signals) for ticker, signals in signal_sets]
+    allocation = initial_capital * position_pct / 100
+    cash = float(initial_capital)
+    open_trades = {}
+    closed = []
+    rejected = {'max_positions': 0, 'capital': 0, 'size': 0}
+    curve = {'time': [], 'equity': [], 'cash': [], 'open_positions': []}
+    events = 0
+
+    def close(book, side, bar_time, price, remarks):
+        nonlocal cash
+        trade = book[side]
+        _close(trade, bar_time, price, remarks)
+        cash += trade['capital'] + trade['ROI']
+        book['pnl'] += trade['ROI']
+        book['trades'] += 1
+        book[side] = None
+        del open_trades[(book['ticker'], side)]
+        closed.append(trade)
+
+    def open_trade(book, side, bar_time, price):
+        nonlocal cash
+        if np.isnan(price):
+            # No close on this bar to enter at.
+            return
+        if len(open_trades) >= max_positions:
+            rejected['max_positions'] += 1
+            return
+        quantity = int(allocation // price) if price > 0 else 0
+        if quantity < 1:
+            rejected['size'] += 1
+            return
+        trade = _new_trade(side, bar_time, price, quantity, stoploss_pct, target_pct)
+        if trade['capital'] > cash:
+            rejected['capital'] += 1
+            return
+        cash -= trade['capital']
+        trade['ticker'] = book['ticker']
+        book[side] = trade
+        open_trades[(book['ticker'], side)] = (book, trade)
+
+    def sample(at):
+        value = cash
+        for book, trade in open_trades.values():
+            mark = book['marks'][np.searchsorted(book['times'], at, side='right') - 1]
+            move = mark - float(trade['entry_price'])
+            value += trade['capital'] + trade['quantity'] * (move if trade['tradetype'] == 'long' else -move)
+        curve['time'].append(at)
+        curve['equity'].append(round(float(value), 2))
+        curve['cash'].append(round(cash, 2))
+        curve['open_positions'].append(len(open_trades))
+
+    def sample_held(until):
+        # Bars of tickers with an open trade after the last sample and before
+        # until (to the end of their data for None): nothing trades there, but
+        # the marks move the equity.
+        after = curve['time'][-1] if curve['time'] else None
+        stamps = set()
+        for book, _ in open_trades.values():
+            times = book['times']
+            first = 0 if after is None else np.searchsorted(times, after, side='right')
+            last = len(times) if until is None else np.searchsorted(times, until, side='left')
+            stamps.update(times[first:last].tolist())
+        for at in sorted(stamps):
+            sample(at)
+
+    queue = []
+    for order, book in enumerate(books):
+        bar = _next_event(book, 0)
+        if bar is not None:
+            queue.append((book['times'][bar].item(), order, bar))
+    heapq.heapify(queue)
+
+    current_time = None
+    while queue:
+        bar_time, order, bar = heapq.heappop(queue)
+        if bar_time != current_time:
+            sample_held(bar_time)
+            current_time = bar_time
+        book = books[order]
+        price = book['prices'][bar].item()
+        # What a closing signal exits at: the close, or the latest one before it.
+        exit_price = book['marks'][bar].item()
+        events += 1
+
+        for side in SIDES:
+            if book[side] is not None:
+                remarks = _exit_remarks(book[side], price)
+                if remarks:
+                    close(book, side, bar_time, price, remarks)
+        if book['up'][bar]:
+            if book['short'] is not None and bar_time >= book['short']['entry_time']:
+                close(book, 'short', bar_time, exit_price, SIDES['short']['remarks'])
+            if book['long'] is None:
+                open_trade(book, 'long', bar_time, price)
+        if book['down'][bar]:
+            if book['short'] is None:
+                open_trade(book, 'short', bar_time, price)
+            if book['long'] is not None and bar_time >= book['long']['entry_time']:
+                close(book, 'long', bar_time, exit_price, SIDES['long']['remarks'])
+
+        following = _next_event(book, bar + 1)
+        if following is not None:
+            heapq.heappush(queue, (book['times'][following].item(), order, following))
+        if not queue or queue[0][0] != bar_time:
+            sample(bar_time)
+    sample_held(None)
+
+    equity = np.array(curve['equity']) if curve['equity'] else np.array([float(initial_capital)])
+    peaks = np.maximum.accumulate(np.concatenate(([float(initial_capital)], equity)))[1:]
+    drawdowns = peaks - equity
+    worst = int(np.argmax(drawdowns))
+    roi = np.array([trade['ROI'] for trade in closed], dtype='float64')
+    return {
+        'tickers': len(books),
+        'bars': int(sum(len(book['times']) for book in books)),
+        'events': events,
+        'initial_capital': float(initial_capital),
+        'final_equity': round(float(equity[-1]), 2),
+        'return_pct': round((float(equity[-1]) / initial_capital - 1) * 100, 2),
+        'realized_pnl': round(float(roi.sum()), 2),
+        'max_drawdown': round(float(drawdowns[worst]), 2),
+        'max_drawdown_pct': round(float(drawdowns[worst] / peaks[worst]) * 100, 2) if peaks[worst] else 0.0,
+        'trades': len(closed),
+        'open_trades': len(open_trades),
+        'win_rate': round(float((roi > 0).mean()) * 100, 2) if len(roi) else 0.0,
+        'rejected': rejected,
+        'equity_curve': curve,
+        'per_ticker': sorted(
+            ({'ticker': book['ticker'], 'pnl': round(book['pnl'], 2), 'trades': book['trades']} for book in books if book['trades']),
+            key=lambda row: -row['pnl']
+        ),
+    }
+
+async def portfolio_backtest(tickers, interval, indicator, initial_capital, max_positions, position_pct, stoploss_pct=DEFAULT_STOPLOSS_PCT, target_pct=DEFAULT_TARGET_PCT):
+    # Signals for every ticker in parallel on the CPU process pool, then one
+    # portfolio simulation over all of them.
+    started = time.perf_counter()
+    signal_sets = await asyncio.gather(
+        *(run_cpu(sweep_signals, ticker, interval, [indicator]) for ticker in tickers),
+        return_exceptions=True
+    )
+    errors = []
+    ready = []
+    for ticker, signals in zip(tickers, signal_sets):
+        if isinstance(signals, Exception):
+            errors.append({'ticker': ticker, 'error': str(signals)})
+        elif signals[indicator] is not None:
+            ready.append((ticker, signals[indicator]))
+    signals_seconds = time.perf_counter() - started
+
+    result = await run_cpu(simulate_portfolio, ready, initial_capital, max_positions, position_pct, stoploss_pct, target_pct)
+    seconds = time.perf_counter() - started
+    metrics.observe('backtest.portfolio_seconds', seconds)
+    print(f"Portfolio back test over {len(ready)} tickers: signals {signals_seconds:.2f}s, total {seconds:.2f}s")
+    return {**result, 'errors': errors}
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+PYRAMID_RULES = ('1min', '5min', '15min', '60min')
+MAX_PYRAMIDS = 256
+
+_pyramids = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+class BarPyramid:
+    # Last close per resample bin for each rule, the same values
+    # Close.resample(rule).last() gives, but keyed only by the bins that hold a
+    # bar. New bars only recompute the bins from the last stored bar onward;
+    # a window whose earlier closes differ from the stored ones is rebuilt.
+    def __init__(self, rules=PYRAMID_RULES):
+        self.rules = rules
+        self.levels = {}
+        self.origin = None
+        self.first_time = None
+        self.last_time = None
+        self.closes = None
+        self.last_key = None
+        self.last_aligned = None
+        self.lock = threading.Lock()
+
+    def _labels(self, index, rule):
+        # resample's default origin is midnight of the first day; any midnight
+        # gives the same bins for rules that divide an hour.
+        freq = pd.Timedelta(rule)
+        return self.origin + ((index - self.origin) // freq) * freq
+
+    def _last_per_bin(self, close, rule):
+        close = close.dropna()
+        return close.groupby(self._labels(close.index, rule)).last()
+
+    def _rebuild(self, close):
+        self.origin = close.index[0].normalize()
+        self.levels = {rule: self._last_per_bin(close, rule) for rule in self.rules}
+
+    def _revised(self, close):
+        # Whether a bar before the last stored one differs from what was
+        # stored: a late correction to an earlier bar, or a bar filled in.
+        start = max(close.index[0], self.first_time)
+        stored = self.closes[(self.closes.index >= start) & (self.closes.index < self.last_time)]
+        return not close[(close.index >= start) & (close.index < self.last_time)].equals(stored)
+
+    def extend(self, close):
+        if close.empty:
+            return
+        if (
+            self.last_time is None
+            or close.index.tz != self.origin.tz
+            or close.index[0] < self.first_time
+            or self._revised(close)
+        ):
+            self._rebuild(close)
+        else:
+            # The last stored bar may have been a partial one, so redo its bin.
+            for rule in self.rules:
+                start = self._labels(pd.DatetimeIndex([self.last_time]), rule)[0]
+                kept = self.levels[rule]
+                kept = kept[(kept.index < start) & (kept.index >= self._labels(close.index[:1], rule)[0])]
+                self.levels[rule] = pd.concat([kept, self._last_per_bin(close[close.index >= start], rule)])
+        self.first_time = close.index[0]
+        self.last_time = close.index[-1]
+        self.closes = close.copy()
+
+    def aligned(self, close):
+        # {rule: resampled close placed on close's index and forward filled},
+        # what assigning Close.resample(rule).last() into the frame and ffilling
+        # it used to produce.
+        if close.empty:
+            return {rule: pd.Series(index=close.index, dtype=float) for rule in self.rules}
+        # A checksum of the closes, so a window with a revised earlier bar is
+        # not answered from the last call.
+        key = (close.index[0], close.index[-1], len(close), hash(close.to_numpy().tobytes()))
+        with self.lock:
+            if key != self.last_key:
+                self.extend(close)
+                self.last_aligned = {rule: level.reindex(close.index).ffill() for rule, level in self.levels.items()}
+                self.last_key = key
+            return {rule: level.copy() for rule, level in self.last_aligned.items()}
+
+def get_bar_pyramid(ticker, interval):
+    key = (ticker, interval)
+    with _pyramids_lock:
+        pyramid = _pyramids.get(key)
+        if pyramid is None:
+            pyramid = _pyramids[key] = BarPyramid()
+            if len(_pyramids) > MAX_PYRAMIDS:
+                _pyramids.popitem(last=False)
+        else:
+            _pyramids.move_to_end(key)
+        return pyramid
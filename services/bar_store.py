@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from services.market_data import get_market_data, join_download, split_download, to_index_time
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking on Windows; threads are still serialized.
+    fcntl = None
+
+# Local copy of downloaded OHLCV bars, one directory per (interval, ticker) with
+# one raw little-endian file per column plus meta.json. Reads memory-map the
+# files under the key's lock and hand back frames over the mapped window without
+# copying; refreshes download only the bars from the last stored one onward.
+# A file is never modified in place: every write goes to a temporary file that
+# is renamed over the old one, so a frame read earlier keeps its own mapping of
+# the old file and never changes underneath its holder. BAR_STORE_DIR= (empty)
+# turns the store off.
+BAR_STORE_DIR = os.environ.get('BAR_STORE_DIR', '.bar_store')
+BAR_STORE_REFRESH_SECONDS = float(os.environ.get('BAR_STORE_REFRESH_SECONDS', '30'))
+
+def market_data_source(tickers, interval, start, end):
+    return get_market_data().download(tickers, start=start, end=end, interval=interval, progress=False)
+
+class _KeyLock:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.handle = None
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.handle = open(self.path, 'a')
+            fcntl.flock(self.handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+        self.lock.release()
+        return False
+
+class BarStore:
+    def __init__(self, root=BAR_STORE_DIR, source=market_data_source, refresh_seconds=BAR_STORE_REFRESH_SECONDS):
+        # source(tickers, interval, start, end) returns what yf.download would.
+        self.root = root
+        self.source = source
+        self.refresh_seconds = refresh_seconds
+        self.locks = {}
+        self.locks_guard = threading.Lock()
+
+    def _path(self, ticker, interval):
+        return os.path.join(self.root, interval, ticker)
+
+    def _lock(self, ticker, interval):
+        key = (ticker, interval)
+        with self.locks_guard:
+            if key not in self.locks:
+                self.locks[key] = _KeyLock(os.path.join(self._path(ticker, interval), '.lock'))
+            return self.locks[key]
+
+    def _meta(self, path):
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # A column shorter than the recorded row count means an interrupted
+        # write; treat the entry as missing so it gets rebuilt.
+        for name, dtype in [('__time__', 'int64'), *meta['columns']]:
+            try:
+                size = os.path.getsize(os.path.join(path, name + '.bin'))
+            except OSError:
+                return None
+            if size < meta['rows'] * np.dtype(dtype).itemsize:
+                return None
+        return meta
+
+    def _write_meta(self, path, meta):
+        temporary = os.path.join(path, 'meta.json.tmp')
+        with open(temporary, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temporary, os.path.join(path, 'meta.json'))
+
+    def _map(self, path, name, dtype, rows):
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(path, name + '.bin'), dtype=np.dtype(dtype).newbyteorder('<'), mode='r', shape=(rows,))
+
+    def _write_columns(self, path, arrays):
+        for name, values in arrays:
+            temporary = os.path.join(path, name + '.bin.tmp')
+            np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<')).tofile(temporary)
+            os.replace(temporary, os.path.join(path, name + '.bin'))
+
+    def _write_full(self, path, frame, window_start):
+        os.makedirs(path, exist_ok=True)
+        columns = [(str(name), frame[name].to_numpy().dtype.str.lstrip('<>|=')) for name in frame.columns]
+        self._write_columns(path, [('__time__', frame.index.as_unit('ns').asi8)] + [(name, frame[name].to_numpy()) for name, _ in columns])
+        meta = {
+            'rows': len(frame),
+            'columns': columns,
+            'tz': str(frame.index.tz) if frame.index.tz is not None else None,
+            'index_name': frame.index.name,
+            'window_start': pd.Timestamp(window_start).isoformat(),
+            'fetched_at': time.time(),
+        }
+        self._write_meta(path, meta)
+        return meta
+
+    def _splice(self, path, meta, times, columns):
+        # Replaces everything from the first tail bar onward (the last stored
+        # bar is usually still forming) and appends the rest, as new files.
+        stored = self._map(path, '__time__', 'int64', meta['rows'])
+        position = int(np.searchsorted(stored, times[0], side='left'))
+        arrays = []
+        for name, dtype, values in [('__time__', 'int64', times)] + [(name, dtype, columns[name]) for name, dtype in meta['columns']]:
+            kept = self._map(path, name, dtype, meta['rows'])[:position]
+            arrays.append((name, np.concatenate([kept, np.asarray(values, dtype=dtype)])))
+        del stored, kept
+        self._write_columns(path, arrays)
+        meta = {**meta, 'rows': position + len(times), 'fetched_at': time.time()}
+        self._write_meta(path, meta)
+        return meta
+
+    def _tail_columns(self, meta, tail):
+        # The tail as arrays in the stored dtypes, or None when it can't be
+        # written in place (new columns, another timezone, NaN volume...).
+        tz = str(tail.index.tz) if tail.index.tz is not None else None
+        if tz != meta['tz'] or set(map(str, tail.columns)) != {name for name, _ in meta['columns']}:
+            return None
+        columns = {}
+        for name, dtype in meta['columns']:
+            values = tail[name].to_numpy()
+            if values.dtype != np.dtype(dtype):
+                # A batch download turns an int Volume into float; take it back
+                # when that loses nothing.
+                with np.errstate(invalid='ignore'):
+                    cast = values.astype(dtype)
+                if not np.array_equal(cast, values):
+                    return None
+                values = cast
+            columns[name] = values
+        return columns
+
+    def _plan(self, meta, start):
+        # 'full' when nothing usable is stored or the window reaches further back
+        # than what was fetched, 'tail' when the refresh interval has passed.
+        if meta is None or meta['rows'] == 0 or pd.Timestamp(start) < pd.Timestamp(meta['window_start']):
+            return 'full'
+        if time.time() - meta['fetched_at'] >= self.refresh_seconds:
+            return 'tail'
+        return None
+
+    def _last_time(self, path, meta):
+        stored = self._map(path, '__time__', 'int64', meta['rows'])
+        last = pd.Timestamp(int(stored[-1]))
+        return last.tz_localize('UTC').tz_convert(meta['tz']) if meta['tz'] else last
+
+    def _store(self, ticker, interval, meta, frame, start, full):
+        path = self._path(ticker, interval)
+        if frame is None or frame.empty:
+            if meta is not None:
+                # Nothing new (market closed); just note that we looked.
+                meta = {**meta, 'fetched_at': time.time()}
+                self._write_meta(path, meta)
+            return meta
+        if full or meta is None:
+            return self._write_full(path, frame, start)
+        columns = self._tail_columns(meta, frame)
+        if columns is None:
+            stored = self._frame(path, meta)
+            merged = pd.concat([stored[stored.index < frame.index[0]], frame])
+            return self._write_full(path, merged, meta['window_start'])
+        return self._splice(path, meta, frame.index.as_unit('ns').asi8, columns)
+
+    def _window(self, path, meta, start, end):
+        # (index, {column: memmap slice}) for start <= t < end, without copying.
+        times = self._map(path, '__time__', 'int64', meta['rows'])
+        bounds = []
+        for value in (start, end):
+            if value is None:
+                bounds.append(None)
+                continue
+            stamp = to_index_time(value, meta['tz'])
+            bounds.append(stamp.as_unit('ns').value if stamp.tzinfo is None else stamp.tz_convert('UTC').as_unit('ns').value)
+        first = int(np.searchsorted(times, bounds[0], side='left')) if bounds[0] is not None else 0
+        last = int(np.searchsorted(times, bounds[1], side='left')) if bounds[1] is not None else len(times)
+        index = pd.DatetimeIndex(np.asarray(times[first:last]).view('datetime64[ns]'), name=meta['index_name'])
+        if meta['tz']:
+            index = index.tz_localize('UTC').tz_convert(meta['tz'])
+        columns = {name: self._map(path, name, dtype, meta['rows'])[first:last] for name, dtype in meta['columns']}
+        return index, columns
+
+    def _frame(self, path, meta, start=None, end=None):
+        # Read-only columns straight over the mapped files; the files are
+        # replaced, never rewritten, so the frame stays as read.
+        index, columns = self._window(path, meta, start, end)
+        return pd.DataFrame({name: values.view(np.ndarray) for name, values in columns.items()}, index=index, copy=False)
+
+    def read(self, ticker, interval, start, end=None):
+        with self._locked([ticker], interval):
+            meta = self._refresh([ticker], interval, start, end)[ticker]
+            if meta is None:
+                return pd.DataFrame()
+            return self._frame(self._path(ticker, interval), meta, start, end)
+
+    def read_many(self, tickers, interval, start, end=None):
+        # Same shape yf.download gives for a list: (field, ticker) columns over
+        # the union of the tickers' bars.
+        with self._locked(tickers, interval):
+            metas = self._refresh(tickers, interval, start, end)
+            frames = {
+                ticker: self._frame(self._path(ticker, interval), meta, start, end)
+                for ticker, meta in metas.items() if meta is not None
+            }
+        return join_download(frames)
+
+    @contextmanager
+    def _locked(self, tickers, interval):
+        locks = [self._lock(ticker, interval) for ticker in sorted(set(tickers))]
+        for lock in locks:
+            lock.__enter__()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.__exit__(None, None, None)
+
+    def _refresh(self, tickers, interval, start, end):
+        # Brings the tickers' files up to date; the caller holds their locks.
+        tickers = list(dict.fromkeys(tickers))
+        metas = {ticker: self._meta(self._path(ticker, interval)) for ticker in tickers}
+        plans = {ticker: self._plan(metas[ticker], start) for ticker in tickers}
+
+        # One download for everything that needs the whole window and one for
+        # all the tails, starting at the oldest last bar among them.
+        full = [ticker for ticker in tickers if plans[ticker] == 'full']
+        if full:
+            fetched = split_download(self.source(full if len(full) > 1 else full[0], interval, start, end), full)
+            for ticker in full:
+                metas[ticker] = self._store(ticker, interval, metas[ticker], fetched.get(ticker), start, full=True)
+
+        tail = [ticker for ticker in tickers if plans[ticker] == 'tail']
+        if tail:
+            since = {ticker: self._last_time(self._path(ticker, interval), metas[ticker]) for ticker in tail}
+            tail_start = min(since.values(), key=lambda stamp: stamp.tz_convert('UTC') if stamp.tzinfo else stamp.tz_localize('UTC'))
+            fetched = split_download(self.source(tail if len(tail) > 1 else tail[0], interval, tail_start, end), tail)
+            for ticker in tail:
+                bars = fetched.get(ticker)
+                if bars is not None:
+                    bars = bars[bars.index >= since[ticker]]
+                metas[ticker] = self._store(ticker, interval, metas[ticker], bars, start, full=False)
+        return metas
+
+_bar_store = None
+_bar_store_lock = threading.Lock()
+
+def get_bar_store():
+    global _bar_store
+    if not BAR_STORE_DIR:
+        return None
+    with _bar_store_lock:
+        if _bar_store is None:
+            _bar_store = BarStore()
+        return _bar_store
+
+def download_bars(ticker, interval, start, end):
+    store = get_bar_store()
+    if store is None:
+        return get_market_data().download(ticker, start=start, end=end, interval=interval, progress=True)
+    return store.read(ticker, interval, start, end)
+
+def download_bar_batch(tickers, interval, start, end):
+    store = get_bar_store()
+    if store is None:
+        return get_market_data().download(tickers, start=start, end=end, interval=interval, progress=False)
+    return store.read_many(tickers, interval, start, end)
@@ -1,5 +1,6 @@
 from fastapi import HTTPException
-import yfinance as yf
+from services.fundamentals import get_fundamentals
+from services.market_data import get_market_data
 import numpy as np
 import pandas as pd
 
@@ -26,8 +27,8 @@ def convert_data(data):
 
 def get_stock_data(ticker):
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        market_data = get_market_data()
+        info = get_fundamentals().info(ticker)
 
         if 'currentPrice' in info:
             current_price = info['currentPrice']
@@ -36,7 +37,7 @@ def get_stock_data(ticker):
         else:
             current_price = None
         
-        previous_close = stock.info['previousClose']
+        previous_close = info['previousClose']
         if current_price is not None:
             absolute_Change = current_price - previous_close
             percentage_change = (absolute_Change / previous_close) * 100
@@ -44,9 +45,12 @@ def get_stock_data(ticker):
             absolute_Change = None
             percentage_change = None
 
-        financials = convert_data(stock.financials) if stock.financials is not None else None
-        recommendations = convert_data(stock.recommendations) if stock.recommendations is not None else None
-        cash_flow = convert_data(stock.cashflow) if stock.cashflow is not None else None
+        financials = market_data.financials(ticker)
+        financials = convert_data(financials) if financials is not None else None
+        recommendations = market_data.recommendations(ticker)
+        recommendations = convert_data(recommendations) if recommendations is not None else None
+        cash_flow = market_data.cashflow(ticker)
+        cash_flow = convert_data(cash_flow) if cash_flow is not None else None
 
         logo_urls = {
             "AAPL": "https://logo.clearbit.com/apple.com",
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from services.market_data import get_market_data
+from utils.metrics import metrics
+from utils.single_flight import SingleFlight
+
+# Ticker info (yf.Ticker(t).info) kept in memory. How long an entry counts as
+# fresh depends on the fields the caller is about to read: prices go stale in a
+# minute, names and sectors last a day. A stale entry is still served, up to
+# STALE_TTL_MULTIPLE times those fields' TTL old, while a background refresh
+# replaces it.
+PRICE_FIELDS = (
+    'currentPrice', 'navPrice', 'previousClose', 'regularMarketPrice', 'open',
+    'dayHigh', 'dayLow', 'volume', 'bid', 'ask', 'marketCap'
+)
+STATIC_FIELDS = (
+    'longName', 'shortName', 'sector', 'industry', 'quoteType', 'exchange',
+    'currency', 'country', 'website', 'longBusinessSummary'
+)
+FIELD_TTLS = {**{field: 60 for field in PRICE_FIELDS}, **{field: 24 * 3600 for field in STATIC_FIELDS}}
+DEFAULT_TTL = 15 * 60
+STALE_TTL_MULTIPLE = 5
+MAX_ENTRIES = 2048
+WARM_WORKERS = 8
+
+def fields_ttl(fields):
+    # None means the whole dict, so the shortest TTL applies.
+    if fields is None:
+        return min(FIELD_TTLS.values())
+    return min((FIELD_TTLS.get(field, DEFAULT_TTL) for field in fields), default=DEFAULT_TTL)
+
+class FundamentalsCache:
+    def __init__(self, max_entries=MAX_ENTRIES, stale_multiple=STALE_TTL_MULTIPLE, workers=WARM_WORKERS):
+        self.max_entries = max_entries
+        self.stale_multiple = stale_multiple
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.flight = SingleFlight('fundamentals')
+        self.refreshing = set()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fundamentals')
+
+    def _lookup(self, ticker):
+        with self.lock:
+            entry = self.entries.get(ticker)
+            if entry is not None:
+                self.entries.move_to_end(ticker)
+            return entry
+
+    def _fetch(self, ticker):
+        def load():
+            info = get_market_data().info(ticker)
+            with self.lock:
+                self.entries[ticker] = (time.time(), info)
+                self.entries.move_to_end(ticker)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return info
+        return self.flight.do(ticker, load)
+
+    def _refresh(self, ticker):
+        try:
+            self._fetch(ticker)
+            metrics.increment('fundamentals.refreshed')
+        except Exception as e:
+            # Keep serving the stale entry; the next read tries again.
+            metrics.increment('fundamentals.refresh_errors')
+            print(f"Error refreshing info for {ticker}: {str(e)}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(ticker)
+
+    def _revalidate(self, ticker):
+        with self.lock:
+            if ticker in self.refreshing:
+                return
+            self.refreshing.add(ticker)
+        self.executor.submit(self._refresh, ticker)
+
+    def _state(self, entry, fields):
+        if entry is None:
+            return 'missing'
+        age = time.time() - entry[0]
+        ttl = fields_ttl(fields)
+        if age < ttl:
+            return 'fresh'
+        return 'stale' if age < ttl * self.stale_multiple else 'missing'
+
+    def info(self, ticker, fields=None):
+        entry = self._lookup(ticker)
+        state = self._state(entry, fields)
+        if state == 'fresh':
+            metrics.increment('fundamentals.hits')
+            return dict(entry[1])
+        if state == 'stale':
+            metrics.increment('fundamentals.stale_hits')
+            self._revalidate(ticker)
+            return dict(entry[1])
+        metrics.increment('fundamentals.misses')
+        return dict(self._fetch(ticker))
+
+    def warm(self, tickers, fields=None):
+        # Loads every missing ticker in parallel and waits for them; stale ones
+        # are only queued for refresh. Errors are left for info() to raise.
+        missing = []
+        for ticker in dict.fromkeys(tickers):
+            state = self._state(self._lookup(ticker), fields)
+            if state == 'missing':
+                missing.append(ticker)
+            elif state == 'stale':
+                self._revalidate(ticker)
+        futures = [self.executor.submit(self._fetch, ticker) for ticker in missing]
+        wait(futures)
+        metrics.increment('fundamentals.warmed', len(missing))
+        return len(missing)
+
+_fundamentals = None
+_fundamentals_lock = threading.Lock()
+
+def get_fundamentals():
+    global _fundamentals
+    with _fundamentals_lock:
+        if _fundamentals is None:
+            _fundamentals = FundamentalsCache()
+        return _fundamentals
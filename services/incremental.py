@@ -0,0 +1,417 @@
+import copy
+import math
+import threading
+from collections import OrderedDict, deque
+import pandas as pd
+from services.bar_pyramid import PYRAMID_RULES
+
+# Bar-by-bar versions of the indicators in services/indicators.py and of
+# calculate_ttm_squeeze_signals. Each object is fed one value (or one bar) at a
+# time through update() and returns the value the batch calculation would have
+# produced for that bar, NaN while it is warming up. Seed them with history
+# once, then keep calling update() as bars arrive.
+
+NAN = float('nan')
+MAX_LIVE_SIGNALS = 256
+
+_live_signals = OrderedDict()
+_live_signals_lock = threading.Lock()
+
+class IncrementalEWM:
+    # Series.ewm(span=... or alpha=..., adjust=..., min_periods=...).mean(),
+    # with pandas' order of operations, so values match bit for bit, gaps
+    # (NaN, which still age the average) included.
+    def __init__(self, span=None, alpha=None, adjust=False, min_periods=0):
+        com = (span - 1) / 2.0 if alpha is None else 1.0 / alpha - 1.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.decay = 1.0 - self.alpha
+        self.adjust = adjust
+        self.min_periods = max(int(min_periods), 1)
+        self.count = 0
+        self.weight = 1.0
+        self.weighted = NAN
+        self.value = NAN
+
+    def update(self, x):
+        observed = x == x
+        self.count += observed
+        if self.weighted == self.weighted:
+            self.weight *= self.decay
+            if observed:
+                new_weight = 1.0 if self.adjust else self.alpha
+                if self.weighted != x:
+                    self.weighted = (self.weight * self.weighted + new_weight * x) / (self.weight + new_weight)
+                self.weight = self.weight + new_weight if self.adjust else 1.0
+        elif observed:
+            self.weighted = x
+        self.value = self.weighted if self.count >= self.min_periods else NAN
+        return self.value
+
+class IncrementalEMA:
+    # pandas_ta's ema: the first `length` values are averaged into the seed, then
+    # a non-adjusted EWM with span=length carries on from there.
+    def __init__(self, length):
+        self.length = length
+        self.warmup = []
+        self.ewm = IncrementalEWM(span=length)
+        self.value = NAN
+
+    def update(self, x):
+        if self.warmup is not None:
+            self.warmup.append(x)
+            if len(self.warmup) < self.length:
+                return NAN
+            x = pd.Series(self.warmup).mean()
+            self.warmup = None
+        self.value = self.ewm.update(x)
+        return self.value
+
+class IncrementalMACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = IncrementalEMA(fast)
+        self.slow = IncrementalEMA(slow)
+        self.signal_ema = IncrementalEMA(signal)
+        self.started = False
+        self.macd = NAN
+        self.signal = NAN
+        self.histogram = NAN
+
+    def update(self, close):
+        self.macd = self.fast.update(close) - self.slow.update(close)
+        # pandas_ta starts the signal EMA at the first valid MACD value.
+        if self.started or not math.isnan(self.macd):
+            self.started = True
+            self.signal = self.signal_ema.update(self.macd)
+        self.histogram = self.macd - self.signal
+        return self.macd, self.histogram, self.signal
+
+class IncrementalSMA:
+    # Rolling mean over a full window from running sums; like
+    # rolling(length).mean() a window holding a NaN has no value. std is worked
+    # out from the window itself, running sums of squares lose too much.
+    def __init__(self, length):
+        self.length = length
+        self.window = deque()
+        self.missing = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x):
+        self.window.append(x)
+        if math.isnan(x):
+            self.missing += 1
+        else:
+            self.total += x
+        if len(self.window) > self.length:
+            old = self.window.popleft()
+            if math.isnan(old):
+                self.missing -= 1
+            else:
+                self.total -= old
+        self.value = self.total / self.length if self.full else NAN
+        return self.value
+
+    @property
+    def full(self):
+        return len(self.window) == self.length and not self.missing
+
+    @property
+    def std(self):
+        return _std(self.window) if self.full else NAN
+
+class IncrementalRollingExtreme:
+    # rolling(length).max() / .min(), from a monotonic queue of candidates.
+    def __init__(self, length, mode='max'):
+        self.length = length
+        self.better = (lambda a, b: a >= b) if mode == 'max' else (lambda a, b: a <= b)
+        self.candidates = deque()
+        self.position = 0
+        self.last_gap = -1
+        self.value = NAN
+
+    def update(self, x):
+        if math.isnan(x):
+            self.last_gap = self.position
+        else:
+            while self.candidates and self.better(x, self.candidates[-1][1]):
+                self.candidates.pop()
+            self.candidates.append((self.position, x))
+        while self.candidates and self.candidates[0][0] <= self.position - self.length:
+            self.candidates.popleft()
+        self.position += 1
+        full = self.position >= self.length and self.last_gap < self.position - self.length
+        self.value = self.candidates[0][1] if full else NAN
+        return self.value
+
+class IncrementalRSI:
+    # pandas_ta's rsi: Wilder (alpha=1/length, adjusted) averages of gains and losses.
+    def __init__(self, length=14):
+        self.gains = IncrementalEWM(alpha=1.0 / length, adjust=True, min_periods=length)
+        self.losses = IncrementalEWM(alpha=1.0 / length, adjust=True, min_periods=length)
+        self.previous = NAN
+        self.value = NAN
+
+    def update(self, close):
+        change = close - self.previous
+        self.previous = close
+        gain = self.gains.update(0.0 if change < 0 else change)
+        loss = self.losses.update(0.0 if change > 0 else change)
+        total = gain + abs(loss)
+        self.value = 100 * gain / total if total else NAN
+        return self.value
+
+class IncrementalTrueRange:
+    # ta.true_range, except that pandas_ta nudges every High - Low by epsilon
+    # when any bar of the series has a zero range; a bar at a time cannot know.
+    def __init__(self):
+        self.previous_close = NAN
+        self.started = False
+        self.value = NAN
+
+    def update(self, high, low, close):
+        ranges = [abs(value) for value in (high - low, high - self.previous_close, self.previous_close - low) if value == value]
+        self.value = max(ranges) if self.started and ranges else NAN
+        self.previous_close = close
+        self.started = True
+        return self.value
+
+class IncrementalATR:
+    def __init__(self, length=14):
+        self.true_range = IncrementalTrueRange()
+        self.average = IncrementalEWM(alpha=1.0 / length, adjust=True, min_periods=length)
+        self.value = NAN
+
+    def update(self, high, low, close):
+        self.value = self.average.update(self.true_range.update(high, low, close))
+        return self.value
+
+class IncrementalLinReg:
+    # End point of a least-squares line through the last `length` values with
+    # x = 1..length, like ta.linreg. Sliding the window only needs the running
+    # sums: sum(x*y) loses one copy of sum(y) and gains length * new value.
+    def __init__(self, length):
+        self.length = length
+        self.window = deque()
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.sum_x = length * (length + 1) / 2
+        self.divisor = length * (length * (length + 1) * (2 * length + 1) / 6) - self.sum_x ** 2
+        self.value = NAN
+
+    def update(self, y):
+        if math.isnan(y):
+            self.window.clear()
+            self.sum_y = self.sum_xy = 0.0
+            self.value = NAN
+            return NAN
+        if len(self.window) == self.length:
+            self.sum_xy -= self.sum_y
+            self.sum_y -= self.window.popleft()
+            self.sum_xy += self.length * y
+        else:
+            self.sum_xy += (len(self.window) + 1) * y
+        self.window.append(y)
+        self.sum_y += y
+        if len(self.window) < self.length:
+            self.value = NAN
+            return NAN
+        slope = (self.length * self.sum_xy - self.sum_x * self.sum_y) / self.divisor
+        intercept = (self.sum_y - slope * self.sum_x) / self.length
+        self.value = slope * self.length + intercept
+        return self.value
+
+class IncrementalTTMMomentum:
+    # linreg(Close - ((highest High + lowest Low) / 2 + SMA(Close)) / 2), as in calculate_ttm_waves.
+    def __init__(self, length=20):
+        self.highest = IncrementalRollingExtreme(length, 'max')
+        self.lowest = IncrementalRollingExtreme(length, 'min')
+        self.basis = IncrementalSMA(length)
+        self.linreg = IncrementalLinReg(length)
+        self.value = NAN
+
+    def update(self, high, low, close):
+        avg_hl = (self.highest.update(high) + self.lowest.update(low)) / 2
+        avg_hl_close = (avg_hl + self.basis.update(close)) / 2
+        self.value = self.linreg.update(close - avg_hl_close)
+        return self.value
+
+def _mean(values):
+    # rolling().mean() of a full window; pandas hands a run of one repeated
+    # value back as is.
+    if min(values) == max(values):
+        return values[0]
+    return math.fsum(values) / len(values)
+
+def _std(values):
+    if min(values) == max(values):
+        return 0.0
+    mean = _mean(values)
+    return math.sqrt(math.fsum((value - mean) ** 2 for value in values) / (len(values) - 1))
+
+def _window(values, length, lag=0):
+    # The `length` values ending `lag` bars back, or None when the window is
+    # short or holds a NaN (what rolling(length) leaves NaN).
+    end = len(values) - lag
+    window = list(values)[max(end - length, 0):end]
+    if len(window) < length or any(value != value for value in window):
+        return None
+    return window
+
+class _PriceLevel:
+    # One of the price1..price4 columns of calculate_ttm_squeeze_signals.
+    # BarPyramid.aligned gives every bar, from one that opens a `rule` bin up
+    # to the next such bar, the last close of that bin. So the bars of the
+    # newest group all change while its bin fills; finished groups are kept as
+    # plain values, the open one as its value and bar count.
+    def __init__(self, rule, keep):
+        self.freq = pd.Timedelta(rule).value
+        self.done = deque(maxlen=keep)
+        self.value = NAN
+        self.bars = 0
+        self.bin_end = None
+
+    def update(self, since_midnight, close):
+        if since_midnight % self.freq == 0:
+            self.done.extend([self.value] * min(self.bars, self.done.maxlen))
+            self.bars = 0
+            self.bin_end = since_midnight + self.freq
+        # A bin with no close at all has no label, so its bars keep the value
+        # of the group before.
+        if self.bin_end is not None and since_midnight < self.bin_end and close == close:
+            self.value = close
+        self.bars += 1
+
+    def window(self, length, lag):
+        values = list(self.done)[-(length + lag):] + [self.value] * min(self.bars, length + lag)
+        return _window(values, length, lag)
+
+class _SqueezeState:
+    def __init__(self, origin, length=20):
+        self.origin = origin
+        self.length = length
+        self.levels = [_PriceLevel(rule, length + 1) for rule in PYRAMID_RULES]
+        self.close = deque(maxlen=length + 1)
+        self.range = deque(maxlen=length + 1)
+        self.high = deque(maxlen=length)
+        self.low = deque(maxlen=length)
+        self.volume = deque(maxlen=10)
+        self.filled = [NAN] * 5
+        self.mom = IncrementalEWM(span=length)
+        self.ema5 = IncrementalEWM(span=5)
+        self.ema13 = IncrementalEWM(span=13)
+        self.bars = 0
+        self.previous = (NAN, NAN, NAN)
+
+    def squeeze_sum(self, lag):
+        closes = _window(self.close, self.length, lag)
+        ranges = _window(self.range, self.length, lag)
+        if closes is None or ranges is None:
+            return 0
+        kc_basis = _mean(closes)
+        dev_kc = _mean(ranges)
+        total = 0
+        for level in self.levels:
+            values = level.window(self.length, lag)
+            if values is None:
+                continue
+            basis = _mean(values)
+            dev = 2.0 * _std(values)
+            upper_bb = basis + dev
+            lower_bb = basis - dev
+            mid_sqz = (lower_bb >= kc_basis - dev_kc * 1.5) or (upper_bb <= kc_basis + dev_kc * 1.5)
+            high_sqz = (lower_bb >= kc_basis - dev_kc * 1.0) or (upper_bb <= kc_basis + dev_kc * 1.0)
+            total += mid_sqz or high_sqz
+        return total
+
+    def update(self, time, open_, high, low, close, volume):
+        for level in self.levels:
+            level.update(time - self.origin, close)
+        # The rest reads forward filled bars, like the batch after _fill_gaps.
+        self.filled = [value if value == value else filled for value, filled in zip((open_, high, low, close, volume), self.filled)]
+        open_, high, low, close, volume = self.filled
+        self.close.append(close)
+        self.range.append(high - low)
+        self.high.append(high)
+        self.low.append(low)
+        self.volume.append(volume)
+        self.bars += 1
+
+        # The previous bar's squeeze is worked out again: the open groups of
+        # its price levels may have changed with this bar.
+        no_sqz = self.squeeze_sum(0) <= 1
+        was_squeezed = self.bars > 1 and not self.squeeze_sum(1) <= 1
+
+        closes = _window(self.close, self.length)
+        if closes is None or len(self.high) < self.length:
+            source = NAN
+        else:
+            source = close - ((max(self.high) + min(self.low)) / 2 + _mean(closes)) / 2
+        mom = self.mom.update(source)
+        ema5 = self.ema5.update((high + low) / 2)
+        ema13 = self.ema13.update((high + low) / 2)
+        mom_before, ema5_before, ema13_before = self.previous
+        self.previous = (mom, ema5, ema13)
+
+        mom_down = (mom > 0 and mom < mom_before) or (mom <= 0 and mom > mom_before)
+        volumes = _window(self.volume, 10)
+        high_volume = volumes is not None and volume > _mean(volumes)
+        cross_over_ema = ema5 > ema13 and ema5_before <= ema13_before
+        cross_under_ema = ema5 < ema13 and ema5_before >= ema13_before
+        return {
+            'time': time // 10**9,
+            'price': close,
+            'ema5': ema5,
+            'ema13': ema13,
+            'noSqz': no_sqz,
+            'squeeze_signal_up': ema5 > ema13 and no_sqz and was_squeezed,
+            'squeeze_signal_down': ema5 < ema13 and no_sqz and was_squeezed,
+            'ripster_signal_up': high_volume and cross_over_ema and mom_down and no_sqz,
+            'ripster_signal_down': high_volume and cross_under_ema and mom_down and no_sqz,
+        }
+
+class LiveSqueezeSignals:
+    # The last row of calculate_ttm_squeeze_signals for one ticker/interval,
+    # kept current a bar at a time instead of recomputed over the window.
+    # Each call gets the current window of bars (from the bar store, say);
+    # only the bars from the last one seen onward are fed. That last bar may
+    # have been a partial one, so it is always fed again on top of the state
+    # kept from before it. A window that no longer reaches back to it starts
+    # the state over.
+    def __init__(self, length=20):
+        self.length = length
+        self.before_last = None
+        self.last_time = None
+        self.row = None
+
+    def update_from_frame(self, data):
+        if data.empty:
+            return self.row
+        index = data.index
+        start = len(index)
+        if self.last_time is not None and (index.tz is None) == (self.last_time.tz is None):
+            start = index.searchsorted(self.last_time)
+        if start < len(index) and index[start] == self.last_time:
+            state = self.before_last
+            data = data.iloc[start:]
+        else:
+            state = _SqueezeState(index[0].normalize().value, self.length)
+        times = data.index.as_unit('ns').asi8.tolist()
+        bars = list(zip(times, *(data[name].to_numpy(dtype=float).tolist() for name in ('Open', 'High', 'Low', 'Close', 'Volume'))))
+        for bar in bars[:-1]:
+            state.update(*bar)
+        self.before_last = copy.deepcopy(state)
+        self.row = state.update(*bars[-1])
+        self.last_time = data.index[-1]
+        return self.row
+
+def get_live_squeeze_signals(ticker, interval):
+    key = (ticker, interval)
+    with _live_signals_lock:
+        signals = _live_signals.get(key)
+        if signals is None:
+            signals = _live_signals[key] = LiveSqueezeSignals()
+            if len(_live_signals) > MAX_LIVE_SIGNALS:
+                _live_signals.popitem(last=False)
+        else:
+            _live_signals.move_to_end(key)
+        return signals
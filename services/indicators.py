@@ -0,0 +1,127 @@
+import time
+import pandas_ta as ta # type: ignore
+
+# Every indicator is declared once here. A node receives the graph it runs in and
+# pulls its inputs through graph.source()/graph.get(), so dependencies are
+# resolved (and computed at most once) on demand.
+INDICATORS = {}
+
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+def indicator(name):
+    def register(func):
+        INDICATORS[name] = func
+        return func
+    return register
+
+class IndicatorGraph:
+    def __init__(self, data):
+        self.data = data
+        self.cache = {}
+        self.timings = {}
+        self._nested = []
+
+    def rebase(self, data):
+        # Point the graph at new prices (e.g. after a forward fill): cached
+        # values are dropped, time already spent stays in the summary.
+        self.data = data
+        self.cache = {}
+
+    def source(self, name):
+        if name in PRICE_COLUMNS:
+            return self.data[name]
+        return self.get(name)
+
+    def get(self, name, **params):
+        key = (name, tuple(sorted(params.items())))
+        if key in self.cache:
+            return self.cache[key]
+
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            value = INDICATORS[name](self, **params)
+        finally:
+            nested = self._nested.pop()
+        elapsed = time.perf_counter() - started
+        if self._nested:
+            self._nested[-1] += elapsed
+
+        # Time spent in dependencies is booked on their own nodes.
+        self.timings[key] = self.timings.get(key, 0.0) + elapsed - nested
+        self.cache[key] = value
+        return value
+
+    def summary(self):
+        # Seconds spent in each indicator, its dependencies excluded, most
+        # expensive first.
+        return sorted(
+            (
+                {'indicator': name, 'params': dict(params), 'seconds': seconds}
+                for (name, params), seconds in self.timings.items()
+            ),
+            key=lambda row: row['seconds'],
+            reverse=True
+        )
+
+@indicator('hl2')
+def _hl2(graph):
+    return (graph.source('High') + graph.source('Low')) / 2
+
+@indicator('range')
+def _range(graph):
+    return graph.source('High') - graph.source('Low')
+
+@indicator('true_range')
+def _true_range(graph):
+    return ta.true_range(graph.source('High'), graph.source('Low'), graph.source('Close'))
+
+@indicator('sma')
+def _sma(graph, source='Close', length=20):
+    return graph.source(source).rolling(window=length).mean()
+
+@indicator('rolling_std')
+def _rolling_std(graph, source='Close', length=20):
+    return graph.source(source).rolling(window=length).std()
+
+@indicator('rolling_max')
+def _rolling_max(graph, source='High', length=20):
+    return graph.source(source).rolling(window=length).max()
+
+@indicator('rolling_min')
+def _rolling_min(graph, source='Low', length=20):
+    return graph.source(source).rolling(window=length).min()
+
+@indicator('ewm')
+def _ewm(graph, source='Close', span=5):
+    return graph.source(source).ewm(span=span, adjust=False).mean()
+
+@indicator('ema')
+def _ema(graph, source='Close', length=10):
+    return ta.ema(graph.source(source), length=length)
+
+@indicator('rsi')
+def _rsi(graph, length=14):
+    return ta.rsi(graph.source('Close'), length=length)
+
+@indicator('macd')
+def _macd(graph, fast=12, slow=26, signal=9):
+    return ta.macd(graph.source('Close'), fast=fast, slow=slow, signal=signal)
+
+@indicator('atr')
+def _atr(graph, length=14):
+    return ta.atr(graph.source('High'), graph.source('Low'), graph.source('Close'), length=length)
+
+@indicator('bbands')
+def _bbands(graph, length=20, std=2.0):
+    return ta.bbands(graph.source('Close'), length=length, std=std)
+
+@indicator('ttm_momentum_source')
+def _ttm_momentum_source(graph, length=20):
+    avg_hl = (graph.get('rolling_max', source='High', length=length) + graph.get('rolling_min', source='Low', length=length)) / 2
+    avg_hl_close = (avg_hl + graph.get('sma', source='Close', length=length)) / 2
+    return graph.source('Close') - avg_hl_close
+
+@indicator('ttm_momentum')
+def _ttm_momentum(graph, length=20):
+    return ta.linreg(graph.get('ttm_momentum_source', length=length), length=length)
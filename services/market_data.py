@@ -0,0 +1,255 @@
+import hashlib
+from abc import ABC, abstractmethod
+import os
+import pickle
+import random
+import threading
+import time
+import pandas as pd
+import yfinance as yf # type: ignore
+
+# Every read of market data goes through one provider, picked with
+# MARKET_DATA_PROVIDER:
+#   yfinance (default)  live Yahoo Finance
+#   record              live, and every answer is also written to MARKET_DATA_DIR
+#   replay              answers only from MARKET_DATA_DIR, never the network, after
+#                       MARKET_DATA_LATENCY_MS (+ up to MARKET_DATA_JITTER_MS,
+#                       seeded by MARKET_DATA_SEED) to stand in for Yahoo's latency
+MARKET_DATA_PROVIDER = os.environ.get('MARKET_DATA_PROVIDER', 'yfinance')
+MARKET_DATA_DIR = os.environ.get('MARKET_DATA_DIR', 'market_data_recordings')
+MARKET_DATA_LATENCY_MS = float(os.environ.get('MARKET_DATA_LATENCY_MS', '0'))
+MARKET_DATA_JITTER_MS = float(os.environ.get('MARKET_DATA_JITTER_MS', '0'))
+MARKET_DATA_SEED = int(os.environ.get('MARKET_DATA_SEED', '0'))
+
+class MarketDataProvider(ABC):
+    @abstractmethod
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        # Same result as yf.download: plain OHLCV columns for one ticker given as
+        # a string, (field, ticker) columns for a list.
+        ...
+
+    @abstractmethod
+    def info(self, ticker):
+        ...
+
+    @abstractmethod
+    def financials(self, ticker):
+        ...
+
+    @abstractmethod
+    def recommendations(self, ticker):
+        ...
+
+    @abstractmethod
+    def cashflow(self, ticker):
+        ...
+
+def split_download(frame, tickers):
+    # {ticker: frame with plain OHLCV columns} from a yf.download result, which
+    # only has a (field, ticker) MultiIndex when several tickers were asked for.
+    if frame is None or frame.empty:
+        return {}
+    if isinstance(frame.columns, pd.MultiIndex):
+        present = set(frame.columns.get_level_values(1))
+        return {
+            ticker: frame.xs(ticker, axis=1, level=1).dropna(how='all')
+            for ticker in tickers if ticker in present
+        }
+    return {tickers[0]: frame.dropna(how='all')}
+
+def join_download(frames):
+    # The inverse of split_download for a list request: (field, ticker)
+    # columns over the union of the tickers' bars.
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+class YFinanceProvider(MarketDataProvider):
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        return yf.download(tickers, start=start, end=end, interval=interval, progress=progress)
+
+    def info(self, ticker):
+        return yf.Ticker(ticker).info
+
+    def financials(self, ticker):
+        return yf.Ticker(ticker).financials
+
+    def recommendations(self, ticker):
+        return yf.Ticker(ticker).recommendations
+
+    def cashflow(self, ticker):
+        return yf.Ticker(ticker).cashflow
+
+def _recording_path(directory, method, key):
+    # Downloads are keyed by ticker and interval only: the window moves with the
+    # clock, and a replay has to answer whatever window it is asked for.
+    name = '_'.join(','.join(part) if isinstance(part, tuple) else str(part) for part in key)
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+    safe = ''.join(c if c.isalnum() or c in '-_.,^=' else '_' for c in name)[:80]
+    return os.path.join(directory, method, f'{safe}-{digest}.pkl')
+
+def _ticker_list(tickers):
+    return [tickers] if isinstance(tickers, str) else list(tickers)
+
+class RecordingProvider(MarketDataProvider):
+    # Passes calls through to `inner` and keeps the answers on disk. Downloads
+    # are split into one recording per ticker and interval, and merged with
+    # what is already recorded, so full windows, later tails and batches of
+    # any split add up to one recording per ticker.
+    def __init__(self, inner, directory=MARKET_DATA_DIR):
+        self.inner = inner
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def _save(self, method, key, value):
+        path = _recording_path(self.directory, method, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump(value, f)
+        os.replace(temporary, path)
+
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        frame = self.inner.download(tickers, start=start, end=end, interval=interval, progress=progress)
+        if frame is None or frame.empty:
+            return frame
+        with self.lock:
+            for ticker, bars in split_download(frame, _ticker_list(tickers)).items():
+                key = (ticker, interval)
+                path = _recording_path(self.directory, 'download', key)
+                try:
+                    with open(path, 'rb') as f:
+                        recorded = pickle.load(f)
+                    bars = pd.concat([recorded[~recorded.index.isin(bars.index)], bars]).sort_index()
+                except (OSError, pickle.UnpicklingError, EOFError, TypeError, ValueError):
+                    pass
+                self._save('download', key, bars)
+        return frame
+
+    def _record(self, method, ticker):
+        value = getattr(self.inner, method)(ticker)
+        with self.lock:
+            self._save(method, (ticker,), value)
+        return value
+
+    def info(self, ticker):
+        return self._record('info', ticker)
+
+    def financials(self, ticker):
+        return self._record('financials', ticker)
+
+    def recommendations(self, ticker):
+        return self._record('recommendations', ticker)
+
+    def cashflow(self, ticker):
+        return self._record('cashflow', ticker)
+
+class ReplayProvider(MarketDataProvider):
+    # Answers from a RecordingProvider directory, one recording per ticker, so
+    # a batch is answered however the recorded run happened to split it.
+    # Downloads come back whole unless respect_window is set, so a replay a
+    # month later still sees the recorded bars. A batch leaves out tickers
+    # that were never recorded, as yf.download leaves out failed ones; a
+    # request with none of them recorded raises LookupError.
+    def __init__(self, directory=MARKET_DATA_DIR, latency_ms=0.0, jitter_ms=0.0, seed=0, respect_window=False):
+        self.directory = directory
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.random = random.Random(seed)
+        self.respect_window = respect_window
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def _wait(self):
+        with self.lock:
+            delay = self.latency_ms + (self.random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _load(self, method, key):
+        path = _recording_path(self.directory, method, key)
+        with self.lock:
+            if path not in self.cache:
+                try:
+                    with open(path, 'rb') as f:
+                        self.cache[path] = pickle.load(f)
+                except OSError:
+                    raise LookupError(f"No recorded {method} for {key} in {self.directory}")
+            value = self.cache[path]
+        # Callers add columns to what they get back, so hand out copies.
+        return value.copy() if hasattr(value, 'copy') else value
+
+    def _bars(self, ticker, interval, start, end):
+        frame = self._load('download', (ticker, interval))
+        if self.respect_window and not frame.empty:
+            index = frame.index
+            if start is not None:
+                frame = frame[index >= to_index_time(start, index.tz)]
+            if end is not None:
+                frame = frame[frame.index < to_index_time(end, index.tz)]
+        return frame
+
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        self._wait()
+        if isinstance(tickers, str):
+            return self._bars(tickers, interval, start, end)
+        frames = {}
+        for ticker in tickers:
+            try:
+                frames[ticker] = self._bars(ticker, interval, start, end)
+            except LookupError:
+                continue
+        if not frames:
+            raise LookupError(f"No recorded download for any of {list(tickers)} ({interval}) in {self.directory}")
+        return join_download(frames)
+
+    def info(self, ticker):
+        self._wait()
+        return self._load('info', (ticker,))
+
+    def financials(self, ticker):
+        self._wait()
+        return self._load('financials', (ticker,))
+
+    def recommendations(self, ticker):
+        self._wait()
+        return self._load('recommendations', (ticker,))
+
+    def cashflow(self, ticker):
+        self._wait()
+        return self._load('cashflow', (ticker,))
+
+def to_index_time(value, tz):
+    # A start/end bound comparable with an index in `tz` (None for naive daily
+    # bars). Naive datetimes are local wall time, as yf.download reads them.
+    value = pd.Timestamp(value)
+    if tz is None:
+        return value.tz_localize(None) if value.tzinfo else value
+    if value.tzinfo is None:
+        value = pd.Timestamp(value.to_pydatetime().astimezone())
+    return value.tz_convert(tz)
+
+def create_market_data_provider(kind=MARKET_DATA_PROVIDER):
+    if kind == 'yfinance':
+        return YFinanceProvider()
+    if kind == 'record':
+        return RecordingProvider(YFinanceProvider(), MARKET_DATA_DIR)
+    if kind == 'replay':
+        return ReplayProvider(MARKET_DATA_DIR, MARKET_DATA_LATENCY_MS, MARKET_DATA_JITTER_MS, MARKET_DATA_SEED)
+    raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {kind}")
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_market_data():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_market_data_provider()
+        return _provider
+
+def set_market_data(provider):
+    # Swap the provider for the whole process, e.g. a ReplayProvider in a benchmark.
+    global _provider
+    with _provider_lock:
+        _provider = provider
@@ -0,0 +1,174 @@
+import sys
+import numpy as np
+import pandas as pd
+
+# Batch versions of the indicators behind calculate_ticker_score_from_data. A panel
+# holds one (bar x ticker) frame per price field, so every rolling/ewm pass covers
+# the whole batch at once; each column goes through the same pandas kernel the
+# per-ticker Series would, so the scores come out identical.
+
+PANEL_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+SCORED_FIELDS = ('High', 'Low', 'Close')
+
+def build_panel(multi_data, tickers):
+    # Only tickers with a complete Close/High/Low series go in the panel. Gaps
+    # (late listings, halts) take the per-ticker path, where pandas_ta handles
+    # the missing values its own way.
+    present = [ticker for ticker in dict.fromkeys(tickers) if all((field, ticker) in multi_data.columns for field in PANEL_FIELDS)]
+    if not present:
+        return None, []
+    complete = np.ones(len(present), dtype=bool)
+    for field in SCORED_FIELDS:
+        complete &= multi_data[field][present].notna().all().to_numpy()
+    tickers = [ticker for ticker, ok in zip(present, complete) if ok]
+    if not tickers:
+        return None, []
+    panel = {field: multi_data[field][tickers].astype(float) for field in PANEL_FIELDS}
+    return panel, tickers
+
+def _series_mean(values):
+    # Row sums over contiguous memory add up in the same order as Series.mean.
+    return np.ascontiguousarray(values.T).sum(axis=1) / len(values)
+
+def panel_ema(frame, length):
+    # pandas_ta's ema: the mean of the first `length` bars seeds a non-adjusted EWM.
+    if len(frame) < length:
+        return None
+    values = frame.to_numpy(dtype=float, copy=True)
+    seed = _series_mean(values[:length])
+    values[:length - 1] = np.nan
+    values[length - 1] = seed
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns).ewm(span=length, adjust=False).mean()
+
+def panel_sma(frame, length):
+    return frame.rolling(window=length).mean()
+
+def panel_macd_histogram(close, fast=24, slow=52, signal=9):
+    # Same as ta.macd(...)['MACDh_...']; None where ta.macd would fail, which
+    # the scorer turns into zeros.
+    if len(close) < max(fast, slow, signal):
+        return None
+    macd = panel_ema(close, fast) - panel_ema(close, slow)
+    # Complete columns all become valid on the same bar, so one slice serves
+    # the whole panel.
+    first = macd.index.get_loc(macd.iloc[:, 0].first_valid_index())
+    signal_line = panel_ema(macd.iloc[first:], signal)
+    if signal_line is None:
+        return None
+    return macd - signal_line.reindex(macd.index)
+
+def panel_true_range(high, low, close):
+    hl = (high - low).to_numpy()
+    # non_zero_range nudges the whole column when any bar has no range.
+    hl = hl + np.where((hl == 0).any(axis=0), sys.float_info.epsilon, 0.0)
+    previous = close.shift(1).to_numpy()
+    true_range = np.fmax(np.fmax(np.abs(hl), np.abs(high.to_numpy() - previous)), np.abs(previous - low.to_numpy()))
+    true_range[:1] = np.nan
+    return pd.DataFrame(true_range, index=close.index, columns=close.columns)
+
+def score_conditions(data):
+    # The 15 bull and 15 bear checks summed into the trend score. `data` maps
+    # names to Series (one ticker) or frames (a panel).
+    bull_conditions = [
+        data['md'] > 0,
+        data['is_sloping_higher_50'],
+        data['is_sloping_higher_21'],
+        data['is_sloping_higher_200'],
+        data['sp'],
+        data['Close'] > data['ema21'],
+        data['Close'] > data['sma50'],
+        data['Close'] > data['sma200'],
+        data['ema8'] > data['ema21'],
+        data['ema8'] > data['sma50'],
+        data['ema8'] > data['sma200'],
+        data['ema21'] > data['sma50'],
+        data['ema21'] > data['sma200'],
+        data['sma50'] > data['sma200'],
+        data['Close'] > data['trail'],
+    ]
+
+    bear_conditions = [
+        data['md'] < 0,
+        data['is_sloping_lower_50'],
+        data['is_sloping_lower_21'],
+        data['is_sloping_lower_200'],
+        data['sn'],
+        data['Close'] < data['ema21'],
+        data['Close'] < data['sma50'],
+        data['Close'] < data['sma200'],
+        data['ema8'] < data['ema21'],
+        data['ema21'] < data['sma50'],
+        data['ema8'] < data['sma200'],
+        data['ema21'] < data['sma50'],
+        data['ema21'] < data['sma200'],
+        data['sma50'] < data['sma200'],
+        data['Close'] < data['trail'],
+    ]
+    return bull_conditions, bear_conditions
+
+def _filled(frame):
+    return frame.ffill().bfill().fillna(0)
+
+def _squeeze_labels(close, true_range, bb_length=20):
+    bb_mult = 2.0
+    kc_mult_high = 1.0
+    kc_mult_mid = 1.5
+    kc_mult_low = 2.0
+
+    bb_basis = close.rolling(bb_length, min_periods=bb_length).mean().iloc[-1]
+    deviation = bb_mult * np.sqrt(close.rolling(bb_length, min_periods=bb_length).var(0).iloc[-1])
+    bb_upper = bb_basis + deviation
+    bb_lower = bb_basis - deviation
+
+    atr = panel_sma(true_range, bb_length).iloc[-1]
+    kc_basis = panel_sma(close, bb_length).iloc[-1]
+
+    low_sqz = (bb_lower >= kc_basis - atr * kc_mult_low) | (bb_upper <= kc_basis + atr * kc_mult_low)
+    mid_sqz = (bb_lower >= kc_basis - atr * kc_mult_mid) | (bb_upper <= kc_basis + atr * kc_mult_mid)
+    high_sqz = (bb_lower >= kc_basis - atr * kc_mult_high) | (bb_upper <= kc_basis + atr * kc_mult_high)
+
+    return np.select(
+        [high_sqz.to_numpy(), mid_sqz.to_numpy(), low_sqz.to_numpy()],
+        ["high squeeze", "mid squeeze", "low squeeze"],
+        "no squeeze"
+    )
+
+def score_panel(panel, tickers, atr_period=9, atr_factor=2.4, bb_length=20):
+    # {ticker: (score, squeeze)} for every panel column, matching
+    # calculate_ticker_score_from_data on the same bars. Batches too short to
+    # score are left to the per-ticker path.
+    close = panel['Close']
+    length = len(close)
+    if length < 50:
+        return {}
+
+    md = panel_macd_histogram(close)
+    data = {
+        'Close': close,
+        'md': _filled(md) if md is not None else pd.DataFrame(0.0, index=close.index, columns=close.columns),
+        'sma200': _filled(panel_sma(close, min(200, length))),
+        'sma50': _filled(panel_sma(close, min(50, length))),
+        'ema8': _filled(panel_ema(close, min(8, length))),
+        'ema34': _filled(panel_ema(close, min(34, length))),
+        'ema21': _filled(panel_ema(close, min(21, length))),
+        'ema5': _filled(panel_ema(close, min(5, length))),
+    }
+    for period, column in (('50', 'sma50'), ('21', 'ema21'), ('200', 'sma200')):
+        previous = data[column].shift(1).fillna(0)
+        data['is_sloping_lower_' + period] = data[column] < previous
+        data['is_sloping_higher_' + period] = data[column] > previous
+
+    true_range = panel_true_range(panel['High'], panel['Low'], close)
+    data['trail'] = close - (atr_factor * true_range.fillna(0).rolling(window=min(atr_period, length)).mean().fillna(0))
+    data['sp'] = (data['ema5'] > data['ema8']) & (data['ema8'] > data['ema21']) & (data['ema21'] > data['ema34'])
+    data['sn'] = (data['ema5'] < data['ema8']) & (data['ema8'] < data['ema21']) & (data['ema21'] < data['ema34'])
+
+    # Only the last bar is scored.
+    last = {name: frame.iloc[-1] for name, frame in data.items()}
+    bull_conditions, bear_conditions = score_conditions(last)
+    bull_score = sum(cond.astype(int) for cond in bull_conditions)
+    bear_score = sum(cond.astype(int) for cond in bear_conditions)
+    scores = (bull_score - bear_score).to_numpy()
+
+    squeezes = _squeeze_labels(close, true_range, bb_length=bb_length)
+    return {ticker: (int(scores[i]), str(squeezes[i])) for i, ticker in enumerate(tickers)}
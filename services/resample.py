@@ -0,0 +1,136 @@
+import os
+import numpy as np
+import pandas as pd
+from services.market_data import get_market_data, split_download
+
+# Intervals that can be built from a finer one instead of downloaded. Intraday
+# bins start at the session open (a 1h bar covers 9:30-10:30, like Yahoo's),
+# weeks start on Monday and 5d bins are 5 calendar days counted from the epoch.
+DERIVED_FROM = {
+    '30m': '15m',
+    '1h': '15m',
+    '90m': '15m',
+    '5d': '1d',
+    '1wk': '1d',
+}
+BIN_WIDTHS = {
+    '30m': pd.Timedelta('30min'),
+    '1h': pd.Timedelta('60min'),
+    '90m': pd.Timedelta('90min'),
+    '5d': pd.Timedelta('5D'),
+}
+# e.g. DERIVED_INTERVALS=30m,1wk; DERIVED_INTERVALS= downloads every interval.
+DERIVED_INTERVALS = {
+    interval.strip()
+    for interval in os.environ.get('DERIVED_INTERVALS', ','.join(DERIVED_FROM)).split(',')
+    if interval.strip() in DERIVED_FROM
+}
+AGGREGATIONS = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Adj Close': 'last',
+    'Volume': 'sum',
+}
+
+def base_interval(interval):
+    # The interval to download to get `interval`: itself unless it's derived.
+    return DERIVED_FROM.get(interval, interval) if interval in DERIVED_INTERVALS else interval
+
+def session_open(index):
+    # Time from midnight to the usual first bar of the day. The most common
+    # first bar, so a window that starts mid-session doesn't move the anchor.
+    days = index.normalize()
+    first = pd.Series(index - days, index=days).groupby(level=0).min()
+    return first.mode().iloc[0] if not first.empty else pd.Timedelta(0)
+
+def bin_labels(index, interval):
+    if interval == '1wk':
+        days = index.normalize()
+        return days - pd.to_timedelta(days.dayofweek, unit='D')
+    width = BIN_WIDTHS[interval]
+    if interval == '5d':
+        # Counted on wall-clock dates so DST changes don't shift the bins.
+        days = index.normalize()
+        wall = days.tz_localize(None) if days.tz is not None else days
+        epoch = pd.Timestamp('1970-01-01')
+        labels = epoch + ((wall - epoch) // width) * width
+        return labels.tz_localize(days.tz) if days.tz is not None else labels
+    opening = index.normalize() + session_open(index)
+    return opening + ((index - opening) // width) * width
+
+def resample_bars(bars, interval):
+    # OHLCV bars of one ticker aggregated into `interval` bins, labelled by the
+    # bin start like Yahoo's bars. Bins without a bar are left out.
+    bars = bars.dropna(how='all')
+    if bars.empty:
+        return bars
+    aggregations = {column: AGGREGATIONS.get(column, 'last') for column in bars.columns}
+    grouped = bars.groupby(bin_labels(bars.index, interval), sort=True)
+    resampled = grouped.agg(aggregations)
+    if 'Volume' in resampled.columns:
+        # sum() turns a bin of missing volume into 0; keep it missing.
+        resampled['Volume'] = resampled['Volume'].where(grouped['Volume'].count() > 0)
+    resampled.index.name = bars.index.name
+    return resampled
+
+def resample_download(frame, tickers, interval):
+    # resample_bars over a yf.download-shaped frame, keeping its shape.
+    if frame is None or frame.empty:
+        return frame
+    if not isinstance(frame.columns, pd.MultiIndex):
+        return resample_bars(frame, interval)
+    frames = {
+        ticker: resample_bars(bars, interval)
+        for ticker, bars in split_download(frame, tickers).items()
+    }
+    frames = {ticker: bars for ticker, bars in frames.items() if not bars.empty}
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+def validate_derived(tickers, interval, start, end):
+    # Compares derived bars with the ones Yahoo serves for `interval` over the
+    # same window, per ticker. The last bar is left out since it's usually
+    # still forming in one of the two.
+    if interval not in DERIVED_FROM:
+        raise ValueError(f"{interval} is not a derived interval")
+    tickers = list(tickers)
+    provider = get_market_data()
+    request = tickers if len(tickers) > 1 else tickers[0]
+    upstream = split_download(provider.download(request, start=start, end=end, interval=interval, progress=False), tickers)
+    base = split_download(provider.download(request, start=start, end=end, interval=DERIVED_FROM[interval], progress=False), tickers)
+
+    report = {}
+    for ticker in tickers:
+        expected = upstream.get(ticker)
+        if expected is None or ticker not in base:
+            report[ticker] = {'error': 'no upstream bars'}
+            continue
+        derived = resample_bars(base[ticker], interval)
+        # Yahoo's windows don't always start on a bin boundary; compare the
+        # stretch both sides cover.
+        first = max(expected.index[0], derived.index[0])
+        last = min(expected.index[-1], derived.index[-1])
+        expected = expected[(expected.index >= first) & (expected.index < last)]
+        derived = derived[(derived.index >= first) & (derived.index < last)]
+        shared = expected.index.intersection(derived.index)
+        result = {
+            'upstream_bars': len(expected),
+            'derived_bars': len(derived),
+            'matched_bars': len(shared),
+            'missing_bars': [str(stamp) for stamp in expected.index.difference(derived.index)[:20]],
+            'extra_bars': [str(stamp) for stamp in derived.index.difference(expected.index)[:20]],
+        }
+        for column in ('Open', 'High', 'Low', 'Close', 'Volume'):
+            if column not in expected.columns or column not in derived.columns or shared.empty:
+                continue
+            want = expected.loc[shared, column].to_numpy(dtype=float)
+            got = derived.loc[shared, column].to_numpy(dtype=float)
+            scale = np.where(np.abs(want) > 0, np.abs(want), 1.0)
+            with np.errstate(invalid='ignore'):
+                relative = np.abs(got - want) / scale
+            result[f'max_{column.lower()}_error'] = float(np.nanmax(relative)) if np.isfinite(relative).any() else None
+        report[ticker] = result
+    return report
@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+import pandas as pd
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking on Windows; threads are still serialized.
+    fcntl = None
+
+# (score, squeeze) per (ticker, interval) from earlier scoring runs. A score
+# whose last bar was still forming is kept only until that bar closes, or the
+# session does if that comes first; one whose last bar had closed is kept until
+# the next bar is due to close. Runs 15 minutes apart then only recompute the
+# intraday intervals, and 1d, 5d and 1wk come from here for the rest of a
+# session. The file is shared by every process that scores (pool workers,
+# gunicorn workers). SCORE_CACHE_PATH= (empty) turns the cache off.
+SCORE_CACHE_PATH = os.environ.get('SCORE_CACHE_PATH', '.score_cache.json')
+# Regular session close, in the bars' own (exchange) time zone.
+SESSION_CLOSE = pd.Timedelta(os.environ.get('SESSION_CLOSE', '16:00:00'))
+INTERVAL_DURATIONS = {
+    '1m': pd.Timedelta('1min'),
+    '5m': pd.Timedelta('5min'),
+    '15m': pd.Timedelta('15min'),
+    '30m': pd.Timedelta('30min'),
+    '60m': pd.Timedelta('60min'),
+    '90m': pd.Timedelta('90min'),
+    '1h': pd.Timedelta('60min'),
+    '1d': pd.Timedelta('1D'),
+    '5d': pd.Timedelta('5D'),
+    '1wk': pd.Timedelta('7D'),
+}
+
+DAILY_INTERVALS = {'1d', '5d', '1wk'}
+
+_file_lock = threading.Lock()
+
+def _now(stamp, now=None):
+    # now in the same kind of time as stamp; naive stamps are local time.
+    if now is None:
+        return pd.Timestamp.now(tz=stamp.tz) if stamp.tzinfo is not None else pd.Timestamp.now()
+    now = pd.Timestamp(now)
+    return now.tz_convert(stamp.tz) if stamp.tzinfo is not None else now
+
+def _calendar_add(stamp, delta):
+    # stamp + delta on the wall clock, so whole days stay whole across DST.
+    if stamp.tzinfo is None:
+        return stamp + delta
+    return (stamp.tz_localize(None) + delta).tz_localize(stamp.tz)
+
+def session_close(day):
+    # SESSION_CLOSE on day's date, in day's time zone (DST-safe).
+    wall = day.tz_localize(None).normalize() + SESSION_CLOSE if day.tzinfo is not None else day.normalize() + SESSION_CLOSE
+    return wall.tz_localize(day.tz) if day.tzinfo is not None else wall
+
+def next_session_close(now):
+    close = session_close(now)
+    return close if now < close else session_close(now + pd.Timedelta('1D'))
+
+def bar_close(last_bar, interval):
+    # When the bar starting at last_bar stops changing: its end, or the close
+    # of its session when that comes first. Daily and longer bars are stamped
+    # at midnight and close at their last day's session close.
+    last_bar = pd.Timestamp(last_bar)
+    duration = INTERVAL_DURATIONS[interval]
+    if interval in DAILY_INTERVALS:
+        return session_close(_calendar_add(last_bar, duration - pd.Timedelta('1D')))
+    end = last_bar + duration
+    close = session_close(last_bar)
+    return min(end, close) if last_bar < close else end
+
+def next_close(last_bar, interval, now=None):
+    # Unix time when the first bar boundary after now passes, counted in
+    # whole intervals from the last bar's start. Daily and longer bars are
+    # stamped at midnight but trade until their session close, so for those
+    # it is the close of the first bar after last_bar that is still open.
+    duration = INTERVAL_DURATIONS[interval]
+    last_bar = pd.Timestamp(last_bar)
+    now = _now(last_bar, now)
+    if interval in DAILY_INTERVALS:
+        # Skip the whole bars elapsed, then step past any that already closed.
+        bars = max(1, (now - last_bar) // duration)
+        close = bar_close(_calendar_add(last_bar, duration * bars), interval)
+        while close <= now:
+            bars += 1
+            close = bar_close(_calendar_add(last_bar, duration * bars), interval)
+        return close.to_pydatetime().timestamp()
+    boundary = last_bar + duration * (max(0, (now - last_bar) // duration) + 1)
+    return boundary.to_pydatetime().timestamp()
+
+def valid_until(last_bar, interval, now=None):
+    # (unix time, whether the last bar had closed) for a score whose last bar
+    # starts at last_bar. A forming bar is only good until it closes, capped
+    # at the session close.
+    last_bar = pd.Timestamp(last_bar)
+    now = _now(last_bar, now)
+    close = bar_close(last_bar, interval)
+    if now < close:
+        return min(close, next_session_close(now)).to_pydatetime().timestamp(), False
+    return next_close(last_bar, interval, now), True
+
+class ScoreCache:
+    # A snapshot of the file taken by load(); put() changes it in memory and
+    # save() merges those changes back in under the file lock.
+    def __init__(self, path=SCORE_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.changed = {}
+
+    def _locked(self):
+        handle = open(self.path + '.lock', 'a')
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        with _file_lock:
+            self.entries = self._read()
+        self.changed = {}
+        return self
+
+    def get(self, tickers, interval):
+        # [(ticker, score, squeeze)] for the tickers in order when every one of
+        # them is cached and still current, else None. Tickers that had no bars
+        # last time are left out, as the scoring loop leaves them out.
+        cached = self.entries.get(interval, {})
+        now = time.time()
+        entries = []
+        for ticker in tickers:
+            entry = cached.get(ticker)
+            if entry is None or entry['valid_until'] <= now:
+                return None
+            if not entry['absent']:
+                entries.append((ticker, entry['score'], entry['squeeze']))
+        return entries
+
+    def put(self, tickers, interval, entries, last_bars):
+        # last_bars: {ticker: start of the last bar scored}.
+        if interval not in INTERVAL_DURATIONS:
+            return
+        scored = {ticker: (score, squeeze) for ticker, score, squeeze in entries}
+        updates = self.changed.setdefault(interval, {})
+        for ticker in tickers:
+            if ticker in scored and ticker in last_bars:
+                score, squeeze = scored[ticker]
+                until, complete = valid_until(last_bars[ticker], interval)
+                updates[ticker] = {
+                    'last_bar': pd.Timestamp(last_bars[ticker]).isoformat(),
+                    'complete': complete,
+                    'valid_until': until,
+                    'score': int(score) if score is not None else None,
+                    'squeeze': squeeze if isinstance(squeeze, (bool, type(None))) else str(squeeze),
+                    'absent': False,
+                }
+            elif ticker not in scored:
+                updates[ticker] = {
+                    'last_bar': None,
+                    'complete': False,
+                    'valid_until': time.time() + INTERVAL_DURATIONS[interval].total_seconds(),
+                    'score': None,
+                    'squeeze': None,
+                    'absent': True,
+                }
+        self.entries.setdefault(interval, {}).update(updates)
+
+    def save(self):
+        if not self.changed:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with _file_lock:
+            handle = self._locked()
+            try:
+                stored = self._read()
+                now = time.time()
+                for interval, updates in self.changed.items():
+                    kept = {
+                        ticker: entry for ticker, entry in stored.get(interval, {}).items()
+                        if entry['valid_until'] > now
+                    }
+                    kept.update(updates)
+                    stored[interval] = kept
+                temporary = self.path + '.tmp'
+                with open(temporary, 'w') as f:
+                    json.dump(stored, f)
+                os.replace(temporary, self.path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                handle.close()
+        self.changed = {}
+
+def open_score_cache(enabled=True):
+    # A loaded ScoreCache, or None when caching is off.
+    if not enabled or not SCORE_CACHE_PATH:
+        return None
+    return ScoreCache().load()
@@ -0,0 +1,88 @@
+import os
+import numpy as np
+from services.ticker_score_crud import as_utc, get_ticker_score_history
+
+HISTORY_COLUMNS = ['long_score', 'short_score']
+MAX_HISTORY_POINTS = int(os.environ.get('MAX_HISTORY_POINTS', '5000'))
+
+def _history_arrays(rows):
+    # {ticker: (epoch seconds, {column: float64 values, NULL as NaN})} from
+    # rows ordered by ticker then time.
+    grouped = {}
+    for ticker, created_at, long_score, short_score in rows:
+        grouped.setdefault(ticker, []).append((as_utc(created_at).timestamp(), long_score, short_score))
+
+    history = {}
+    for ticker, points in grouped.items():
+        values = np.array(points, dtype='float64')
+        history[ticker] = (values[:, 0], dict(zip(HISTORY_COLUMNS, values[:, 1:].T)))
+    return history
+
+def _last_in_bucket(times, low, high, max_points):
+    # Index of the last point in each of max_points equal-width time buckets
+    # over [low, high] that has any points; times must be sorted.
+    width = (high - low) / max_points or 1.0
+    buckets = np.clip(((times - low) // width).astype(np.int64), 0, max_points - 1)
+    return np.flatnonzero(np.append(buckets[1:] != buckets[:-1], True))
+
+def downsample(times, columns, max_points, low=None, high=None):
+    # At most max_points points, keeping the last one in each time bucket;
+    # a score is a snapshot, so the last one is what held at the bucket's end.
+    if len(times) <= max_points:
+        return times, columns
+    low = times[0] if low is None else low
+    high = times[-1] if high is None else high
+    keep = _last_in_bucket(times, low, high, max_points)
+    return times[keep], {name: values[keep] for name, values in columns.items()}
+
+def _json_scores(values):
+    return [None if np.isnan(value) else int(value) for value in values]
+
+def _bounds(start, end):
+    return (
+        as_utc(start).timestamp() if start is not None else None,
+        as_utc(end).timestamp() if end is not None else None,
+    )
+
+def score_history(db, symbol, start=None, end=None, max_points=500):
+    # Columnar long/short score history of one ticker, downsampled to at most
+    # max_points points.
+    history = _history_arrays(get_ticker_score_history(db, [symbol], as_utc(start), as_utc(end)))
+    times, columns = history.get(symbol, (np.empty(0), {name: np.empty(0) for name in HISTORY_COLUMNS}))
+    raw_points = len(times)
+    times, columns = downsample(times, columns, max_points, *_bounds(start, end))
+
+    return {
+        'symbol': symbol,
+        'time': times.tolist(),
+        **{name: _json_scores(values) for name, values in columns.items()},
+        'points': len(times),
+        'raw_points': raw_points,
+    }
+
+def aligned_score_history(db, symbols, start=None, end=None, max_points=500):
+    # Long/short score history of many tickers on one shared time axis, from a
+    # single query: each row of long_score/short_score lines up with symbols
+    # and holds that ticker's latest score at or before each time (None before
+    # its first one). The axis is every stored time, or the last time in each
+    # bucket when there are more than max_points.
+    history = _history_arrays(get_ticker_score_history(db, symbols, as_utc(start), as_utc(end)))
+    all_times = np.unique(np.concatenate([times for times, _ in history.values()])) if history else np.empty(0)
+    grid, _ = downsample(all_times, {}, max_points, *_bounds(start, end))
+
+    aligned = {name: [] for name in HISTORY_COLUMNS}
+    for symbol in symbols:
+        times, columns = history.get(symbol, (np.empty(0), {name: np.empty(0) for name in HISTORY_COLUMNS}))
+        positions = np.searchsorted(times, grid, side='right') - 1
+        for name in HISTORY_COLUMNS:
+            values = np.full(len(grid), np.nan)
+            found = positions >= 0
+            values[found] = columns[name][positions[found]]
+            aligned[name].append(_json_scores(values))
+
+    return {
+        'symbols': list(symbols),
+        'time': grid.tolist(),
+        **aligned,
+        'points': len(grid),
+    }
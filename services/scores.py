@@ -1,13 +1,22 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 import numpy as np
 import pandas as pd
 from requests import Session
-import yfinance as yf
-import pandas_ta as ta
 import warnings
 from schemas.symbols_schema import SymbolCreate
 from services.symbol_crud import create_symbol, get_symbol_names
+from services.indicators import IndicatorGraph
+from services.fundamentals import get_fundamentals
+from services.panel import build_panel, score_conditions, score_panel
+from services.bar_store import download_bar_batch
+from services.resample import base_interval, resample_download
+from services.score_cache import open_score_cache
+from utils.executors import process_pool
+from utils.metrics import metrics
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 def calculate_ticker_score_from_data(data, atr_period=9, atr_factor=2.4, bb_num_dev=2.0, bb_length=20, kc_factor=1.75):
@@ -15,37 +24,31 @@ def calculate_ticker_score_from_data(data, atr_period=9, atr_factor=2.4, bb_num_
         return None
     
     try:
-        def safe_macd(close_series):
+        def safe_macd(graph):
             try:
-                return ta.macd(close_series, fast=24, slow=52, signal=9)['MACDh_24_52_9']
+                return graph.get('macd', fast=24, slow=52, signal=9)['MACDh_24_52_9']
             except Exception:
-                return pd.Series([0] * len(close_series), index=close_series.index)
+                return pd.Series([0] * len(graph.data), index=graph.data.index)
         
-        def safe_ta_calc(func, series, **kwargs):
+        def safe_ta_calc(graph, name, **params):
             try:
-                return func(series, **kwargs)
+                return graph.get(name, **params)
             except Exception:
-                return pd.Series([0] * len(series), index=series.index)
+                return pd.Series([0] * len(graph.data), index=graph.data.index)
         
-        def calculate_squeeze(close, high, low, bb_length=20):
-            atr_length = 14
-            atr1_multiplier = 1.5
-            atr = ta.atr(high, low, close, length=atr_length)
-            atr1 = atr * atr1_multiplier
-
+        def calculate_squeeze(graph, bb_length=20):
             bb_mult = 2.0
             kc_mult_high = 1.0
             kc_mult_mid = 1.5
             kc_mult_low = 2.0
 
-            bb = ta.bbands(close, length=bb_length, std=bb_mult)
+            bb = graph.get('bbands', length=bb_length, std=bb_mult)
             bb_basis = bb['BBM_20_2.0']
             bb_upper = bb['BBU_20_2.0']
             bb_lower = bb['BBL_20_2.0']
 
-            tr = ta.true_range(high, low, close)
-            atr = ta.sma(tr, bb_length)
-            kc_basis = ta.sma(close, bb_length)
+            atr = graph.get('sma', source='true_range', length=bb_length)
+            kc_basis = graph.get('sma', source='Close', length=bb_length)
 
             kc_upper_high = kc_basis + atr * kc_mult_high
             kc_lower_high = kc_basis - atr * kc_mult_high
@@ -68,15 +71,18 @@ def calculate_ticker_score_from_data(data, atr_period=9, atr_factor=2.4, bb_num_
             else:
                 return "no squeeze"
         
-        data['md'] = safe_macd(data['Close'])
-        data['sma200'] = safe_ta_calc(ta.sma, data['Close'], length=min(200, len(data)))
-        data['sma50'] = safe_ta_calc(ta.sma, data['Close'], length=min(50, len(data)))
-        data['ema8'] = safe_ta_calc(ta.ema, data['Close'], length=min(8, len(data)))
-        data['ema34'] = safe_ta_calc(ta.ema, data['Close'], length=min(34, len(data)))
-        data['ema21'] = safe_ta_calc(ta.ema, data['Close'], length=min(21, len(data)))
-        data['ema5'] = safe_ta_calc(ta.ema, data['Close'], length=min(5, len(data)))
+        graph = IndicatorGraph(data)
+        data['md'] = safe_macd(graph)
+        data['sma200'] = safe_ta_calc(graph, 'sma', source='Close', length=min(200, len(data)))
+        data['sma50'] = safe_ta_calc(graph, 'sma', source='Close', length=min(50, len(data)))
+        data['ema8'] = safe_ta_calc(graph, 'ema', source='Close', length=min(8, len(data)))
+        data['ema34'] = safe_ta_calc(graph, 'ema', source='Close', length=min(34, len(data)))
+        data['ema21'] = safe_ta_calc(graph, 'ema', source='Close', length=min(21, len(data)))
+        data['ema5'] = safe_ta_calc(graph, 'ema', source='Close', length=min(5, len(data)))
         
         data = data.fillna(method='ffill').fillna(method='bfill').fillna(0)
+        # Everything below reads the filled prices, so it gets its own graph.
+        filled = IndicatorGraph(data)
         
         data['is_sloping_lower_50'] = data['sma50'] < data['sma50'].shift(1).fillna(0)
         data['is_sloping_lower_21'] = data['ema21'] < data['ema21'].shift(1).fillna(0)
@@ -85,7 +91,7 @@ def calculate_ticker_score_from_data(data, atr_period=9, atr_factor=2.4, bb_num_
         data['is_sloping_higher_21'] = data['ema21'] > data['ema21'].shift(1).fillna(0)
         data['is_sloping_higher_200'] = data['sma200'] > data['sma200'].shift(1).fillna(0)
         
-        tr = ta.true_range(data['High'], data['Low'], data['Close'], length=min(atr_period, len(data)))
+        tr = filled.get('true_range')
         tr = tr.fillna(0)
         data['trail'] = data['Close'] - (atr_factor * tr.rolling(window=min(atr_period, len(data))).mean().fillna(0))
         
@@ -96,52 +102,13 @@ def calculate_ticker_score_from_data(data, atr_period=9, atr_factor=2.4, bb_num_
                     (data['ema8'] < data['ema21']) & 
                     (data['ema21'] < data['ema34']))
 
-        bull_conditions = [
-            data['md'] > 0,
-            data['is_sloping_higher_50'],
-            data['is_sloping_higher_21'],
-            data['is_sloping_higher_200'],
-            data['sp'],
-            data['Close'] > data['ema21'],
-            data['Close'] > data['sma50'],
-            data['Close'] > data['sma200'],
-            data['ema8'] > data['ema21'],
-            data['ema8'] > data['sma50'],
-            data['ema8'] > data['sma200'],
-            data['ema21'] > data['sma50'],
-            data['ema21'] > data['sma200'],
-            data['sma50'] > data['sma200'],
-            data['Close'] > data['trail'],
-        ]
-        
-        bear_conditions = [
-            data['md'] < 0,
-            data['is_sloping_lower_50'],
-            data['is_sloping_lower_21'],
-            data['is_sloping_lower_200'],
-            data['sn'],
-            data['Close'] < data['ema21'],
-            data['Close'] < data['sma50'],
-            data['Close'] < data['sma200'],
-            data['ema8'] < data['ema21'],
-            data['ema21'] < data['sma50'],
-            data['ema8'] < data['sma200'],
-            data['ema21'] < data['sma50'],
-            data['ema21'] < data['sma200'],
-            data['sma50'] < data['sma200'],
-            data['Close'] < data['trail'],
-        ]
+        bull_conditions, bear_conditions = score_conditions(data)
         
         data['bull_score'] = sum(cond.astype(int) for cond in bull_conditions)
         data['bear_score'] = sum(cond.astype(int) for cond in bear_conditions)
         data['score'] = data['bull_score'] - data['bear_score']
 
-        squeeze = calculate_squeeze(
-            data['Close'], 
-            data['High'], 
-            data['Low'], 
-            bb_length=bb_length
-        )
+        squeeze = calculate_squeeze(filled, bb_length=bb_length)
         
         score = int(data['score'].iloc[-1]) if not pd.isna(data['score'].iloc[-1]) else 0
         return score, squeeze
@@ -210,9 +177,8 @@ def add_ticker_to_file_and_db(
         return False, f"Invalid category ID. Must be one of: {', '.join(map(str, valid_category_ids))}"
 
     try:
-        # Verify if it's a valid ticker using yfinance
-        ticker_info = yf.Ticker(ticker)
-        ticker_name = ticker_info.info.get('longName', ticker)
+        # Verify if it's a valid ticker
+        ticker_name = get_fundamentals().info(ticker, fields=('longName',)).get('longName', ticker)
         
         # Check if ticker exists in database
         existing_symbols = get_symbol_names(db)
@@ -275,148 +241,399 @@ def load_tickers(filename: str) -> Tuple[List[str], Dict[str, str], Dict[str, in
     
     return tickers, ticker_names, ticker_categories
 
-def calculate_ticker_scores_multiframe(
-    tickers_file='tickers.txt',
-    intervals=['15m', '30m', '90m', '1h', '1d', '5d', '1wk'],
-    batch_size=10,
-    single_ticker=None,
-    category_id=None  
-):
-    if single_ticker:
-        if category_id is None:
-            raise ValueError("category_id must be provided when adding a single ticker")
-        
-        tickers = [single_ticker]
-        ticker_names = {single_ticker: single_ticker}
-        ticker_categories = {single_ticker: category_id}
-        
-    else:
-        tickers, ticker_names, ticker_categories = load_tickers(tickers_file)
+SCORE_INFO_FIELDS = ('currentPrice', 'navPrice', 'sector')
+INTERVAL_SCORE_COLUMNS = {
+    '1wk': ('w_score', 'w_squeeze'),
+    '1d': ('d_score', 'd_squeeze'),
+    '5d': ('five_d_score', 'five_d_squeeze'),
+    '1h': ('one_h_score', 'one_h_squeeze'),
+    '90m': ('ninety_m_score', 'ninety_m_squeeze'),
+    '30m': ('thirty_m_score', 'thirty_m_squeeze'),
+    '15m': ('fifteen_m_score', 'fifteen_m_squeeze')
+}
+# Parallel runs: SCORE_WORKERS processes score, SCORE_DOWNLOAD_WORKERS threads
+# download. SCORE_WORKERS=0 (the default) keeps the serial loop.
+SCORE_WORKERS = int(os.environ.get('SCORE_WORKERS', '0'))
+SCORE_DOWNLOAD_WORKERS = int(os.environ.get('SCORE_DOWNLOAD_WORKERS', '4'))
 
-    ticker_batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
-    all_results = []
+def _batch_info(ticker_batch):
+    current_prices = {}
+    sectors = {}
+    for ticker in ticker_batch:
+        try:
+            info = get_fundamentals().info(ticker, fields=SCORE_INFO_FIELDS)
+            price = info.get('currentPrice')
+            if price is not None and pd.notna(price) and not np.isinf(price):
+                current_prices[ticker] = float(price)
+            else:
+                price = info.get('navPrice')
+                if price is not None and pd.notna(price) and not np.isinf(price):
+                    current_prices[ticker] = float(price)
+                else:
+                    current_prices[ticker] = None
+
+            sector = info.get('sector', 'N/A')
+            sectors[ticker] = sector
+
+        except Exception as e:
+            print(f"Error fetching data for {ticker}: {str(e)}")
+            current_prices[ticker] = None
+            sectors[ticker] = 'N/A'
+    return current_prices, sectors
+
+def load_ticker_info(tickers):
+    # ({ticker: current price}, {ticker: sector}) for a run, loading whatever
+    # info isn't cached yet in parallel. The fundamentals cache is per process:
+    # the endpoints call this in the API process, where the cache stays warm
+    # between runs and its stats reach /metrics, and hand the result to the
+    # run in the process pool.
+    get_fundamentals().warm(tickers, fields=SCORE_INFO_FIELDS)
+    return _batch_info(tickers)
+
+def _download_window(interval):
+    end_date = datetime.now()
     
-    for batch_num, ticker_batch in enumerate(ticker_batches, 1):
-        print(f"Processing batch {batch_num}/{len(ticker_batches)} ({len(ticker_batch)} tickers)")
-        batch_results = []
+    if interval in ['1m', '5m']:
+        start_date = end_date - timedelta(days=7)       
+    elif interval in ['15m', '30m', '60m', '90m']:
+        start_date = end_date - timedelta(days=60)
+    else:
+        start_date = end_date - timedelta(days=365*2)
+    return start_date, end_date
+
+def _download_base(ticker_batch, interval):
+    # Bars of the interval that gets downloaded for `interval`, over its window;
+    # derived intervals (30m from 15m, 1wk from 1d...) are resampled later.
+    start_date, end_date = _download_window(interval)
+    return download_bar_batch(ticker_batch, interval, start_date, end_date)
+
+def _add_seconds(timings, stage, started):
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+def _last_bars(multi_data, ticker_batch):
+    # {ticker: start of its last bar with a close}
+    if not isinstance(multi_data.columns, pd.MultiIndex):
+        last = multi_data['Close'].last_valid_index()
+        return {ticker: last for ticker in ticker_batch} if last is not None else {}
+    last_bars = {}
+    for ticker in ticker_batch:
+        if ('Close', ticker) in multi_data.columns:
+            last = multi_data[('Close', ticker)].last_valid_index()
+            if last is not None:
+                last_bars[ticker] = last
+    return last_bars
+
+def _score_interval(ticker_batch, interval, base_data, timings, last_bars=None):
+    # [(ticker, score, squeeze)] for one batch and interval, in the order the
+    # tickers were scored; score is None for too little data. Tickers without
+    # bars are left out. Fills last_bars, when given, for the score cache.
+    entries = []
+    try:
+        started = time.perf_counter()
+        if base_interval(interval) != interval:
+            multi_data = resample_download(base_data, ticker_batch, interval)
+        else:
+            multi_data = base_data
+        _add_seconds(timings, 'resample', started)
+        
+        if multi_data is None or multi_data.empty:
+            return entries
+        if last_bars is not None:
+            last_bars.update(_last_bars(multi_data, ticker_batch))
+
+        started = time.perf_counter()
+        # Complete tickers are scored together; the rest go one by one below.
+        panel_scores = {}
+        if isinstance(multi_data.columns, pd.MultiIndex):
+            panel, panel_tickers = build_panel(multi_data, ticker_batch)
+            if panel is not None:
+                panel_scores = score_panel(panel, panel_tickers)
+                del panel
 
-        current_prices = {}
-        sectors = {}
         for ticker in ticker_batch:
             try:
-                stock = yf.Ticker(ticker)
-                price = stock.info.get('currentPrice')
-                if price is not None and pd.notna(price) and not np.isinf(price):
-                    current_prices[ticker] = float(price)
+                if ticker in panel_scores:
+                    score, squeeze = panel_scores[ticker]
                 else:
-                    price = stock.info.get('navPrice')
-                    if price is not None and pd.notna(price) and not np.isinf(price):
-                        current_prices[ticker] = float(price)
+                    if isinstance(multi_data.columns, pd.MultiIndex):
+                        ticker_data = pd.DataFrame({
+                            'Close': multi_data[('Close', ticker)],
+                            'High': multi_data[('High', ticker)],
+                            'Low': multi_data[('Low', ticker)],
+                            'Open': multi_data[('Open', ticker)],
+                            'Volume': multi_data[('Volume', ticker)]
+                        })
                     else:
-                        current_prices[ticker] = None
+                        ticker_data = multi_data
+
+                    if ticker_data.empty:
+                        continue
 
-                sector = stock.info.get('sector', 'N/A')
-                sectors[ticker] = sector
+                    score, squeeze = calculate_ticker_score_from_data(ticker_data)
+                
+                entries.append((ticker, score, squeeze))
 
             except Exception as e:
-                print(f"Error fetching data for {ticker}: {str(e)}")
-                current_prices[ticker] = None
-                sectors[ticker] = 'N/A'
+                print(f"Error processing {ticker} in {interval}: {str(e)}")
+                continue
 
+        del multi_data
+        _add_seconds(timings, 'score', started)
+        
+    except Exception as e:
+        print(f"Error processing interval {interval}: {str(e)}")
+    return entries
+
+def _score_interval_task(ticker_batch, interval, base_data):
+    # _score_interval in a pool process; timings come back with the entries.
+    timings = {}
+    last_bars = {}
+    entries = _score_interval(ticker_batch, interval, base_data, timings, last_bars)
+    return entries, timings, last_bars
+
+def _merge_batch(interval_entries, ticker_names, ticker_categories, current_prices, sectors):
+    # Results for one batch from its (interval, entries) pairs, in the
+    # intervals' order, so tickers come out in the order the loop met them.
+    batch_results = []
+    by_ticker = {}
+    for interval, entries in interval_entries:
+        for ticker, score, squeeze in entries:
+            ticker_result = by_ticker.get(ticker)
+            if ticker_result is None:
+                ticker_result = by_ticker[ticker] = {
+                    'ticker_symbol': ticker,
+                    'ticker_name': ticker_names.get(ticker, ticker),
+                    'current_price': current_prices.get(ticker) if current_prices.get(ticker) is not None else 0.0,
+                    'sector': sectors.get(ticker, 'N/A'),
+                    'category_id': ticker_categories.get(ticker)
+                }
+                batch_results.append(ticker_result)
+
+            if score is not None and interval in INTERVAL_SCORE_COLUMNS:
+                score_key, squeeze_key = INTERVAL_SCORE_COLUMNS[interval]
+                ticker_result[score_key] = score
+                ticker_result[squeeze_key] = squeeze
+    
+    for ticker_result in batch_results:
+        long_score_columns = ['w_score', 'd_score', 'five_d_score', 'one_h_score', 
+                            'ninety_m_score', 'thirty_m_score', 'fifteen_m_score']
+        short_score_columns = ['fifteen_m_score', 'thirty_m_score', 'ninety_m_score', 'one_h_score']
+        
+        ticker_result['long_score'] = sum(ticker_result.get(col, 0) for col in long_score_columns)
+        ticker_result['short_score'] = sum(ticker_result.get(col, 0) for col in short_score_columns)
+        
+        ticker_result['long_rank'] = get_long_rank(ticker_result['long_score'])
+        ticker_result['short_rank'] = get_short_rank(ticker_result['short_score'])
+        ticker_result['trend'] = determine_trend(ticker_result['long_rank'], ticker_result['short_rank'])
+    return batch_results
+
+def _cached_entries(cache, ticker_batch, interval):
+    # Entries from the score cache when every ticker of the batch has a
+    # current one, else None.
+    if cache is None:
+        return None
+    entries = cache.get(ticker_batch, interval)
+    metrics.increment('scores.cache_hits' if entries is not None else 'scores.cache_misses')
+    return entries
+
+def _score_batch(ticker_batch, intervals, timings, cache=None):
+    # [(interval, entries)] for one batch; each base interval is downloaded once,
+    # and only when some interval needing it isn't cached.
+    scored = []
+    downloaded = {}
+    for interval in intervals:
+        entries = _cached_entries(cache, ticker_batch, interval)
+        if entries is not None:
+            scored.append((interval, entries))
+            continue
+        fetched_interval = base_interval(interval)
+        if fetched_interval not in downloaded:
+            started = time.perf_counter()
+            try:
+                downloaded[fetched_interval] = _download_base(ticker_batch, fetched_interval)
+            except Exception as e:
+                downloaded[fetched_interval] = e
+            _add_seconds(timings, 'download', started)
+        if isinstance(downloaded[fetched_interval], Exception):
+            print(f"Error processing interval {interval}: {str(downloaded[fetched_interval])}")
+            continue
+        last_bars = {}
+        entries = _score_interval(ticker_batch, interval, downloaded[fetched_interval], timings, last_bars)
+        if cache is not None:
+            cache.put(ticker_batch, interval, entries, last_bars)
+        scored.append((interval, entries))
+    del downloaded
+    return scored
+
+def _score_batches_serial(ticker_batches, intervals, timings, cache=None):
+    # {batch number: [(interval, entries)]}
+    scored = {}
+    for batch_num, ticker_batch in enumerate(ticker_batches, 1):
+        print(f"Processing batch {batch_num}/{len(ticker_batches)} ({len(ticker_batch)} tickers)")
+        scored[batch_num] = _score_batch(ticker_batch, intervals, timings, cache)
+    return scored
+
+def _timed_download(ticker_batch, interval):
+    started = time.perf_counter()
+    try:
+        return _download_base(ticker_batch, interval), None, time.perf_counter() - started
+    except Exception as e:
+        return None, e, time.perf_counter() - started
+
+def _score_batches_parallel(ticker_batches, intervals, workers, download_workers, timings, cache=None):
+    # Downloads run on their own thread pool, so at most download_workers
+    # requests hit Yahoo at once however many processes score. Each (batch,
+    # interval) is scored in a process as soon as its bars are in.
+    print(f"Processing {len(ticker_batches)} batches on {workers} workers")
+    scored = {}
+    errors = {}
+    # (batch number, base interval) -> the intervals that need its bars
+    needed = {}
+    for batch_num, ticker_batch in enumerate(ticker_batches, 1):
         for interval in intervals:
-            end_date = datetime.now()
-            
-            if interval in ['1m', '5m']:
-                start_date = end_date - timedelta(days=7)       
-            elif interval in ['15m', '30m', '60m', '90m']:
-                start_date = end_date - timedelta(days=60)
+            entries = _cached_entries(cache, ticker_batch, interval)
+            if entries is not None:
+                scored[(batch_num, interval)] = entries
             else:
-                start_date = end_date - timedelta(days=365*2)
-            
-            try:
-                multi_data = yf.download(
-                    ticker_batch,
-                    start=start_date,
-                    end=end_date,
-                    interval=interval,
-                    progress=False
-                )
-                
-                if multi_data.empty:
+                needed.setdefault((batch_num, base_interval(interval)), []).append(interval)
+
+    # The scoring processes outlive the run, so later runs skip their start-up.
+    scoring = process_pool('score', workers)
+    with ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix='score-download') as downloads:
+        pending = {
+            downloads.submit(_timed_download, ticker_batches[batch_num - 1], fetched_interval): (batch_num, fetched_interval)
+            for batch_num, fetched_interval in needed
+        }
+        for future in as_completed(pending):
+            batch_num, fetched_interval = pending[future]
+            base_data, error, seconds = future.result()
+            timings['download'] = timings.get('download', 0.0) + seconds
+            for interval in needed[(batch_num, fetched_interval)]:
+                if error is not None:
+                    errors[(batch_num, interval)] = error
                     continue
+                scored[(batch_num, interval)] = scoring.submit(_score_interval_task, ticker_batches[batch_num - 1], interval, base_data)
+            del base_data
 
-                for ticker in ticker_batch:
-                    try:
-                        if isinstance(multi_data.columns, pd.MultiIndex):
-                            ticker_data = pd.DataFrame({
-                                'Close': multi_data[('Close', ticker)],
-                                'High': multi_data[('High', ticker)],
-                                'Low': multi_data[('Low', ticker)],
-                                'Open': multi_data[('Open', ticker)],
-                                'Volume': multi_data[('Volume', ticker)]
-                            })
-                        else:
-                            ticker_data = multi_data
-
-                        if ticker_data.empty:
-                            continue
-
-                        score, squeeze = calculate_ticker_score_from_data(ticker_data)
-                        
-                        ticker_result = next((r for r in batch_results if r['ticker_symbol'] == ticker), None)
-                        if ticker_result is None:
-                            ticker_result = {
-                                'ticker_symbol': ticker,
-                                'ticker_name': ticker_names.get(ticker, ticker),
-                                'current_price': current_prices[ticker] if current_prices[ticker] is not None else 0.0,
-                                'sector': sectors[ticker],
-                                'category_id': ticker_categories.get(ticker)
-                            }
-                            batch_results.append(ticker_result)
-
-                        if score is not None:
-                            interval_mapping = {
-                                '1wk': ('w_score', 'w_squeeze'),
-                                '1d': ('d_score', 'd_squeeze'),
-                                '5d': ('five_d_score', 'five_d_squeeze'),
-                                '1h': ('one_h_score', 'one_h_squeeze'),
-                                '90m': ('ninety_m_score', 'ninety_m_squeeze'),
-                                '30m': ('thirty_m_score', 'thirty_m_squeeze'),
-                                '15m': ('fifteen_m_score', 'fifteen_m_squeeze')
-                            }
-                            
-                            if interval in interval_mapping:
-                                score_key, squeeze_key = interval_mapping[interval]
-                                ticker_result[score_key] = score
-                                ticker_result[squeeze_key] = squeeze
-
-                    except Exception as e:
-                        print(f"Error processing {ticker} in {interval}: {str(e)}")
-                        continue
+        merged = {}
+        for batch_num in range(1, len(ticker_batches) + 1):
+            merged[batch_num] = []
+            for interval in intervals:
+                if (batch_num, interval) in errors:
+                    print(f"Error processing interval {interval}: {str(errors[(batch_num, interval)])}")
+                    continue
+                entries = scored[(batch_num, interval)]
+                if not isinstance(entries, list):
+                    entries, task_timings, last_bars = entries.result()
+                    for stage, seconds in task_timings.items():
+                        timings[stage] = timings.get(stage, 0.0) + seconds
+                    if cache is not None:
+                        cache.put(ticker_batches[batch_num - 1], interval, entries, last_bars)
+                merged[batch_num].append((interval, entries))
+    return merged
 
-                del multi_data
-                
-            except Exception as e:
-                print(f"Error processing interval {interval}: {str(e)}")
-                continue
+SCORE_INTERVALS = ['15m', '30m', '90m', '1h', '1d', '5d', '1wk']
+SCORE_COLUMNS = [
+    'ticker_symbol', 'ticker_name', 'current_price', 'sector', 'category_id',
+    'w_score', 'w_squeeze', 
+    'd_score', 'd_squeeze', 
+    'five_d_score', 'five_d_squeeze', 
+    'one_h_score', 'one_h_squeeze', 
+    'ninety_m_score', 'ninety_m_squeeze', 
+    'thirty_m_score', 'thirty_m_squeeze', 
+    'fifteen_m_score', 'fifteen_m_squeeze', 
+    'long_score', 'short_score', 
+    'long_rank', 'short_rank', 'trend'
+]
+
+def load_score_batches(tickers_file='tickers.txt', batch_size=10, single_ticker=None, category_id=None):
+    # (ticker batches, names, category ids) for a scoring run.
+    if single_ticker:
+        if category_id is None:
+            raise ValueError("category_id must be provided when adding a single ticker")
         
-        for ticker_result in batch_results:
-            long_score_columns = ['w_score', 'd_score', 'five_d_score', 'one_h_score', 
-                                'ninety_m_score', 'thirty_m_score', 'fifteen_m_score']
-            short_score_columns = ['fifteen_m_score', 'thirty_m_score', 'ninety_m_score', 'one_h_score']
-            
-            ticker_result['long_score'] = sum(ticker_result.get(col, 0) for col in long_score_columns)
-            ticker_result['short_score'] = sum(ticker_result.get(col, 0) for col in short_score_columns)
-            
-            ticker_result['long_rank'] = get_long_rank(ticker_result['long_score'])
-            ticker_result['short_rank'] = get_short_rank(ticker_result['short_score'])
-            ticker_result['trend'] = determine_trend(ticker_result['long_rank'], ticker_result['short_rank'])
+        tickers = [single_ticker]
+        ticker_names = {single_ticker: single_ticker}
+        ticker_categories = {single_ticker: category_id}
         
-        all_results.extend(batch_results)
-        del batch_results
+    else:
+        tickers, ticker_names, ticker_categories = load_tickers(tickers_file)
+
+    ticker_batches = [tickers[i:i + batch_size] for i in range(0, len(tickers), batch_size)]
+    return ticker_batches, ticker_names, ticker_categories
+
+def score_ticker_batch(ticker_batch, ticker_names, ticker_categories, intervals=SCORE_INTERVALS, use_cache=True, ticker_info=None):
+    # One batch of a run on its own, with the same results the full run gives
+    # for it, for callers that hand results out batch by batch. ticker_info is
+    # load_ticker_info() of the batch when the caller already has it.
+    current_prices, sectors = load_ticker_info(ticker_batch) if ticker_info is None else ticker_info
+    cache = open_score_cache(use_cache)
+    scored = _score_batch(ticker_batch, intervals, {}, cache)
+    if cache is not None:
+        cache.save()
+    return _merge_batch(scored, ticker_names, ticker_categories, current_prices, sectors)
+
+def score_record(result):
+    # One result as a row of the run's DataFrame: every score column, missing
+    # scores as 0 and a usable price.
+    record = {column: result.get(column, 0) for column in SCORE_COLUMNS}
+    price = record['current_price']
+    if price is None or pd.isna(price) or np.isinf(price):
+        record['current_price'] = 0.0
+    if 'score_change_trend' in result:
+        record['score_change_trend'] = result['score_change_trend']
+    return record
+
+def calculate_ticker_scores_multiframe(
+    tickers_file='tickers.txt',
+    intervals=SCORE_INTERVALS,
+    batch_size=10,
+    single_ticker=None,
+    category_id=None,
+    workers=None,
+    download_workers=None,
+    timings=None,
+    use_cache=True,
+    ticker_info=None
+):
+    # workers > 0 scores batches and intervals in that many processes; the
+    # results are the same as the serial run's, in the same order. Pass a dict
+    # as `timings` to get seconds per stage (summed over workers) and the
+    # wall-clock total back. use_cache=False recomputes every interval.
+    # ticker_info is load_ticker_info() of the run's tickers when the caller
+    # already has it.
+    workers = SCORE_WORKERS if workers is None else workers
+    download_workers = SCORE_DOWNLOAD_WORKERS if download_workers is None else download_workers
+    timings = {} if timings is None else timings
+    run_started = time.perf_counter()
+
+    ticker_batches, ticker_names, ticker_categories = load_score_batches(tickers_file, batch_size, single_ticker, category_id)
+    tickers = [ticker for ticker_batch in ticker_batches for ticker in ticker_batch]
+    all_results = []
+
+    started = time.perf_counter()
+    current_prices, sectors = load_ticker_info(tickers) if ticker_info is None else ticker_info
+    _add_seconds(timings, 'info', started)
+
+    cache = open_score_cache(use_cache)
+    if workers > 0 and len(ticker_batches) * len(intervals) > 1:
+        scored = _score_batches_parallel(ticker_batches, intervals, workers, download_workers, timings, cache)
+    else:
+        scored = _score_batches_serial(ticker_batches, intervals, timings, cache)
+    if cache is not None:
+        cache.save()
+
+    started = time.perf_counter()
+    for batch_num in range(1, len(ticker_batches) + 1):
+        all_results.extend(_merge_batch(scored[batch_num], ticker_names, ticker_categories, current_prices, sectors))
+    _add_seconds(timings, 'merge', started)
+    timings['total'] = time.perf_counter() - run_started
+
+    for stage, seconds in timings.items():
+        metrics.observe(f'scores.{stage}_seconds', seconds)
     
     if not all_results:
-        return pd.DataFrame()
+        return pd.DataFrame(columns=SCORE_COLUMNS), []
     
     results_df = pd.DataFrame(all_results)
 
@@ -424,19 +641,6 @@ def calculate_ticker_scores_multiframe(
         results_df['current_price'] = results_df['current_price'].fillna(0.0)
         results_df['current_price'] = results_df['current_price'].replace([float('inf'), float('-inf')], 0.0)
     
-    columns_order = [
-        'ticker_symbol', 'ticker_name', 'current_price', 'sector', 'category_id',
-        'w_score', 'w_squeeze', 
-        'd_score', 'd_squeeze', 
-        'five_d_score', 'five_d_squeeze', 
-        'one_h_score', 'one_h_squeeze', 
-        'ninety_m_score', 'ninety_m_squeeze', 
-        'thirty_m_score', 'thirty_m_squeeze', 
-        'fifteen_m_score', 'fifteen_m_squeeze', 
-        'long_score', 'short_score', 
-        'long_rank', 'short_rank', 'trend'
-    ]
-    
-    results_df = results_df.reindex(columns=columns_order, fill_value=0)
+    results_df = results_df.reindex(columns=SCORE_COLUMNS, fill_value=0)
     
     return results_df, all_results
\ No newline at end of file
@@ -1,15 +1,35 @@
+import os
 from datetime import datetime, timedelta
 import pandas as pd
 import pandas_ta as ta # type: ignore
-import yfinance as yf # type: ignore
 import numpy as np
-
-def calculate_ripster_signals(data, do_arrows=True, slope_degree=45, volumeLength=50):
+from services.indicators import PRICE_COLUMNS, IndicatorGraph
+from services.bar_pyramid import BarPyramid, get_bar_pyramid
+from services.bar_store import download_bars
+from utils.metrics import metrics
+
+def _latched_cross_kernel(trigger, cond):
+    # A trigger bar arms the latch, which stays armed until the first bar where
+    # cond holds; that bar fires and disarms it. So bar i fires iff cond[i] holds,
+    # some trigger happened at or before i, and no cond bar sits between the last
+    # trigger and i -- which can be resolved with two running maxima instead of
+    # walking the bars one by one.
+    positions = np.arange(len(trigger))
+    last_trigger = np.maximum.accumulate(np.where(trigger, positions, -1))
+    last_cond = np.maximum.accumulate(np.where(cond, positions, -1))
+    prev_cond = np.empty_like(last_cond)
+    prev_cond[:1] = -1
+    prev_cond[1:] = last_cond[:-1]
+    return cond & (last_trigger >= 0) & (prev_cond < last_trigger)
+
+def calculate_ripster_signals(data, do_arrows=True, slope_degree=45, volumeLength=50, graph=None):
+    if graph is None:
+        graph = IndicatorGraph(data)
     
-    data['ema5'] = data['Close'].ewm(span=5, adjust=False).mean()
-    data['ema12'] = data['Close'].ewm(span=12, adjust=False).mean()
+    data['ema5'] = graph.get('ewm', source='Close', span=5)
+    data['ema12'] = graph.get('ewm', source='Close', span=12)
 
-    data['avgVol'] = ta.sma(data['Volume'], volumeLength)
+    data['avgVol'] = graph.get('sma', source='Volume', length=volumeLength)
     data['high_volume'] = data['Volume'] > data['avgVol']
 
     data['isRedCandle'] = data['Open'] > data['Close'] 
@@ -34,58 +54,102 @@ def calculate_ripster_signals(data, do_arrows=True, slope_degree=45, volumeLengt
         data['ripster_signal_up'] = False
         data['ripster_signal_down'] = False
 
-    data['RSI'] = ta.rsi(data['Close'], length=14)
+    data['RSI'] = graph.get('rsi', length=14)
    
+    # Initialize columns with False
+    data['upperVwapCrossYellow'] = False
+    data['lowerVwapCrossYellow'] = False
+    
+    if do_arrows:  # Only calculate these signals if do_arrows is True
+        data = calculate_yellow_cross_signals(data)
+
+    return data
+
+def calculate_yellow_cross_signals(data):
+    # upperVwapCrossYellow / lowerVwapCrossYellow from RSI, the candle and the
+    # MACD histogram step.
+    rsi = data['RSI'].to_numpy(dtype=float)
+    close = data['Close'].to_numpy(dtype=float)
+    open_ = data['Open'].to_numpy(dtype=float)
+    macdh = data['MACDh_12_26_9'].to_numpy(dtype=float)
+    # bar 0 compares against the last bar, same as the old iloc[i-1] loop did
+    prev_macdh = np.roll(macdh, 1)
+
+    data['upperVwapCrossYellow'] = _latched_cross_kernel(rsi > 70, (close < open_) & (macdh < prev_macdh))
+    data['lowerVwapCrossYellow'] = _latched_cross_kernel(rsi < 30, (close > open_) & (macdh > prev_macdh))
+    return data
+
+def calculate_yellow_cross_signals_reference(data):
+    # Original per-row implementation, kept to check calculate_yellow_cross_signals against.
     resetUpper = 1
     resetLower = 1
     upperVwapCrossYellow = 0
     lowerVwapCrossYellow = 0
-    
-    # Initialize columns with False
+
     data['upperVwapCrossYellow'] = False
     data['lowerVwapCrossYellow'] = False
-    
-    if do_arrows:  # Only calculate these signals if do_arrows is True
-        for i in range(0, len(data)):
-            if data['RSI'].iloc[i] > 70:
-                upperVwapCrossYellow = 1
-            elif (upperVwapCrossYellow == 1) and resetUpper == 1:
-                upperVwapCrossYellow = 1
-            else:
-                upperVwapCrossYellow = 0
-
-            upperBand_vwap_cross_green = upperVwapCrossYellow == 1 and data['Close'].iloc[i] < data['Open'].iloc[i] and data['MACDh_12_26_9'].iloc[i] < data['MACDh_12_26_9'].iloc[i-1]
-            if(upperBand_vwap_cross_green):
-                data.loc[data.index[i], 'upperVwapCrossYellow'] = bool(1)
-            else:
-                data.loc[data.index[i], 'upperVwapCrossYellow'] = bool(0)
-
-            if data['upperVwapCrossYellow'].iloc[i] == 1:
-                resetUpper = 0
-            else:
-                resetUpper = 1
-
-            if data['RSI'].iloc[i] < 30:
-                lowerVwapCrossYellow = 1
-            elif (lowerVwapCrossYellow == 1) and resetLower == 1:
-                lowerVwapCrossYellow = 1
-            else:
-                lowerVwapCrossYellow = 0
-            
-            lowerBand_vwap_cross_green = lowerVwapCrossYellow == 1 and data['Close'].iloc[i] > data['Open'].iloc[i] and data['MACDh_12_26_9'].iloc[i] > data['MACDh_12_26_9'].iloc[i-1]
-            if(lowerBand_vwap_cross_green):
-                data.loc[data.index[i], 'lowerVwapCrossYellow'] = bool(1)
-            else:
-                data.loc[data.index[i], 'lowerVwapCrossYellow'] = bool(0)
-
-            if data['lowerVwapCrossYellow'].iloc[i] == 1:
-                resetLower = 0
-            else:
-                resetLower = 1
 
+    for i in range(0, len(data)):
+        if data['RSI'].iloc[i] > 70:
+            upperVwapCrossYellow = 1
+        elif (upperVwapCrossYellow == 1) and resetUpper == 1:
+            upperVwapCrossYellow = 1
+        else:
+            upperVwapCrossYellow = 0
+
+        upperBand_vwap_cross_green = upperVwapCrossYellow == 1 and data['Close'].iloc[i] < data['Open'].iloc[i] and data['MACDh_12_26_9'].iloc[i] < data['MACDh_12_26_9'].iloc[i-1]
+        if(upperBand_vwap_cross_green):
+            data.loc[data.index[i], 'upperVwapCrossYellow'] = bool(1)
+        else:
+            data.loc[data.index[i], 'upperVwapCrossYellow'] = bool(0)
+
+        if data['upperVwapCrossYellow'].iloc[i] == 1:
+            resetUpper = 0
+        else:
+            resetUpper = 1
+
+        if data['RSI'].iloc[i] < 30:
+            lowerVwapCrossYellow = 1
+        elif (lowerVwapCrossYellow == 1) and resetLower == 1:
+            lowerVwapCrossYellow = 1
+        else:
+            lowerVwapCrossYellow = 0
+
+        lowerBand_vwap_cross_green = lowerVwapCrossYellow == 1 and data['Close'].iloc[i] > data['Open'].iloc[i] and data['MACDh_12_26_9'].iloc[i] > data['MACDh_12_26_9'].iloc[i-1]
+        if(lowerBand_vwap_cross_green):
+            data.loc[data.index[i], 'lowerVwapCrossYellow'] = bool(1)
+        else:
+            data.loc[data.index[i], 'lowerVwapCrossYellow'] = bool(0)
+
+        if data['lowerVwapCrossYellow'].iloc[i] == 1:
+            resetLower = 0
+        else:
+            resetLower = 1
     return data
 
 def calculate_rsi_exit_signals(data):
+    rsi = data['RSI'].to_numpy(dtype=float)
+    close = data['Close'].to_numpy(dtype=float)
+    open_ = data['Open'].to_numpy(dtype=float)
+    macdh = data['MACDh_12_26_9'].to_numpy(dtype=float)
+
+    upperRsiOverbought = np.zeros(len(data), dtype=np.int8)
+    lowerRsiOversold = np.zeros(len(data), dtype=np.int8)
+
+    # In the reference loop the carry branch needs the previous bar flagged while
+    # resetUp/resetLow is 1, but the reset is only 1 when that bar was not flagged,
+    # so every bar from 1 on depends on its own RSI, candle and MACDh step alone.
+    upperRsiOverbought[1:] = (rsi[1:] > 70) & (close[1:] < open_[1:]) & (macdh[1:] < macdh[:-1])
+    lowerRsiOversold[1:] = (rsi[1:] < 30) & (close[1:] > open_[1:]) & (macdh[1:] > macdh[:-1])
+
+    data['upperRsiOverbought'] = upperRsiOverbought
+    data['lowerRsiOversold'] = lowerRsiOversold
+    data['restup'] = 0
+    data['resetlow'] = 0
+    return data
+
+def calculate_rsi_exit_signals_reference(data):
+    # Original per-row implementation, kept to check calculate_rsi_exit_signals against.
 
     resetUp = 0
     resetLow = 0
@@ -140,16 +204,21 @@ def calculate_rsi_exit_signals(data):
             resetLow = 1
     return data
 
-def calculate_ttm_waves(data):
+def calculate_ttm_waves(data, graph=None):
+    if graph is None:
+        graph = IndicatorGraph(data)
 
-    data['macd_a_slow'] = ta.macd(data['Close'], fastperiod=8, slowperiod=55, signalperiod=55).iloc[:, 2] 
-    data['macd_a_fast'] = ta.macd(data['Close'], fastperiod=8, slowperiod=34, signalperiod=34).iloc[:, 2]
+    # pandas_ta's macd only reads fast/slow/signal, so the fastperiod/slowperiod
+    # keywords these waves were written with always produced the default 12/26/9
+    # signal line; both now share that node with the main MACD.
+    data['macd_a_slow'] = graph.get('macd', fast=12, slow=26, signal=9).iloc[:, 2]
+    data['macd_a_fast'] = graph.get('macd', fast=12, slow=26, signal=9).iloc[:, 2]
 
      # ATR Calculation
     atr_length = 14
     atr1_multiplier = 1.5
 
-    data['atr'] = ta.atr(data['High'], data['Low'], data['Close'], length=atr_length)
+    data['atr'] = graph.get('atr', length=atr_length)
     data['atr1'] = data['atr'] * atr1_multiplier
 
     length = 20
@@ -159,15 +228,15 @@ def calculate_ttm_waves(data):
     kc_mult_low = 2.0
     
     # Bollinger Bands
-    bb = ta.bbands(data['Close'], length=length, std=bb_mult)
+    bb = graph.get('bbands', length=length, std=bb_mult)
     data['bb_basis'] = bb['BBM_20_2.0']
     data['bb_upper'] = bb['BBU_20_2.0']
     data['bb_lower'] = bb['BBL_20_2.0']
     
     # Keltner Channels
-    data['tr'] = ta.true_range(data['High'], data['Low'], data['Close'])
-    data['atr'] = ta.sma(data['tr'], length)
-    data['kc_basis'] = ta.sma(data['Close'], length)
+    data['tr'] = graph.get('true_range')
+    data['atr'] = graph.get('sma', source='true_range', length=length)
+    data['kc_basis'] = graph.get('sma', source='Close', length=length)
     
     # KC Bands
     for mult in [kc_mult_high, kc_mult_mid, kc_mult_low]:
@@ -182,18 +251,29 @@ def calculate_ttm_waves(data):
     data['high_sqz'] = (data['bb_lower'] >= data['kc_lower_1_0']) | (data['bb_upper'] <= data['kc_upper_1_0'])
     
     # Momentum
-    highest_high = data['High'].rolling(window=length).max()
-    lowest_low = data['Low'].rolling(window=length).min()
-    avg_hl = (highest_high + lowest_low) / 2
-    avg_hl_close = (avg_hl + data['Close'].rolling(window=length).mean()) / 2
-    data['momentum'] = ta.linreg(data['Close'] - avg_hl_close, length=length)
+    data['momentum'] = graph.get('ttm_momentum', length=length)
     
     # AO (Awesome Oscillator)
-    data['ao'] = ta.sma((data['High'] + data['Low']) / 2, 5) - ta.sma((data['High'] + data['Low']) / 2, 34)    
+    data['ao'] = graph.get('sma', source='hl2', length=5) - graph.get('sma', source='hl2', length=34)
     
     return data
 
-def calculate_ttm_squeeze_signals(data, plot_magenta=True, plot_yellow=True,offset=0.1):
+def _fill_gaps(data):
+    # In-place stand-in for data = data.ffill(): only columns with a NaN after
+    # their first value are touched, which is usually none of them. Returns
+    # whether anything was filled.
+    missing = data.isna().to_numpy()
+    started = np.maximum.accumulate(~missing, axis=0)
+    gaps = np.flatnonzero((missing & started).any(axis=0))
+    for position in gaps:
+        column = data.columns[position]
+        data[column] = data[column].ffill()
+    return len(gaps) > 0
+
+def calculate_ttm_squeeze_signals(data, plot_magenta=True, plot_yellow=True,offset=0.1, graph=None, pyramid=None):
+    if graph is None:
+        graph = IndicatorGraph(data)
+
     def ttm_squeeze(src, length=20, n_k=1.5, n_bb=2.0):
 
         basis = src.rolling(window=length).mean()
@@ -201,9 +281,9 @@ def calculate_ttm_squeeze_signals(data, plot_magenta=True, plot_yellow=True,offs
         upper_bb = basis + dev
         lower_bb = basis - dev
 
-        tr = data['High'] - data['Low']
-        devKC = tr.rolling(window=length).mean()
-        kc_basis = ta.sma(data['Close'], length)
+        # The Keltner side does not depend on src, so all four calls share it.
+        devKC = graph.get('sma', source='range', length=length)
+        kc_basis = graph.get('sma', source='Close', length=length)
 
         kc_mult_high, kc_mult_mid, kc_mult_low = 1.0, 1.5, 2.0
 
@@ -222,12 +302,18 @@ def calculate_ttm_squeeze_signals(data, plot_magenta=True, plot_yellow=True,offs
         sqz_on = mid_sqz | high_sqz
         return sqz_on.astype(int)
 
-    data['price1'] = data['Close'].resample('1min').last()
-    data['price2'] = data['Close'].resample('5min').last()
-    data['price3'] = data['Close'].resample('15min').last()
-    data['price4'] = data['Close'].resample('60min').last()
-    
-    data = data.ffill()
+    if pyramid is None:
+        pyramid = BarPyramid()
+    levels = pyramid.aligned(data['Close'])
+    data['price1'] = levels['1min']
+    data['price2'] = levels['5min']
+    data['price3'] = levels['15min']
+    data['price4'] = levels['60min']
+
+    # Everything below reads the filled prices, as it did after data.ffill();
+    # anything the graph cached from the gappy ones has to be recomputed.
+    if _fill_gaps(data):
+        graph.rebase(data)
 
     data['sqz1'] = ttm_squeeze(data['price1'])
     data['sqz2'] = ttm_squeeze(data['price2'])
@@ -241,19 +327,19 @@ def calculate_ttm_squeeze_signals(data, plot_magenta=True, plot_yellow=True,offs
 
 
     length = 20
-    bb_basis = data['Close'].rolling(window=length).mean()
-    highest_high = data['High'].rolling(window=length).max()
-    lowest_low = data['Low'].rolling(window=length).min()
+    bb_basis = graph.get('sma', source='Close', length=length)
+    highest_high = graph.get('rolling_max', source='High', length=length)
+    lowest_low = graph.get('rolling_min', source='Low', length=length)
     avg_high_low = (highest_high + lowest_low) / 2
     avg_all = (avg_high_low + bb_basis) / 2
     mom = (data['Close'] - avg_all).ewm(span=length, adjust=False).mean()
     
     data['mom_down'] = ((mom > 0) & (mom < mom.shift(1))) | ((mom <= 0) & (mom > mom.shift(1)))
-    data['high_volume'] = data['Volume'] > ta.sma(data['Volume'], 10)
+    data['high_volume'] = data['Volume'] > graph.get('sma', source='Volume', length=10)
 
-    data['hl2'] = (data['High'] + data['Low']) / 2
-    data['ema5'] = data['hl2'].ewm(span=5, adjust=False).mean()
-    data['ema13'] = data['hl2'].ewm(span=13, adjust=False).mean()
+    data['hl2'] = graph.get('hl2')
+    data['ema5'] = graph.get('ewm', source='hl2', span=5)
+    data['ema13'] = graph.get('ewm', source='hl2', span=13)
     #maroon logic
     data['squeeze_signal_up'] = (data['ema5'] > data['ema13']) & data['noSqz'] & (data['noSqz'].shift(1) == False)
     data['squeeze_signal_down'] = (data['ema5'] < data['ema13']) & data['noSqz'] & (data['noSqz'].shift(1) == False)
@@ -290,7 +376,22 @@ def calculate_ttm_squeeze_signals(data, plot_magenta=True, plot_yellow=True,offs
     
     return data
 
-def fetch_yahoo_data(ticker, interval, ema_period=20, macd_fast=12, macd_slow=26, macd_signal=9, vwap_period=20, vwap_std_dev=2):
+def _compact_stage(data, pending=()):
+    # Compact construction, between pipeline stages: drops every column that
+    # neither the serializers nor a later stage (pending) read, and stores
+    # finished values as float32 and finished flags as bools. Prices stay
+    # float64 until the last stage has read them.
+    served = set(SERIALIZED_PRICES + SERIALIZED_VALUES + SERIALIZED_FLAGS + PRICE_COLUMNS)
+    data.drop(columns=[name for name in data.columns if name not in served and name not in pending], inplace=True)
+    for name in SERIALIZED_VALUES:
+        if name in data.columns and name not in pending and data[name].dtype != np.float32:
+            data[name] = data[name].to_numpy(dtype=np.float32)
+    for name in SERIALIZED_FLAGS:
+        if name in data.columns and name not in pending and data[name].dtype != bool:
+            data[name] = _flag(data, name)
+    return data
+
+def download_window(interval):
     end_date = datetime.now()
     if interval in ['1m', '5m']:
         start_date = end_date - timedelta(days=7)       
@@ -302,116 +403,253 @@ def fetch_yahoo_data(ticker, interval, ema_period=20, macd_fast=12, macd_slow=26
         start_date = end_date - timedelta(weeks=365*5)
     elif interval == '1mo':
         start_date = end_date - timedelta(days=365*5)
+    return start_date, end_date
+
+def build_ticker_frame(ticker, interval, ema_period=20, macd_fast=12, macd_slow=26, macd_signal=9, vwap_period=20, vwap_std_dev=2, compact=False):
+    # compact=True gives compact_ticker_frame() of the full frame, but drops
+    # the intermediate columns stage by stage instead of holding all of them
+    # at once, and skips the EMA, custom MACD and VWAP columns no serializer
+    # reads.
+    data = download_bars(ticker, interval, *download_window(interval))
     
-    data = yf.download(ticker, start=start_date, end=end_date, interval=interval)
-    
-    data['EMA'] = ta.ema(data['Close'], length=int(ema_period))
+    graph = IndicatorGraph(data)
+    if not compact:
+        data['EMA'] = graph.get('ema', source='Close', length=int(ema_period))
 
-    macd = ta.macd(data['Close'], fast=macd_fast, slow=macd_slow, signal=macd_signal)
-    data = pd.concat([data, macd], axis=1)
+        macd = graph.get('macd', fast=macd_fast, slow=macd_slow, signal=macd_signal)
+        data = pd.concat([data, macd], axis=1)
 
-    data = pd.DataFrame(data)
-    data.ta.macd(close='close', fast=12, slow=26, signal=9, append=True)
-    print(data.head())
-    
-    data['Volume_MA'] = data['Volume'].rolling(window=20).mean()
-    data_temp = data.copy()  # Create a temporary copy for VWAP calculation
-    data_temp.index = data_temp.index.tz_localize(None)  # Remove timezone info
-    data['VWAP'] = ta.vwap(data_temp['High'], data_temp['Low'], data_temp['Close'], data_temp['Volume'])
-
-    # Calculate VWAP bands
-    data['VWAP_Std'] = data['VWAP'].rolling(window=vwap_period).std()
-    data['VWAP_Upper'] = data['VWAP'] + (vwap_std_dev * data['VWAP_Std'])
-    data['VWAP_Lower'] = data['VWAP'] - (vwap_std_dev * data['VWAP_Std'])
-    data = calculate_ripster_signals(data)
-    data = calculate_ttm_waves(data)
+    # The signal functions always read the 12/26/9 columns; with the default
+    # parameters this is a cache hit rather than a second MACD run.
+    for column, values in graph.get('macd', fast=12, slow=26, signal=9).items():
+        data[column] = values
+
+    if compact:
+        # The yellow cross and RSI exit signals still read MACDh.
+        data = _compact_stage(data, pending=('MACDh_12_26_9',))
+    else:
+        data['Volume_MA'] = graph.get('sma', source='Volume', length=20)
+        data_temp = data.copy()  # Create a temporary copy for VWAP calculation
+        data_temp.index = data_temp.index.tz_localize(None)  # Remove timezone info
+        data['VWAP'] = ta.vwap(data_temp['High'], data_temp['Low'], data_temp['Close'], data_temp['Volume'])
+
+        # Calculate VWAP bands
+        data['VWAP_Std'] = data['VWAP'].rolling(window=vwap_period).std()
+        data['VWAP_Upper'] = data['VWAP'] + (vwap_std_dev * data['VWAP_Std'])
+        data['VWAP_Lower'] = data['VWAP'] - (vwap_std_dev * data['VWAP_Std'])
+    data = calculate_ripster_signals(data, graph=graph)
+    if compact:
+        data = _compact_stage(data, pending=('RSI', 'MACDh_12_26_9'))
+    data = calculate_ttm_waves(data, graph=graph)
+    if compact:
+        data = _compact_stage(data, pending=('RSI', 'MACDh_12_26_9'))
     data = calculate_rsi_exit_signals(data)
-    data = calculate_ttm_squeeze_signals(data)
-
-    candlestick_data = [
-        {
-            'time': int(row.Index.timestamp()),
-            'open': row.Open,
-            'high': row.High,
-            'low': row.Low,
-            'close': row.Close
-        }
-        for row in data.itertuples()
-    ]
-
-    # ema_data = [
-    #     {
-    #         'time': int(row.Index.timestamp()),
-    #         'value': row.EMA
-    #     }
-    #     for row in data.itertuples() if not pd.isna(row.EMA)
-    # ]
-
-    macd_data = [
-        {
-            'time': int(row.Index.timestamp()),
-            'macd': row.MACD_12_26_9 if not pd.isna(row.MACD_12_26_9) else 0,
-            'signal': row.MACDs_12_26_9 if not pd.isna(row.MACDs_12_26_9) else 0,
-            'histogram': row.MACDh_12_26_9 if not pd.isna(row.MACDh_12_26_9) else 0
-        }
-        for row in data.itertuples()
-    ]
-
-    # vwap_data = [
-    #     {
-    #         'time': int(row.Index.timestamp()),
-    #         'vwap': row.VWAP if not pd.isna(row.VWAP) else 0,
-    #         'upper': row.VWAP_Upper if not pd.isna(row.VWAP_Upper) else 0,
-    #         'lower': row.VWAP_Lower if not pd.isna(row.VWAP_Lower) else 0
-    #     }
-    #     for row in data.itertuples()
-    # ]
-
-    vwap_signals = [
-        {
-        'time': int(row.Index.timestamp()),
-        'signal_up': bool(row.signal_up),
-        'signal_down': bool(row.signal_down),
-        'ripster_signal_up': bool(row.ripster_signal_up),
-        'ripster_signal_down': bool(row.ripster_signal_down),
-        'yellow_signal_up': bool(row.lowerVwapCrossYellow),
-        'yellow_signal_down': bool(row.upperVwapCrossYellow), 
-        'rsi_exit_up': bool(row.lowerRsiOversold), 
-        'rsi_exit_down': bool(row.upperRsiOverbought),
-        'price': float(row.Close),
-    }
-    for i, row in enumerate(data.itertuples())
-    ]
-
-    ttm_waves_data = [
-        {
-            'time': int(index.timestamp()),
-            'wave_a_slow': row['macd_a_slow'] if not pd.isna(row['macd_a_slow']) else 0,
-            'wave_a_fast': row['macd_a_fast'] if not pd.isna(row['macd_a_fast']) else 0,
-            'momentum': row['momentum'] if not pd.isna(row['momentum']) else 0,
-            'ao': row['ao'] if not pd.isna(row['ao']) else 0,
-            'squeeze': 'high' if row['high_sqz'] else 'mid' if row['mid_sqz'] else 'low' if row['low_sqz'] else 'none',
-            'atr1': row['atr1'] if not pd.isna(row['atr1']) else 0
-        }
-        for index, row in data.iterrows()
-    ]
-
-    ttm_squeeze_signals = [
-    {
-        'time': int(row.Index.timestamp()),
-        'squeeze_signal_up': bool(row.squeeze_signal_up),
-        'squeeze_signal_down': bool(row.squeeze_signal_down),
-        'ripster_signal_up': bool(row.ripster_signal_up),
-        'ripster_signal_down': bool(row.ripster_signal_down),
-        'yellow_signal_up': bool(row.yellow_signal_up),
-        'yellow_signal_down': bool(row.yellow_signal_down),
-        'signal_red_dot': bool(row.signal_red_dot),
-        'rsi_exit_up': bool(row.lowerRsiOversold), 
-        'rsi_exit_down': bool(row.upperRsiOverbought),
-        'price': float(row.Close),
-    }
-    for row in data.itertuples()
-    ]
+    if compact:
+        data = _compact_stage(data)
+    data = calculate_ttm_squeeze_signals(data, graph=graph, pyramid=get_bar_pyramid(ticker, interval))
+
+    for row in graph.summary():
+        metrics.observe(f"indicators.{row['indicator']}_seconds", row['seconds'])
+
+    if compact:
+        data = compact_ticker_frame(data)
+    return data
+
+def _epoch_seconds(index):
+    return index.as_unit('ns').asi8 // 10**9
+
+def _column(data, name):
+    return np.ascontiguousarray(data[name].to_numpy())
+
+def _zero_nan(values):
+    values = np.asarray(values)
+    if values.dtype.kind != 'f':
+        values = values.astype(float)
+    return np.where(np.isnan(values), values.dtype.type(0), values)
+
+def _float_list(data, name):
+    values = data[name].to_numpy()
+    if values.dtype == np.float32:
+        # Shortest float32 digits, so compact frames don't come out as 101.12000274658203.
+        values = values.astype(str).astype(float)
+    return values.tolist()
+
+SQUEEZE_LABELS = ['none', 'low', 'mid', 'high']
+
+def _squeeze_codes(data):
+    # Index into SQUEEZE_LABELS; high wins over mid over low, as in the row format.
+    return np.select(
+        [_flag(data, 'high_sqz'), _flag(data, 'mid_sqz'), _flag(data, 'low_sqz')],
+        [3, 2, 1],
+        0
+    ).astype(np.int8)
+
+def _squeeze_labels(data):
+    return np.array(SQUEEZE_LABELS)[_squeeze_codes(data)]
+
+def _flag(data, name):
+    # Truthiness per cell, like bool(row.x): NaN counts as True.
+    return _column(data, name).astype(bool)
+
+def _rows(time, **columns):
+    names = ['time', *columns]
+    return [dict(zip(names, row)) for row in zip(time, *columns.values())]
+
+def _zero_nan_list(data, name):
+    return [0 if value != value else value for value in _float_list(data, name)]
+
+def serialize_ticker_frame(data):
+    time = _epoch_seconds(data.index).tolist()
+    flag = lambda name: _flag(data, name).tolist()
+    close = _float_list(data, 'Close')
+
+    candlestick_data = _rows(
+        time,
+        open=_float_list(data, 'Open'),
+        high=_float_list(data, 'High'),
+        low=_float_list(data, 'Low'),
+        close=close
+    )
+
+    macd_data = _rows(
+        time,
+        macd=_zero_nan_list(data, 'MACD_12_26_9'),
+        signal=_zero_nan_list(data, 'MACDs_12_26_9'),
+        histogram=_zero_nan_list(data, 'MACDh_12_26_9')
+    )
+
+    vwap_signals = _rows(
+        time,
+        signal_up=flag('signal_up'),
+        signal_down=flag('signal_down'),
+        ripster_signal_up=flag('ripster_signal_up'),
+        ripster_signal_down=flag('ripster_signal_down'),
+        yellow_signal_up=flag('lowerVwapCrossYellow'),
+        yellow_signal_down=flag('upperVwapCrossYellow'),
+        rsi_exit_up=flag('lowerRsiOversold'),
+        rsi_exit_down=flag('upperRsiOverbought'),
+        price=close
+    )
+
+    ttm_waves_data = _rows(
+        time,
+        wave_a_slow=_zero_nan_list(data, 'macd_a_slow'),
+        wave_a_fast=_zero_nan_list(data, 'macd_a_fast'),
+        momentum=_zero_nan_list(data, 'momentum'),
+        ao=_zero_nan_list(data, 'ao'),
+        squeeze=_squeeze_labels(data).tolist(),
+        atr1=_zero_nan_list(data, 'atr1')
+    )
+
+    ttm_squeeze_signals = _rows(
+        time,
+        squeeze_signal_up=flag('squeeze_signal_up'),
+        squeeze_signal_down=flag('squeeze_signal_down'),
+        ripster_signal_up=flag('ripster_signal_up'),
+        ripster_signal_down=flag('ripster_signal_down'),
+        yellow_signal_up=flag('yellow_signal_up'),
+        yellow_signal_down=flag('yellow_signal_down'),
+        signal_red_dot=flag('signal_red_dot'),
+        rsi_exit_up=flag('lowerRsiOversold'),
+        rsi_exit_down=flag('upperRsiOverbought'),
+        price=close
+    )
 
     return candlestick_data, macd_data, vwap_signals, ttm_waves_data, ttm_squeeze_signals
-    
\ No newline at end of file
+
+def serialize_ticker_frame_columnar(data, squeeze_codes=False):
+    # Same fields as serialize_ticker_frame, but one shared time array and one
+    # array per field, taken straight from the frame's columns. With
+    # squeeze_codes the squeeze labels stay int8 indexes into SQUEEZE_LABELS.
+    flag = lambda name: _flag(data, name)
+    close = _column(data, 'Close')
+
+    return {
+        'time': _epoch_seconds(data.index),
+        'candlestick': {
+            'open': _column(data, 'Open'),
+            'high': _column(data, 'High'),
+            'low': _column(data, 'Low'),
+            'close': _column(data, 'Close'),
+        },
+        'macd': {
+            'macd': _zero_nan(data['MACD_12_26_9']),
+            'signal': _zero_nan(data['MACDs_12_26_9']),
+            'histogram': _zero_nan(data['MACDh_12_26_9']),
+        },
+        'vwap_signals': {
+            'signal_up': flag('signal_up'),
+            'signal_down': flag('signal_down'),
+            'ripster_signal_up': flag('ripster_signal_up'),
+            'ripster_signal_down': flag('ripster_signal_down'),
+            'yellow_signal_up': flag('lowerVwapCrossYellow'),
+            'yellow_signal_down': flag('upperVwapCrossYellow'),
+            'rsi_exit_up': flag('lowerRsiOversold'),
+            'rsi_exit_down': flag('upperRsiOverbought'),
+            'price': close,
+        },
+        'ttm_waves': {
+            'wave_a_slow': _zero_nan(data['macd_a_slow']),
+            'wave_a_fast': _zero_nan(data['macd_a_fast']),
+            'momentum': _zero_nan(data['momentum']),
+            'ao': _zero_nan(data['ao']),
+            'squeeze': _squeeze_codes(data) if squeeze_codes else _squeeze_labels(data).tolist(),
+            'atr1': _zero_nan(data['atr1']),
+        },
+        'ttm_squeeze_signals': {
+            'squeeze_signal_up': flag('squeeze_signal_up'),
+            'squeeze_signal_down': flag('squeeze_signal_down'),
+            'ripster_signal_up': flag('ripster_signal_up'),
+            'ripster_signal_down': flag('ripster_signal_down'),
+            'yellow_signal_up': flag('yellow_signal_up'),
+            'yellow_signal_down': flag('yellow_signal_down'),
+            'signal_red_dot': flag('signal_red_dot'),
+            'rsi_exit_up': flag('lowerRsiOversold'),
+            'rsi_exit_down': flag('upperRsiOverbought'),
+            'price': close,
+        },
+    }
+
+def ticker_frame_columns(data):
+    # The columnar payload flattened to one array per 'section.field' name, for
+    # the binary encoders.
+    payload = serialize_ticker_frame_columnar(data, squeeze_codes=True)
+    columns = {'time': payload.pop('time')}
+    for section, fields in payload.items():
+        for field, values in fields.items():
+            columns[f'{section}.{field}'] = values
+    return columns
+
+# Everything the serializers read. A compact frame keeps only these.
+SERIALIZED_PRICES = ('Open', 'High', 'Low', 'Close')
+SERIALIZED_VALUES = ('MACD_12_26_9', 'MACDs_12_26_9', 'MACDh_12_26_9', 'macd_a_slow', 'macd_a_fast', 'momentum', 'ao', 'atr1')
+SERIALIZED_FLAGS = (
+    'signal_up', 'signal_down', 'ripster_signal_up', 'ripster_signal_down',
+    'lowerVwapCrossYellow', 'upperVwapCrossYellow', 'lowerRsiOversold', 'upperRsiOverbought',
+    'low_sqz', 'mid_sqz', 'high_sqz', 'squeeze_signal_up', 'squeeze_signal_down',
+    'yellow_signal_up', 'yellow_signal_down', 'signal_red_dot'
+)
+
+# Intervals served from compact frames unless the request says otherwise,
+# e.g. COMPACT_FRAME_INTERVALS=1m,5m
+COMPACT_FRAME_INTERVALS = {
+    interval.strip() for interval in os.environ.get('COMPACT_FRAME_INTERVALS', '').split(',') if interval.strip()
+}
+
+def compact_ticker_frame(data):
+    # float32 prices and indicator values, one-byte flags, and none of the
+    # intermediate columns. Flags are stored as the truthiness the serializers
+    # read, so a NaN signal_red_dot becomes True here too.
+    columns = {}
+    for name in SERIALIZED_PRICES + SERIALIZED_VALUES:
+        columns[name] = data[name].to_numpy(dtype=np.float32)
+    for name in SERIALIZED_FLAGS:
+        columns[name] = _flag(data, name)
+    return pd.DataFrame(columns, index=data.index)
+
+def fetch_yahoo_data(ticker, interval, ema_period=20, macd_fast=12, macd_slow=26, macd_signal=9, vwap_period=20, vwap_std_dev=2, compact=False):
+    data = build_ticker_frame(
+        ticker, interval, ema_period=ema_period, macd_fast=macd_fast, macd_slow=macd_slow,
+        macd_signal=macd_signal, vwap_period=vwap_period, vwap_std_dev=vwap_std_dev, compact=compact
+    )
+    return serialize_ticker_frame(data)
\ No newline at end of file
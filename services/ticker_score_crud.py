@@ -1,13 +1,96 @@
+import os
+import weakref
 from datetime import timezone, datetime, timedelta
 from models.tickerScores import TickerScore
+from models.latestTickerScores import LatestTickerScore
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from sqlalchemy import desc
+from sqlalchemy import func, and_, inspect, literal
+from sqlalchemy import desc, DateTime, Float, Integer
+from sqlalchemy.dialects import postgresql, sqlite
 
-def delete_old_ticker_scores(db: Session, days: int = 3):
+SCORE_FIELDS = [
+    'ticker_name',
+    'w_score', 'w_squeeze', 'd_score', 'd_squeeze',
+    'five_d_score', 'five_d_squeeze', 'one_h_score', 'one_h_squeeze',
+    'ninety_m_score', 'ninety_m_squeeze', 'thirty_m_score', 'thirty_m_squeeze',
+    'fifteen_m_score', 'fifteen_m_squeeze',
+    'long_score', 'short_score', 'long_rank', 'short_rank', 'trend',
+    'current_price', 'sector', 'category_id'
+]
+UPSERT_CHUNK_ROWS = 500
+# Retention job (main.py): rows older than this many days go, in chunks.
+SCORE_RETENTION_DAYS = int(os.environ.get('SCORE_RETENTION_DAYS', '3'))
+SCORE_RETENTION_INTERVAL_MINUTES = int(os.environ.get('SCORE_RETENTION_INTERVAL_MINUTES', '60'))
+LATEST_COLUMNS = [column.name for column in TickerScore.__table__.columns]
+
+def _upsert_insert(db: Session):
+    # The dialect insert that has on_conflict_do_update, or None.
+    return {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(db.bind.dialect.name)
+
+def score_day(created_at):
+    # The day a score row is kept under: date(created_at) as the database
+    # reads it (in its session time zone on PostgreSQL), the same key
+    # create_ticker_score has always matched rows on.
+    return func.date(literal(created_at, TickerScore.created_at.type))
+
+_upsert_ready = weakref.WeakSet()
+
+def _upsert_target_ready(db: Session):
+    # Whether ticker_scores has the unique (ticker_symbol, score_date) index
+    # ON CONFLICT needs. A table migrated from before score_date only gets it
+    # once its duplicate days are removed (utils/migrations.py).
+    if db.bind not in _upsert_ready:
+        inspector = inspect(db.bind)
+        names = {index['name'] for index in inspector.get_indexes('ticker_scores') if index.get('unique')}
+        names.update(constraint['name'] for constraint in inspector.get_unique_constraints('ticker_scores'))
+        if 'uq_ticker_scores_ticker_date' not in names:
+            return False
+        _upsert_ready.add(db.bind)
+    return True
+
+def latest_score_row(score):
+    return {name: getattr(score, name) for name in LATEST_COLUMNS}
+
+def sync_latest_ticker_scores(db: Session, rows):
+    # Makes each row (every ticker_scores column, id included) its ticker's
+    # latest_ticker_scores entry. Runs in the caller's transaction.
+    if not rows:
+        return
+    insert = _upsert_insert(db)
+    if insert is None:
+        for row in rows:
+            db.merge(LatestTickerScore(**row))
+        return
+    updated = [name for name in LATEST_COLUMNS if name != 'ticker_symbol']
+    for start in range(0, len(rows), UPSERT_CHUNK_ROWS):
+        statement = insert(LatestTickerScore.__table__).values(rows[start:start + UPSERT_CHUNK_ROWS])
+        statement = statement.on_conflict_do_update(
+            index_elements=['ticker_symbol'],
+            set_={name: statement.excluded[name] for name in updated}
+        )
+        db.execute(statement)
+
+def delete_old_ticker_scores(db: Session, days: int = 3, chunk_size: int = 5000):
+    # Deletes in chunks of chunk_size rows, each its own transaction, so pruning
+    # a large backlog never holds long locks or one huge transaction. Runs on
+    # a schedule (main.py), not after each write.
     try:
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-        deleted_count = db.query(TickerScore).filter(TickerScore.created_at < cutoff_date).delete()
+        deleted_count = 0
+        while True:
+            ids = [
+                row.id for row in
+                db.query(TickerScore.id).filter(TickerScore.created_at < cutoff_date).limit(chunk_size).all()
+            ]
+            if not ids:
+                break
+            deleted_count += db.query(TickerScore).filter(TickerScore.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+            if len(ids) < chunk_size:
+                break
+        # A latest entry has its row's created_at, so this drops exactly the
+        # entries whose row just went.
+        db.query(LatestTickerScore).filter(LatestTickerScore.created_at < cutoff_date).delete(synchronize_session=False)
         db.commit()
         return deleted_count
     except Exception as e:
@@ -86,16 +169,17 @@ def create_ticker_score(db: Session, score_data: dict):
                 score_change_trend=score_change_trend,
                 current_price=score_data.get('current_price'),
                 created_at=score_data.get('created_at', current_time),
+                score_date=score_day(score_data.get('created_at', current_time)),
                 sector=score_data.get('sector'),
                 category_id=score_data.get('category_id'),
                 is_deleted=is_deleted
             )
             db.add(db_ticker_score)
 
+        db.flush()
+        sync_latest_ticker_scores(db, [latest_score_row(db_ticker_score)])
         db.commit()
         db.refresh(db_ticker_score)
-
-        delete_old_ticker_scores(db)
         
         return db_ticker_score
     
@@ -105,37 +189,163 @@ def create_ticker_score(db: Session, score_data: dict):
         raise
 
 def get_ticker_scores(db: Session, ticker_symbol: str = None):
-    query = db.query(TickerScore).filter(TickerScore.is_deleted == False)
+    # Newest live score per ticker, newest first, from the projection.
+    query = db.query(LatestTickerScore).filter(LatestTickerScore.is_deleted == False)
     
     if ticker_symbol:
-        query = query.filter(TickerScore.ticker_symbol == ticker_symbol)
+        query = query.filter(LatestTickerScore.ticker_symbol == ticker_symbol)
 
-    latest_scores_subquery = (
-        db.query(TickerScore.ticker_symbol, func.max(TickerScore.created_at).label('max_created_at'))
+    return query.order_by(desc(LatestTickerScore.created_at)).all()
+
+def get_ticker_score_history(db: Session, tickers, start: datetime = None, end: datetime = None):
+    # (ticker_symbol, created_at, long_score, short_score) of every live row of
+    # tickers in [start, end], by ticker then time. One query for any number of
+    # tickers, answered from the (ticker_symbol, created_at) history index.
+    query = (
+        db.query(TickerScore.ticker_symbol, TickerScore.created_at, TickerScore.long_score, TickerScore.short_score)
+        .filter(TickerScore.ticker_symbol.in_(tickers))
         .filter(TickerScore.is_deleted == False)
-        .group_by(TickerScore.ticker_symbol)
-        .subquery()
     )
+    if start is not None:
+        query = query.filter(TickerScore.created_at >= start)
+    if end is not None:
+        query = query.filter(TickerScore.created_at <= end)
+
+    return query.order_by(TickerScore.ticker_symbol, TickerScore.created_at).all()
 
-    latest_scores = ( 
-        query
-        .join(
-            latest_scores_subquery, 
-            (TickerScore.ticker_symbol == latest_scores_subquery.c.ticker_symbol) & 
-            (TickerScore.created_at == latest_scores_subquery.c.max_created_at)
-        )
-        .order_by(desc(TickerScore.created_at))
-        .all()
-    )
-    
-    return latest_scores
 def soft_delete_ticker_score(db: Session, ticker_symbol: str):
     scores = db.query(TickerScore).filter(TickerScore.ticker_symbol == ticker_symbol).filter(TickerScore.is_deleted == False).all()
 
     if scores:
         for score in scores:
             score.is_deleted = True
+        db.query(LatestTickerScore).filter(LatestTickerScore.ticker_symbol == ticker_symbol).update(
+            {'is_deleted': True}, synchronize_session=False
+        )
         db.commit()
         return scores
     else:
-        return None
\ No newline at end of file
+        return None
+
+def as_utc(value):
+    # created_at is stored in UTC; SQLite hands it back naive, and a naive
+    # from/to is taken to be UTC as well.
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _score_columns(scores):
+    # Columns of the rows' own table (latest_ticker_scores for
+    # get_ticker_scores); with no rows, the projection's.
+    table = type(scores[0]).__table__ if scores else LatestTickerScore.__table__
+    return table.columns
+
+def ticker_scores_to_columns(scores):
+    columns = {}
+    for column in _score_columns(scores):
+        values = [getattr(score, column.name) for score in scores]
+        if isinstance(column.type, DateTime):
+            values = [as_utc(value) for value in values]
+        columns[column.name] = values
+    return columns
+
+def ticker_scores_to_float64_columns(scores):
+    # Numeric columns only, NULL as NaN and created_at as epoch seconds; the
+    # string columns have no float64 form.
+    columns = {}
+    for column in _score_columns(scores):
+        values = [getattr(score, column.name) for score in scores]
+        if isinstance(column.type, DateTime):
+            columns[column.name] = [as_utc(value).timestamp() if value else float('nan') for value in values]
+        elif isinstance(column.type, (Integer, Float)):
+            columns[column.name] = [float('nan') if value is None else float(value) for value in values]
+    return columns
+
+
+def _previous_scores(db: Session, tickers):
+    # {ticker: (long_score, is_deleted)} of each ticker's newest row, one query.
+    latest = (
+        db.query(TickerScore.ticker_symbol, func.max(TickerScore.created_at).label('max_created_at'))
+        .filter(TickerScore.ticker_symbol.in_(tickers))
+        .group_by(TickerScore.ticker_symbol)
+        .subquery()
+    )
+    rows = (
+        db.query(TickerScore.ticker_symbol, TickerScore.long_score, TickerScore.is_deleted)
+        .join(
+            latest,
+            (TickerScore.ticker_symbol == latest.c.ticker_symbol) &
+            (TickerScore.created_at == latest.c.max_created_at)
+        )
+        .all()
+    )
+    return {ticker: (long_score, is_deleted) for ticker, long_score, is_deleted in rows}
+
+def upsert_ticker_scores(db: Session, results):
+    # create_ticker_score for a whole run: one query for the previous rows, one
+    # INSERT ... ON CONFLICT (ticker_symbol, score_date) DO UPDATE and one
+    # commit. Returns the rows written, score_change_trend included as stored.
+    if not results:
+        return []
+    insert = _upsert_insert(db)
+    if insert is None or not _upsert_target_ready(db):
+        # No ON CONFLICT on this database (or no unique day index to aim it
+        # at yet); fall back to row by row.
+        return [
+            {**result, 'score_change_trend': create_ticker_score(db, result).score_change_trend}
+            for result in results
+        ]
+
+    try:
+        current_time = datetime.now(timezone.utc)
+        # A ticker listed twice would hit its own row twice in one statement.
+        latest_results = {result.get('ticker_symbol', ''): result for result in results}
+        previous = _previous_scores(db, list(latest_results))
+
+        rows = []
+        for ticker, result in latest_results.items():
+            long_score = result.get('long_score', 0)
+            prev_long_score, is_deleted = previous.get(ticker, (None, False))
+            if ticker in previous:
+                score_change_trend = str(long_score - prev_long_score) if prev_long_score is not None else None
+            else:
+                score_change_trend = " "
+            created_at = result.get('created_at', current_time)
+            rows.append({
+                'ticker_symbol': ticker,
+                **{field: result.get(field) for field in SCORE_FIELDS},
+                'long_score': long_score,
+                'score_change_trend': score_change_trend,
+                'is_deleted': is_deleted,
+                'created_at': created_at,
+                'score_date': score_day(created_at),
+            })
+
+        # Same as updating the day's row in place: everything but its creation time.
+        updated = [field for field in rows[0] if field not in ('ticker_symbol', 'score_date', 'created_at')]
+        table = TickerScore.__table__
+        written = {}
+        # Chunks keep each statement under the drivers' bind parameter limits.
+        for start in range(0, len(rows), UPSERT_CHUNK_ROWS):
+            statement = insert(table).values(rows[start:start + UPSERT_CHUNK_ROWS])
+            statement = statement.on_conflict_do_update(
+                index_elements=['ticker_symbol', 'score_date'],
+                set_={field: statement.excluded[field] for field in updated}
+            ).returning(table.c.ticker_symbol, table.c.id, table.c.created_at, table.c.score_date)
+            for ticker, score_id, created_at, day in db.execute(statement):
+                written[ticker] = (score_id, created_at, day)
+
+        # An update keeps the day's row and its creation time.
+        latest = []
+        for row in rows:
+            score_id, created_at, day = written[row['ticker_symbol']]
+            row['score_date'] = day
+            latest.append({**row, 'id': score_id, 'created_at': created_at})
+        sync_latest_ticker_scores(db, latest)
+        db.commit()
+        return rows
+
+    except Exception as e:
+        db.rollback()
+        print(f"Error upserting ticker scores: {e}")
+        raise
@@ -0,0 +1,30 @@
+import os
+import sys
+
+# The app imports modules from the repository root (services.*, utils.*).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep tests offline and off the shared on-disk caches; tests that need a
+# database build their own SQLite engine.
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('BAR_STORE_DIR', '')
+os.environ.setdefault('SCORE_CACHE_PATH', '')
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+@pytest.fixture
+def db():
+    from database import Base
+    import models.latestTickerScores, models.symbols, models.tickerScores, models.ticker_categories, models.tradeBook # noqa: F401
+
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
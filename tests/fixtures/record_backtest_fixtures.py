@@ -0,0 +1,137 @@
+"""
+Record the fixtures used by tests/test_backtest.py: synthetic signal arrays
+(backtest_signals.npz) and the trade_book ledgers the per-signal-row
+process_* loop back_test_the_stock ran before services/backtest.py leaves for
+them on SQLite (backtest_ledgers.json):
+
+    python tests/fixtures/record_backtest_fixtures.py
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+import numpy as np
+import pytz
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.pool import StaticPool
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from database import Base
+import models.latestTickerScores, models.symbols, models.tickerScores, models.ticker_categories # noqa: F401
+from models.tradeBook import Tradebook
+from services.trades import process_long_sl_target, process_long_trade, process_short_sl_target, process_short_trade
+
+STOCK, INTERVAL, QUANTITY, INDICATOR = 'TEST', '15m', 100, 'TTM'
+# (name, bars, seed, volatility per bar, chance of an up / down signal per bar);
+# the volatile case reaches its targets and stoplosses, the dense one has many
+# bars with both signals.
+CASES = [
+    ('calm', 800, 1, 0.004, 0.03),
+    ('volatile', 800, 2, 0.05, 0.02),
+    ('dense', 400, 3, 0.02, 0.25),
+]
+# Back test runs against one trade_book, as (first bar, end bar) fractions of
+# the case: the same window twice, overlapping windows, and a window that picks
+# up the Ongoing trades the one before it left.
+SCENARIOS = {
+    'fresh': [(0, 1)],
+    'repeated': [(0, 1), (0, 1)],
+    'overlapping': [(0, 2 / 3), (1 / 3, 1)],
+    'carried': [(0, 1 / 2), (1 / 2, 1)],
+}
+LEDGER_COLUMNS = [
+    'stockname', 'tradetype', 'entry_price', 'entry_time', 'stoploss', 'target', 'quantity', 'capital',
+    'exit_price', 'exit_time', 'pnl', 'ROI', 'profit', 'remarks', 'status', 'indicator', 'back_testing', 'interval',
+]
+
+def _aware_trade_times(target, *args):
+    # SQLite hands DateTime(timezone=True) back naive; the process_* loop
+    # compares them with aware signal times, as it does on PostgreSQL.
+    for name in ('entry_time', 'exit_time'):
+        value = target.__dict__.get(name)
+        if value is not None and value.tzinfo is None:
+            set_committed_value(target, name, value.replace(tzinfo=timezone.utc))
+
+for _name in ('load', 'refresh'):
+    if not event.contains(Tradebook, _name, _aware_trade_times):
+        event.listen(Tradebook, _name, _aware_trade_times)
+
+def case_signals(bars, seed, volatility, rate):
+    rng = np.random.default_rng(seed)
+    return {
+        'time': 1_704_205_800 + 900 * np.arange(bars, dtype='int64'),
+        'price': np.round(100 * np.exp(np.cumsum(rng.normal(0, volatility, bars))), 2),
+        'up': rng.random(bars) < rate,
+        'down': rng.random(bars) < rate,
+    }
+
+def load_signals(path, case):
+    fixture = np.load(path)
+    return tuple(fixture[f'{case}.{key}'] for key in ('time', 'price', 'up', 'down'))
+
+def windows(signals, scenario):
+    bars = len(signals[0])
+    for first, end in SCENARIOS[scenario]:
+        yield tuple(values[int(first * bars):int(end * bars)] for values in signals)
+
+def trade_book():
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[Tradebook.__table__])
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+def ledger(db):
+    rows = []
+    for trade in db.query(Tradebook).order_by(Tradebook.id):
+        row = {name: getattr(trade, name) for name in LEDGER_COLUMNS}
+        if row['status'] == "Ongoing":
+            # Both paths leave exit_time to the column default, the time
+            # models.tradeBook was imported.
+            row['exit_time'] = None
+        for name in ('entry_time', 'exit_time'):
+            if row[name] is not None:
+                row[name] = row[name].replace(tzinfo=timezone.utc).isoformat()
+        rows.append(row)
+    return rows
+
+async def process_loop(db, times, prices, up, down):
+    # back_test_the_stock's loop before services/backtest.py, one signal row at a time.
+    for signal_time, price, signal_up, signal_down in zip(times.tolist(), prices.tolist(), up.tolist(), down.tolist()):
+        signal_time = datetime.fromtimestamp(signal_time, tz=pytz.UTC)
+        await process_long_sl_target(db, STOCK, price, signal_time, back_testing=True, interval=INTERVAL)
+        await process_short_sl_target(db, STOCK, price, signal_time, back_testing=True, interval=INTERVAL)
+        if signal_up:
+            await process_short_trade(db, signal="SignalUp", stock_name=STOCK, price=price, time=signal_time, back_testing=True, interval=INTERVAL, quantity=QUANTITY, indicator=INDICATOR)
+            await process_long_trade(db, signal="SignalUp", stock_name=STOCK, price=price, time=signal_time, back_testing=True, interval=INTERVAL, quantity=QUANTITY, indicator=INDICATOR)
+        if signal_down:
+            await process_short_trade(db, signal="SignalDown", stock_name=STOCK, price=price, time=signal_time, back_testing=True, interval=INTERVAL, quantity=QUANTITY, indicator=INDICATOR)
+            await process_long_trade(db, signal="SignalDown", stock_name=STOCK, price=price, time=signal_time, back_testing=True, interval=INTERVAL, quantity=QUANTITY, indicator=INDICATOR)
+
+def process_loop_ledger(signals, scenario):
+    db = trade_book()
+    try:
+        for window in windows(signals, scenario):
+            asyncio.run(process_loop(db, *window))
+        return ledger(db)
+    finally:
+        db.close()
+
+def record():
+    arrays, ledgers = {}, {}
+    for name, bars, seed, volatility, rate in CASES:
+        signals = case_signals(bars, seed, volatility, rate)
+        for key, values in signals.items():
+            arrays[f'{name}.{key}'] = values
+        for scenario in SCENARIOS:
+            ledgers[f'{name}.{scenario}'] = process_loop_ledger(tuple(signals.values()), scenario)
+    np.savez_compressed(os.path.join(HERE, 'backtest_signals.npz'), **arrays)
+    with open(os.path.join(HERE, 'backtest_ledgers.json'), 'w') as handle:
+        json.dump(ledgers, handle)
+
+if __name__ == '__main__':
+    record()
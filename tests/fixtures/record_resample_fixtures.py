@@ -0,0 +1,97 @@
+"""
+Record the bar fixtures used by tests/test_resample.py:
+
+    python tests/fixtures/record_resample_fixtures.py
+
+One-minute and daily sessions are simulated, and every interval is then built
+from them the way Yahoo labels its bars (intraday bins from the session open in
+New York time, weeks from Monday, 5d bins from the epoch), straight from the
+one-minute or daily bars with pandas' own resample rather than with
+services.resample. The intraday stretch crosses the March DST change, a market
+holiday and an early close.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TZ = 'America/New_York'
+INTRADAY_DAYS = pd.bdate_range('2024-02-26', '2024-04-12')
+DAILY_DAYS = pd.bdate_range('2023-01-02', '2024-06-28')
+HOLIDAYS = {pd.Timestamp('2024-03-29'), pd.Timestamp('2023-07-04'), pd.Timestamp('2023-12-25'), pd.Timestamp('2024-01-01')}
+EARLY_CLOSES = {pd.Timestamp('2024-04-03'): '13:00'}
+AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+def _bars(index, rng):
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.0008, len(index))) * close
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        # Whole numbers, so sums come out the same in any order.
+        'Volume': rng.integers(100, 5_000, len(index)).astype('float64'),
+    }, index=index)
+
+def minute_bars(seed=5):
+    stamps = []
+    for day in INTRADAY_DAYS:
+        if day in HOLIDAYS:
+            continue
+        close = EARLY_CLOSES.get(day, '16:00')
+        stamps.append(pd.date_range(f'{day.date()} 09:30', f'{day.date()} {close}', freq='1min', inclusive='left', tz=TZ))
+    index = stamps[0].append(stamps[1:])
+    index.name = 'Datetime'
+    return _bars(index, np.random.default_rng(seed))
+
+def daily_bars(seed=6):
+    index = pd.DatetimeIndex([day for day in DAILY_DAYS if day not in HOLIDAYS]).tz_localize(TZ)
+    index.name = 'Date'
+    return _bars(index, np.random.default_rng(seed))
+
+def intraday(minutes, rule):
+    # Each session binned from its own 9:30 open, so DST never shifts the bins.
+    days = []
+    for _, session in minutes.groupby(minutes.index.normalize()):
+        days.append(session.resample(rule, origin=session.index[0], label='left', closed='left').agg(AGGREGATIONS))
+    return pd.concat(days).dropna(how='all')
+
+def weekly(daily):
+    # Weeks labelled by their Monday, whether or not the market opened that day.
+    return daily.resample('W-MON', label='left', closed='left').agg(AGGREGATIONS).dropna(how='all')
+
+def five_day(daily):
+    wall = daily.tz_localize(None)
+    bins = wall.resample('5D', origin='epoch').agg(AGGREGATIONS).dropna(how='all')
+    return bins.tz_localize(TZ)
+
+def record():
+    minutes = minute_bars()
+    daily = daily_bars()
+    frames = {
+        '15m': intraday(minutes, '15min'),
+        '30m': intraday(minutes, '30min'),
+        '1h': intraday(minutes, '60min'),
+        '90m': intraday(minutes, '90min'),
+        '1d': daily,
+        '5d': five_day(daily),
+        '1wk': weekly(daily),
+    }
+    arrays = {}
+    for interval, frame in frames.items():
+        arrays[f'{interval}.time'] = frame.index.tz_convert('UTC').as_unit('ns').asi8
+        for column in AGGREGATIONS:
+            arrays[f'{interval}.{column}'] = frame[column].to_numpy()
+    np.savez_compressed(os.path.join(HERE, 'resample_bars.npz'), **arrays)
+
+def load(path, interval):
+    # The recorded `interval` bars as a frame indexed in New York time.
+    fixture = np.load(path)
+    index = pd.DatetimeIndex(fixture[f'{interval}.time'].view('datetime64[ns]')).tz_localize('UTC').tz_convert(TZ)
+    index.name = 'Date' if interval in ('1d', '5d', '1wk') else 'Datetime'
+    return pd.DataFrame({column: fixture[f'{interval}.{column}'] for column in AGGREGATIONS}, index=index)
+
+if __name__ == '__main__':
+    record()
@@ -0,0 +1,76 @@
+"""
+Record the signal fixtures used by tests/test_ticker_signals.py from the
+per-row reference implementations in services/ticker.py:
+
+    python tests/fixtures/record_signal_fixtures.py
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+
+from services.ticker import calculate_rsi_exit_signals_reference, calculate_yellow_cross_signals_reference
+
+# (name, bars, seed, daily volatility); the volatile ones push RSI past 70/30 often.
+CASES = [
+    ('calm', 1500, 1, 0.01),
+    ('volatile', 1500, 2, 0.03),
+    ('trending', 1500, 3, 0.02),
+    ('short', 40, 4, 0.03),
+]
+
+def signal_inputs(bars, seed, volatility):
+    # Close/Open, Wilder RSI(14) and MACD(12/26/9) histogram, NaN over their
+    # warm-up bars as pandas_ta leaves them.
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, bars)))
+    open_ = close * np.exp(rng.normal(0, volatility / 3, bars))
+
+    change = pd.Series(close).diff()
+    gain = change.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+    loss = (-change.clip(upper=0)).ewm(alpha=1 / 14, adjust=False).mean()
+    rsi = (100 - 100 / (1 + gain / loss)).to_numpy()
+    rsi[:14] = np.nan
+
+    series = pd.Series(close)
+    macd = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+    macdh = (macd - macd.ewm(span=9, adjust=False).mean()).to_numpy()
+    macdh[:33] = np.nan
+    return {'close': close, 'open': open_, 'rsi': rsi, 'macdh': macdh}
+
+def signal_frame(inputs):
+    return pd.DataFrame({
+        'Close': inputs['close'],
+        'Open': inputs['open'],
+        'RSI': inputs['rsi'],
+        'MACDh_12_26_9': inputs['macdh'],
+    }, index=pd.date_range('2024-01-02 14:30', periods=len(inputs['close']), freq='15min', tz='UTC'))
+
+def record_yellow_cross():
+    arrays = {}
+    for name, bars, seed, volatility in CASES:
+        inputs = signal_inputs(bars, seed, volatility)
+        data = calculate_yellow_cross_signals_reference(signal_frame(inputs))
+        for key, values in inputs.items():
+            arrays[f'{name}.{key}'] = values
+        arrays[f'{name}.upperVwapCrossYellow'] = data['upperVwapCrossYellow'].to_numpy(dtype=bool)
+        arrays[f'{name}.lowerVwapCrossYellow'] = data['lowerVwapCrossYellow'].to_numpy(dtype=bool)
+    np.savez_compressed(os.path.join(HERE, 'yellow_cross_signals.npz'), **arrays)
+
+def record_rsi_exit():
+    arrays = {}
+    for name, bars, seed, volatility in CASES:
+        inputs = signal_inputs(bars, seed, volatility)
+        data = calculate_rsi_exit_signals_reference(signal_frame(inputs))
+        for key, values in inputs.items():
+            arrays[f'{name}.{key}'] = values
+        arrays[f'{name}.upperRsiOverbought'] = data['upperRsiOverbought'].to_numpy(dtype=np.int8)
+        arrays[f'{name}.lowerRsiOversold'] = data['lowerRsiOversold'].to_numpy(dtype=np.int8)
+    np.savez_compressed(os.path.join(HERE, 'rsi_exit_signals.npz'), **arrays)
+
+if __name__ == '__main__':
+    record_yellow_cross()
+    record_rsi_exit()
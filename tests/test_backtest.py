@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+
+pytest.importorskip('pandas_ta')
+
+from services.backtest import run_backtest, simulate_portfolio
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, FIXTURES)
+from record_backtest_fixtures import ( # noqa: E402
+    CASES, INDICATOR, INTERVAL, QUANTITY, SCENARIOS, STOCK, ledger, load_signals, process_loop_ledger, trade_book, windows,
+)
+
+with open(os.path.join(FIXTURES, 'backtest_ledgers.json')) as _handle:
+    LEDGERS = json.load(_handle)
+
+def signals(case):
+    return load_signals(os.path.join(FIXTURES, 'backtest_signals.npz'), case)
+
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+@pytest.mark.parametrize('case', [case[0] for case in CASES])
+def test_run_backtest_matches_recorded_process_loop(case, scenario):
+    db = trade_book()
+    try:
+        for window in windows(signals(case), scenario):
+            run_backtest(db, STOCK, INTERVAL, QUANTITY, INDICATOR, *window)
+        assert ledger(db) == LEDGERS[f'{case}.{scenario}']
+    finally:
+        db.close()
+
+def test_process_loop_reproduces_recording():
+    assert process_loop_ledger(signals('volatile'), 'carried') == LEDGERS['volatile.carried']
+
+@pytest.mark.parametrize('limit', [0, -3])
+def test_sweep_rejects_a_non_positive_limit(limit):
+    from fastapi import HTTPException
+    from api.v1.endpoints import _check_sweep
+    from schemas.tradeBook_schema import backTestSweep
+
+    with pytest.raises(HTTPException) as error:
+        _check_sweep(backTestSweep(tickers=['AAA'], limit=limit))
+    assert error.value.status_code == 400
+    _check_sweep(backTestSweep(tickers=['AAA'], limit=1))
+    _check_sweep(backTestSweep(tickers=['AAA']))
+
+def portfolio_signals(prices, up=(), down=()):
+    bars = len(prices)
+    flags = lambda bars_with: np.isin(np.arange(bars), bars_with)
+    return 1_704_205_800 + 900 * np.arange(bars, dtype='int64'), np.array(prices, dtype='float64'), flags(up), flags(down)
+
+def test_portfolio_closes_on_a_missing_close_at_the_last_one():
+    # The closing signal lands on a bar without a close.
+    signals = portfolio_signals([100, 101, 104, np.nan, 103], up=[0], down=[3])
+    result = simulate_portfolio([('AAA', signals)], initial_capital=10_000, max_positions=1, position_pct=50)
+
+    assert result['trades'] == 1 and result['open_trades'] == 0
+    assert result['realized_pnl'] == 50 * 4
+    assert result['final_equity'] == 10_200
+    assert np.isfinite(result['equity_curve']['equity']).all()
+
+def test_portfolio_opens_nothing_on_a_missing_close():
+    signals = portfolio_signals([100, np.nan, 102], up=[1])
+    result = simulate_portfolio([('AAA', signals)], initial_capital=10_000, max_positions=1, position_pct=50)
+
+    assert result['trades'] == 0 and result['open_trades'] == 0
+    assert result['rejected'] == {'max_positions': 0, 'capital': 0, 'size': 0}
+
+def test_portfolio_drawdown_counts_bars_between_events():
+    # Long from bar 0 to bar 4; it is 8% under water at bar 2, where nothing
+    # trades (the stoploss is 10% down).
+    signals = portfolio_signals([100, 97, 92, 98, 105], up=[0], down=[4])
+    result = simulate_portfolio([('AAA', signals)], initial_capital=10_000, max_positions=1, position_pct=50)
+
+    assert result['equity_curve']['time'] == signals[0].tolist()
+    assert result['max_drawdown'] == 50 * 8
+    assert result['final_equity'] == 10_250
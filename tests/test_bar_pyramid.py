@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.bar_pyramid import PYRAMID_RULES, BarPyramid
+
+# New York windows are rebuilt on every change (their pytz zones compare
+# unequal to the stored origin's); UTC ones go through extend().
+ZONES = ['America/New_York', 'UTC']
+
+def minute_closes(tz='America/New_York', days=2, seed=7):
+    # One-minute closes of regular New York sessions, indexed in tz.
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range('2024-03-07', periods=days, tz='America/New_York')
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(day + pd.Timedelta('9h30min'), day + pd.Timedelta('15h59min'), freq='1min') for day in sessions
+    ]))
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(index)))), index=index.tz_convert(tz), name='Close')
+
+def assert_resampled(levels, close):
+    for rule in PYRAMID_RULES:
+        expected = close.resample(rule).last().reindex(close.index).ffill()
+        pd.testing.assert_series_equal(levels[rule], expected, check_names=False, check_freq=False)
+
+@pytest.mark.parametrize('tz', ZONES)
+@pytest.mark.parametrize('step', [3, 7, 60])
+def test_aligned_follows_resample_over_a_sliding_window(step, tz):
+    close = minute_closes(tz)
+    pyramid = BarPyramid()
+    for end in range(300, len(close), step):
+        window = close.iloc[end - 300:end]
+        assert_resampled(pyramid.aligned(window), window)
+
+@pytest.mark.parametrize('tz', ZONES)
+def test_aligned_picks_up_a_revised_earlier_bar(tz):
+    close = minute_closes(tz)
+    pyramid = BarPyramid()
+    window = close.iloc[100:400]
+    pyramid.aligned(window)
+
+    # Same first and last bar, same length and last close; the 12:59 bar,
+    # the last of its 60 minute bin, is corrected.
+    revised = window.copy()
+    revised.iloc[revised.index.get_loc(pd.Timestamp('2024-03-07 12:59', tz='America/New_York').tz_convert(tz))] += 1.0
+    assert_resampled(pyramid.aligned(revised), revised)
+
+    # And the next window, one bar on, still carries the correction.
+    revised = pd.concat([revised.iloc[1:], close.iloc[400:401]])
+    assert_resampled(pyramid.aligned(revised), revised)
+
+@pytest.mark.parametrize('tz', ZONES)
+def test_aligned_picks_up_a_filled_in_gap(tz):
+    close = minute_closes(tz)
+    pyramid = BarPyramid()
+    gappy = close.iloc[:400].copy()
+    gappy.iloc[200:230] = np.nan
+    assert_resampled(pyramid.aligned(gappy), gappy)
+
+    filled = close.iloc[:401]
+    assert_resampled(pyramid.aligned(filled), filled)
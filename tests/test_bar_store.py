@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.bar_store import BarStore
+
+class FakeSource:
+    # Serves slices of a fixed bar history the way yf.download would, and
+    # records what was asked for.
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def __call__(self, tickers, interval, start, end):
+        self.calls.append((tickers, pd.Timestamp(start)))
+        names = [tickers] if isinstance(tickers, str) else tickers
+        frames = {}
+        for ticker in names:
+            frame = self.bars[ticker]
+            frame = frame[frame.index >= pd.Timestamp(start)]
+            if end is not None:
+                frame = frame[frame.index < pd.Timestamp(end)]
+            frames[ticker] = frame
+        if isinstance(tickers, str):
+            return frames[tickers]
+        # A batch download has (field, ticker) columns and a float Volume.
+        merged = pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+        return merged.astype({column: 'float64' for column in merged.columns if column[0] == 'Volume'})
+
+def history(count, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 20 + np.cumsum(rng.normal(0, 0.2, count))
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.05, count),
+        'High': close + 0.3,
+        'Low': close - 0.3,
+        'Close': close,
+        'Volume': rng.integers(1_000, 9_000, count),
+    }, index=pd.date_range('2024-06-03 13:30', periods=count, freq='5min', tz='UTC', name='Datetime'))
+
+START = pd.Timestamp('2024-06-03 13:30', tz='UTC')
+
+def assert_bars_equal(left, right, **kwargs):
+    pd.testing.assert_frame_equal(left, right, check_freq=False, **kwargs)
+
+@pytest.fixture
+def store(tmp_path):
+    source = FakeSource({'AAA': history(200, 1), 'BBB': history(200, 2)})
+    return BarStore(root=str(tmp_path), source=source, refresh_seconds=3600), source
+
+def test_first_read_downloads_and_later_reads_hit_the_files(store):
+    store, source = store
+    first = store.read('AAA', '5m', START)
+    second = store.read('AAA', '5m', START)
+
+    assert_bars_equal(first, source.bars['AAA'])
+    assert_bars_equal(second, source.bars['AAA'])
+    assert len(source.calls) == 1
+
+def test_window_is_sliced_without_copying(store):
+    store, source = store
+    window = store.read('AAA', '5m', START + pd.Timedelta(minutes=50), START + pd.Timedelta(minutes=100))
+
+    assert_bars_equal(window, source.bars['AAA'].iloc[10:20])
+    for name in window.columns:
+        values = window[name].to_numpy()
+        assert not values.flags.writeable and not values.flags.owndata
+
+def test_tail_refresh_replaces_the_forming_bar_and_appends(store):
+    store, source = store
+    bars = source.bars['AAA']
+    source.bars['AAA'] = bars.iloc[:150]
+    store.read('AAA', '5m', START)
+
+    # The last stored bar was still forming; it closes differently.
+    source.bars['AAA'] = bars.copy()
+    source.bars['AAA'].iloc[149, source.bars['AAA'].columns.get_loc('Close')] += 1.0
+    store.refresh_seconds = 0
+    refreshed = store.read('AAA', '5m', START)
+
+    assert_bars_equal(refreshed, source.bars['AAA'])
+    assert source.calls[-1] == ('AAA', bars.index[149])
+
+def test_frames_read_before_a_refresh_do_not_change(store):
+    store, source = store
+    bars = source.bars['AAA']
+    source.bars['AAA'] = bars.iloc[:150]
+    before = store.read('AAA', '5m', START)
+    kept = before.copy()
+
+    source.bars['AAA'] = bars + 1.0
+    store.refresh_seconds = 0
+    store.read('AAA', '5m', START)
+
+    pd.testing.assert_frame_equal(before, kept)
+
+def test_read_many_matches_a_batch_download(store):
+    store, source = store
+    frame = store.read_many(['AAA', 'BBB'], '5m', START)
+
+    assert len(source.calls) == 1 and source.calls[0][0] == ['AAA', 'BBB']
+    expected = source(['AAA', 'BBB'], '5m', START, None)
+    assert_bars_equal(frame, expected)
+
+def test_batch_tail_keeps_an_int_volume(store):
+    store, source = store
+    store.read('AAA', '5m', START)
+    store.refresh_seconds = 0
+    store.read_many(['AAA'], '5m', START)
+    store.read_many(['AAA', 'BBB'], '5m', START)
+
+    # The batch's float Volume is written back into the stored int column.
+    assert store.read('AAA', '5m', START)['Volume'].dtype == np.int64
+    assert_bars_equal(store.read('AAA', '5m', START), source.bars['AAA'])
+
+def test_older_window_triggers_a_full_download(store):
+    store, source = store
+    store.read('AAA', '5m', START + pd.Timedelta(hours=2))
+    store.read('AAA', '5m', START)
+
+    assert [start for _, start in source.calls] == [START + pd.Timedelta(hours=2), START]
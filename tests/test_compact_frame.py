@@ -0,0 +1,74 @@
+import threading
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+
+import services.ticker as ticker
+from services.bar_pyramid import BarPyramid
+from utils.memory import MemoryProbe
+
+def bars(count=3000, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 50 + np.cumsum(rng.normal(0, 0.3, count))
+    data = pd.DataFrame({
+        'Open': close + rng.normal(0, 0.1, count),
+        'High': close + rng.uniform(0, 0.6, count),
+        'Low': close - rng.uniform(0, 0.6, count),
+        'Close': close,
+        'Volume': rng.integers(100, 20_000, count).astype('float64'),
+    }, index=pd.date_range('2024-03-04 14:30', periods=count, freq='5min', tz='UTC'))
+    data.iloc[[100, 101, 1500]] = np.nan
+    return data
+
+@pytest.fixture
+def offline(monkeypatch):
+    monkeypatch.setattr(ticker, 'download_bars', lambda *args: bars())
+    monkeypatch.setattr(ticker, 'get_bar_pyramid', lambda *args: BarPyramid())
+
+def test_compact_build_matches_compacting_the_full_frame(offline):
+    full = ticker.build_ticker_frame('TEST', '5m')
+    compact = ticker.build_ticker_frame('TEST', '5m', compact=True)
+
+    pd.testing.assert_frame_equal(compact, ticker.compact_ticker_frame(full))
+    assert ticker.serialize_ticker_frame(compact) == ticker.serialize_ticker_frame(ticker.compact_ticker_frame(full))
+
+def test_compact_build_peaks_lower(offline):
+    peaks = {}
+    for compact in (False, True):
+        with MemoryProbe() as probe:
+            ticker.build_ticker_frame('TEST', '5m', compact=compact)
+        peaks[compact] = probe.report()['traced_peak_bytes']
+    assert peaks[True] < peaks[False]
+
+def test_overlapping_probes_keep_tracing_until_the_last_one_exits():
+    assert not tracemalloc.is_tracing()
+    first, second = MemoryProbe(), MemoryProbe()
+    first.__enter__()
+    second.__enter__()
+    first.__exit__(None, None, None)
+    assert tracemalloc.is_tracing()
+    second.__exit__(None, None, None)
+    assert not tracemalloc.is_tracing()
+    assert first.report()['traced_peak_bytes'] >= 0 and second.report()['traced_peak_bytes'] >= 0
+
+def test_concurrent_probes_do_not_race():
+    errors = []
+    def probe():
+        try:
+            for _ in range(50):
+                with MemoryProbe() as memory:
+                    [bytearray(1000) for _ in range(20)]
+                assert memory.report()['traced_peak_bytes'] >= 0
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=probe) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert not tracemalloc.is_tracing()
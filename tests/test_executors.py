@@ -0,0 +1,13 @@
+from utils.executors import process_pool, shutdown_executors
+
+def test_process_pool_is_kept_between_runs():
+    try:
+        pool = process_pool('test', 2)
+        assert process_pool('test', 2) is pool
+        # A run asking for another worker count gets a pool of its own size.
+        resized = process_pool('test', 3)
+        assert resized is not pool and resized._max_workers == 3
+    finally:
+        shutdown_executors()
+    assert process_pool('test', 3) is not resized
+    shutdown_executors()
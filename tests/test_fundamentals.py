@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+import services.fundamentals as fundamentals
+import services.market_data as market_data
+from services.fundamentals import FundamentalsCache, PRICE_FIELDS, STATIC_FIELDS
+
+class CountingProvider(market_data.MarketDataProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        return pd.DataFrame()
+
+    def info(self, ticker):
+        self.calls += 1
+        return {'symbol': ticker, 'currentPrice': float(self.calls), 'sector': 'Technology'}
+
+    def financials(self, ticker):
+        return pd.DataFrame()
+
+    def recommendations(self, ticker):
+        return pd.DataFrame()
+
+    def cashflow(self, ticker):
+        return pd.DataFrame()
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def cache(monkeypatch):
+    provider, clock = CountingProvider(), Clock()
+    monkeypatch.setattr(market_data, '_provider', provider)
+    monkeypatch.setattr(fundamentals.time, 'time', clock.time)
+    cache = FundamentalsCache(stale_multiple=5, workers=1)
+    yield cache, provider, clock
+    cache.executor.shutdown(wait=True)
+
+@pytest.mark.parametrize('fields, ttl', [
+    (('currentPrice',), 60),
+    (('sector',), 24 * 3600),
+    (('sector', 'currentPrice'), 60),
+    (('forwardPE',), fundamentals.DEFAULT_TTL),
+])
+def test_staleness_is_bounded_per_field(cache, fields, ttl):
+    cache, provider, clock = cache
+    cache.info('AAA')
+    entry = cache._lookup('AAA')
+
+    for age, state in [(ttl - 1, 'fresh'), (ttl + 1, 'stale'), (5 * ttl - 1, 'stale'), (5 * ttl + 1, 'missing')]:
+        clock.now = entry[0] + age
+        assert cache._state(entry, fields) == state
+
+def test_prices_are_refetched_long_before_sectors(cache):
+    cache, provider, clock = cache
+    cache.info('AAA')
+
+    # Ten minutes on, a price is too old to serve even stale; a sector is fresh.
+    clock.now += 600
+    assert cache._state(cache._lookup('AAA'), PRICE_FIELDS) == 'missing'
+    assert cache._state(cache._lookup('AAA'), STATIC_FIELDS) == 'fresh'
+    assert cache.info('AAA', fields=('sector',))['currentPrice'] == 1.0
+    assert cache.info('AAA', fields=('currentPrice',))['currentPrice'] == 2.0
+    assert provider.calls == 2
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+
+from services.incremental import (
+    IncrementalATR, IncrementalEMA, IncrementalEWM, IncrementalMACD, IncrementalRollingExtreme, IncrementalRSI,
+    IncrementalSMA, IncrementalTTMMomentum, LiveSqueezeSignals,
+)
+from services.indicators import IndicatorGraph
+from services.ticker import calculate_ttm_squeeze_signals
+
+FLAGS = ['noSqz', 'squeeze_signal_up', 'squeeze_signal_down', 'ripster_signal_up', 'ripster_signal_down']
+
+def session_bars(freq, days, seed):
+    # Regular sessions of New York bars, 9:30 to 16:00.
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range('2024-03-01', periods=days, tz='America/New_York')
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(day + pd.Timedelta('9h30min'), day + pd.Timedelta('15h59min'), freq=freq) for day in sessions
+    ]))
+    bars = len(index)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, bars)))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + rng.random(bars) * 0.002),
+        'Low': np.minimum(open_, close) * (1 - rng.random(bars) * 0.002),
+        'Close': close,
+        'Volume': rng.integers(1000, 5000, bars).astype(float),
+    }, index=index)
+
+def batch_row(window):
+    return calculate_ttm_squeeze_signals(window.copy()).iloc[-1]
+
+def assert_same_row(row, batch):
+    assert {name: row[name] for name in FLAGS} == {name: bool(batch[name]) for name in FLAGS}
+    assert row['time'] == batch.name.value // 10**9
+    assert row['price'] == batch['Close']
+    # The live averages started before the window did; what is left of that
+    # start has all but decayed.
+    assert row['ema5'] == pytest.approx(batch['ema5'], rel=1e-9)
+    assert row['ema13'] == pytest.approx(batch['ema13'], rel=1e-9)
+
+# (bar size, sessions, seed, window length). Every bar of the 15 minute case
+# falls on its own 1/5/15 minute bin and groups of four share a 60 minute one;
+# 1 minute bars also fill 5, 15 and 60 minute groups.
+CASES = [('15min', 12, 3, 150), ('1min', 2, 3, 400)]
+
+@pytest.mark.parametrize('freq, days, seed, length', CASES)
+def test_live_signals_follow_the_batch_over_a_sliding_window(freq, days, seed, length):
+    bars = session_bars(freq, days, seed)
+    if freq == '15min':
+        # A bar without a close or volume on an hour, and one on a half hour.
+        bars.loc[bars.index[length + 22], ['Close', 'Volume']] = np.nan
+        bars.loc[bars.index[length + 60], 'Close'] = np.nan
+    live = LiveSqueezeSignals()
+    live.update_from_frame(bars.iloc[:length])
+    fired = {'squeeze': 0, 'ripster': 0}
+    for end in range(length + 1, length + 101):
+        window = bars.iloc[end - length:end]
+        batch = batch_row(window)
+        assert_same_row(live.update_from_frame(window), batch)
+        for name in fired:
+            fired[name] += bool(batch[f'{name}_signal_up'] or batch[f'{name}_signal_down'])
+    # The comparison covered bars where both kinds of signal fire.
+    assert all(fired.values()), fired
+
+def test_live_signals_redo_a_revised_last_bar():
+    bars = session_bars('1min', 2, 3)
+    live = LiveSqueezeSignals()
+    window = bars.iloc[:500]
+    live.update_from_frame(window)
+    for step in range(1, 4):
+        # The forming bar moves; the next window shows it again, revised.
+        revised = window.copy()
+        revised.iloc[-1, revised.columns.get_loc('Close')] *= 1 + 0.002 * step
+        revised.iloc[-1, revised.columns.get_loc('High')] = revised['Close'].iloc[-1] * 1.001
+        revised.iloc[-1, revised.columns.get_loc('Volume')] += 500 * step
+        assert_same_row(live.update_from_frame(revised), batch_row(revised))
+    window = bars.iloc[:502]
+    assert_same_row(live.update_from_frame(window), batch_row(window))
+
+def test_live_signals_start_over_on_a_window_past_the_last_bar():
+    bars = session_bars('15min', 12, 3)
+    live = LiveSqueezeSignals()
+    live.update_from_frame(bars.iloc[:100])
+    window = bars.iloc[150:300]
+    assert_same_row(live.update_from_frame(window), batch_row(window))
+
+def close_bars():
+    return session_bars('15min', 12, 5)
+
+def assert_matches(incremental, batch):
+    np.testing.assert_allclose(np.asarray(incremental, dtype=float), batch.to_numpy(dtype=float), rtol=1e-10, atol=1e-10)
+
+def test_ewm_matches_pandas_with_gaps():
+    close = close_bars()['Close']
+    close.iloc[[0, 40, 41, 90]] = np.nan
+    for params in [{'span': 5, 'adjust': False}, {'span': 13, 'adjust': True}, {'alpha': 1 / 14, 'adjust': True, 'min_periods': 14}]:
+        ewm = IncrementalEWM(**params)
+        assert_matches([ewm.update(value) for value in close], close.ewm(**params).mean())
+
+def test_building_blocks_match_the_indicator_graph():
+    bars = close_bars()
+    graph = IndicatorGraph(bars)
+    rows = list(bars[['High', 'Low', 'Close']].itertuples(index=False))
+
+    ema = IncrementalEMA(20)
+    assert_matches([ema.update(close) for _, _, close in rows], graph.get('ema', source='Close', length=20))
+    for fast, slow, signal in [(12, 26, 9), (24, 52, 9)]:
+        macd = IncrementalMACD(fast, slow, signal)
+        assert_matches([macd.update(close) for _, _, close in rows], graph.get('macd', fast=fast, slow=slow, signal=signal))
+    rsi = IncrementalRSI(14)
+    assert_matches([rsi.update(close) for _, _, close in rows], graph.get('rsi', length=14))
+    atr = IncrementalATR(14)
+    assert_matches([atr.update(*row) for row in rows], graph.get('atr', length=14))
+
+    sma = IncrementalSMA(20)
+    means, stds = zip(*[(sma.update(close), sma.std) for _, _, close in rows])
+    assert_matches(means, graph.get('sma', source='Close', length=20))
+    assert_matches(stds, graph.get('rolling_std', source='Close', length=20))
+    highest, lowest = IncrementalRollingExtreme(20, 'max'), IncrementalRollingExtreme(20, 'min')
+    assert_matches([highest.update(high) for high, _, _ in rows], graph.get('rolling_max', source='High', length=20))
+    assert_matches([lowest.update(low) for _, low, _ in rows], graph.get('rolling_min', source='Low', length=20))
+    momentum = IncrementalTTMMomentum(20)
+    assert_matches([momentum.update(*row) for row in rows], graph.get('ttm_momentum', length=20))
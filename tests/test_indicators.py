@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+
+from services.indicators import IndicatorGraph
+from services.ticker import calculate_ttm_squeeze_signals
+
+SQUEEZE_COLUMNS = ['sqz1', 'sqz2', 'sqz3', 'sqz4', 'mom_down', 'high_volume', 'ema5', 'ema13', 'ripster_signal_up', 'yellow_signal_down']
+
+def gappy_bars(bars=400, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, bars))
+    data = pd.DataFrame({
+        'Open': close + rng.normal(0, 0.2, bars),
+        'High': close + rng.uniform(0, 1, bars),
+        'Low': close - rng.uniform(0, 1, bars),
+        'Close': close,
+        'Volume': rng.integers(1_000, 50_000, bars).astype('float64'),
+    }, index=pd.date_range('2024-01-02 14:30', periods=bars, freq='1min', tz='UTC'))
+    data.iloc[[50, 51, 52, 200, 333]] = np.nan
+    return data
+
+def test_squeeze_reads_forward_filled_prices():
+    # The squeeze section used to run after data.ffill(); values the graph
+    # cached from the gappy prices earlier in the pipeline must not leak in.
+    gappy = gappy_bars()
+    graph = IndicatorGraph(gappy)
+    graph.get('sma', source='Close', length=20)
+    graph.get('sma', source='Volume', length=10)
+    result = calculate_ttm_squeeze_signals(gappy, graph=graph)
+
+    expected = calculate_ttm_squeeze_signals(gappy_bars().ffill())
+    pd.testing.assert_frame_equal(result[SQUEEZE_COLUMNS], expected[SQUEEZE_COLUMNS])
+
+def test_summary_books_time_on_each_node():
+    graph = IndicatorGraph(gappy_bars().ffill())
+    graph.get('ttm_momentum', length=20)
+    rows = graph.summary()
+
+    names = {row['indicator'] for row in rows}
+    assert {'ttm_momentum', 'ttm_momentum_source', 'rolling_max', 'rolling_min', 'sma'} <= names
+    assert [row['seconds'] for row in rows] == sorted((row['seconds'] for row in rows), reverse=True)
+    assert all(row['seconds'] >= 0 for row in rows)
+
+def test_rebase_drops_cached_values_and_keeps_timings():
+    data = gappy_bars()
+    graph = IndicatorGraph(data)
+    before = graph.get('sma', source='Close', length=20)
+    graph.rebase(data.ffill())
+    after = graph.get('sma', source='Close', length=20)
+
+    assert before.isna().sum() > after.isna().sum()
+    assert len(graph.summary()) == 1
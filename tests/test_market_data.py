@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.market_data import MarketDataProvider, RecordingProvider, ReplayProvider, join_download, split_download
+
+def bars(seed, start='2024-06-03 13:30', count=50):
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.1, count))
+    return pd.DataFrame(
+        {'Open': close, 'High': close + 0.1, 'Low': close - 0.1, 'Close': close, 'Volume': rng.integers(1, 1000, count).astype('float64')},
+        index=pd.date_range(start, periods=count, freq='5min', tz='UTC', name='Datetime')
+    )
+
+class FakeProvider(MarketDataProvider):
+    def __init__(self, history):
+        self.history = history
+
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        names = [tickers] if isinstance(tickers, str) else tickers
+        frames = {ticker: self.history[ticker][lambda frame: (frame.index >= start) & (frame.index < end)] for ticker in names}
+        return frames[tickers] if isinstance(tickers, str) else join_download(frames)
+
+    def info(self, ticker):
+        return {'symbol': ticker}
+
+    def financials(self, ticker):
+        return pd.DataFrame()
+
+    def recommendations(self, ticker):
+        return pd.DataFrame()
+
+    def cashflow(self, ticker):
+        return pd.DataFrame()
+
+HISTORY = {'AAA': bars(1), 'BBB': bars(2), 'CCC': bars(3)}
+T0 = pd.Timestamp('2024-06-03 13:30', tz='UTC')
+
+def record(directory):
+    recorder = RecordingProvider(FakeProvider(HISTORY), str(directory))
+    # A batch of two, then a later tail for one of them on its own.
+    recorder.download(['AAA', 'BBB'], start=T0, end=T0 + pd.Timedelta(minutes=150), interval='5m')
+    recorder.download('AAA', start=T0 + pd.Timedelta(minutes=145), end=T0 + pd.Timedelta(minutes=250), interval='5m')
+    recorder.download(['CCC'], start=T0, end=T0 + pd.Timedelta(minutes=250), interval='5m')
+
+def test_provider_interface_is_abstract():
+    class Partial(MarketDataProvider):
+        def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+            return pd.DataFrame()
+
+    with pytest.raises(TypeError):
+        MarketDataProvider()
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_replay_answers_any_batch_split(tmp_path):
+    record(tmp_path)
+    replay = ReplayProvider(str(tmp_path))
+
+    pd.testing.assert_frame_equal(replay.download('AAA', interval='5m'), HISTORY['AAA'], check_freq=False, check_like=True)
+    pd.testing.assert_frame_equal(replay.download('BBB', interval='5m'), HISTORY['BBB'].iloc[:30], check_freq=False, check_like=True)
+
+    batch = split_download(replay.download(['CCC', 'AAA'], interval='5m'), ['CCC', 'AAA'])
+    pd.testing.assert_frame_equal(batch['AAA'], HISTORY['AAA'], check_freq=False, check_like=True)
+    pd.testing.assert_frame_equal(batch['CCC'], HISTORY['CCC'], check_freq=False, check_like=True)
+
+def test_replay_respects_the_request_window(tmp_path):
+    record(tmp_path)
+    replay = ReplayProvider(str(tmp_path), respect_window=True)
+    start, end = T0 + pd.Timedelta(minutes=100), T0 + pd.Timedelta(minutes=200)
+
+    window = split_download(replay.download(['AAA', 'BBB'], start=start, end=end, interval='5m'), ['AAA', 'BBB'])
+    pd.testing.assert_frame_equal(window['AAA'], HISTORY['AAA'].iloc[20:40], check_freq=False, check_like=True)
+    pd.testing.assert_frame_equal(window['BBB'], HISTORY['BBB'].iloc[20:30], check_freq=False, check_like=True)
+
+def test_replay_leaves_out_unrecorded_tickers(tmp_path):
+    record(tmp_path)
+    replay = ReplayProvider(str(tmp_path))
+
+    assert set(split_download(replay.download(['AAA', 'ZZZ'], interval='5m'), ['AAA', 'ZZZ'])) == {'AAA'}
+    with pytest.raises(LookupError):
+        replay.download('ZZZ', interval='5m')
+    with pytest.raises(LookupError):
+        replay.download(['ZZZ', 'YYY'], interval='5m')
+    with pytest.raises(LookupError):
+        replay.download('AAA', interval='1d')
@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy import Column, MetaData, Table, create_engine, event, func, inspect, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models.tickerScores import TickerScore
+from services.ticker_score_crud import create_ticker_score, upsert_ticker_scores
+from utils.migrations import SCORE_DATE_INDEX, add_score_date, dedupe_ticker_scores
+
+def at(day, hour):
+    return datetime(2024, 6, day, hour, tzinfo=timezone.utc)
+
+# (ticker, created_at): AAA was scored twice on the 3rd before score_date existed.
+LEGACY_ROWS = [('AAA', at(3, 14)), ('AAA', at(3, 20)), ('AAA', at(4, 14)), ('BBB', at(3, 15))]
+
+@pytest.fixture
+def engine():
+    # ticker_scores as it was before score_date and its unique index.
+    from database import Base
+    import models.latestTickerScores, models.symbols, models.ticker_categories, models.tradeBook # noqa: F401
+
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[table for name, table in Base.metadata.tables.items() if name != 'ticker_scores'])
+    legacy = Table('ticker_scores', MetaData(), *[
+        Column(column.name, column.type, primary_key=column.primary_key)
+        for column in TickerScore.__table__.columns if column.name != 'score_date'
+    ])
+    legacy.create(engine)
+    with engine.begin() as connection:
+        connection.execute(legacy.insert(), [
+            {'ticker_symbol': ticker, 'ticker_name': ticker, 'long_score': index, 'is_deleted': False, 'created_at': created_at}
+            for index, (ticker, created_at) in enumerate(LEGACY_ROWS)
+        ])
+    yield engine
+    engine.dispose()
+
+def statements(engine):
+    seen = []
+    event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: seen.append(statement))
+    return seen
+
+def unique_names(engine):
+    inspector = inspect(engine)
+    names = {index['name'] for index in inspector.get_indexes('ticker_scores') if index.get('unique')}
+    return names | {constraint['name'] for constraint in inspector.get_unique_constraints('ticker_scores')}
+
+def day_rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(TickerScore.id, TickerScore.ticker_symbol, TickerScore.score_date, func.date(TickerScore.created_at))
+            .order_by(TickerScore.id)
+        ).all()
+
+def test_startup_migration_keeps_duplicate_days(engine):
+    add_score_date(engine)
+
+    rows = day_rows(engine)
+    assert len(rows) == len(LEGACY_ROWS)
+    assert all(str(score_date) == created_day for _, _, score_date, created_day in rows)
+    assert SCORE_DATE_INDEX not in unique_names(engine)
+
+    # Without the index the run's writes go row by row, no ON CONFLICT.
+    seen = statements(engine)
+    session = sessionmaker(bind=engine)()
+    upsert_ticker_scores(session, [{'ticker_symbol': 'BBB', 'long_score': 9, 'created_at': at(3, 21)}])
+    session.close()
+    assert not any('ON CONFLICT' in statement for statement in seen if 'INTO ticker_scores' in statement)
+    assert len(day_rows(engine)) == len(LEGACY_ROWS)
+
+def test_dedupe_keeps_the_newest_row_per_day_and_enables_upserts(engine):
+    add_score_date(engine)
+    assert dedupe_ticker_scores(engine) == 1
+
+    assert [(score_id, ticker) for score_id, ticker, _, _ in day_rows(engine)] == [(2, 'AAA'), (3, 'AAA'), (4, 'BBB')]
+    assert SCORE_DATE_INDEX in unique_names(engine)
+
+    seen = statements(engine)
+    session = sessionmaker(bind=engine)()
+    written = upsert_ticker_scores(session, [
+        {'ticker_symbol': 'AAA', 'long_score': 7, 'created_at': at(4, 19)},
+        {'ticker_symbol': 'CCC', 'long_score': 1, 'created_at': at(4, 19)},
+    ])
+    session.close()
+    assert sum('ON CONFLICT' in statement for statement in seen if 'INTO ticker_scores' in statement) == 1
+    assert [str(row['score_date']) for row in written] == ['2024-06-04', '2024-06-04']
+    assert [(score_id, ticker) for score_id, ticker, _, _ in day_rows(engine)] == [(2, 'AAA'), (3, 'AAA'), (4, 'BBB'), (5, 'CCC')]
+
+def test_writes_key_rows_by_the_databases_date(db):
+    create_ticker_score(db, {'ticker_symbol': 'AAA', 'long_score': 1, 'created_at': at(3, 23)})
+    upsert_ticker_scores(db, [{'ticker_symbol': 'BBB', 'long_score': 2, 'created_at': at(3, 23)}])
+
+    rows = day_rows(db.bind)
+    assert len(rows) == 2
+    assert all(str(score_date) == created_day == '2024-06-03' for _, _, score_date, created_day in rows)
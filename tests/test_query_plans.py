@@ -0,0 +1,103 @@
+import os
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from services.ticker_score_crud import get_ticker_score_history, get_ticker_scores, upsert_ticker_scores
+
+# The score reads must stay on their indexes: the dashboard listing on the
+# partial index of live latest rows, history on (ticker_symbol, created_at).
+# Each read is run, the SQL it sent is captured and EXPLAINed on the same
+# database. Set TEST_POSTGRES_URL to an empty scratch database to check the
+# PostgreSQL plans as well.
+
+START = datetime(2024, 6, 3, 14, tzinfo=timezone.utc)
+TICKERS = [f'T{index:03d}' for index in range(40)]
+
+READS = {
+    'listing': lambda db: get_ticker_scores(db),
+    'one ticker': lambda db: get_ticker_scores(db, 'T007'),
+    'history': lambda db: get_ticker_score_history(db, ['T001', 'T002', 'T003'], START + timedelta(days=5), START + timedelta(days=20)),
+}
+
+def fill(db, days=30):
+    for day in range(days):
+        upsert_ticker_scores(db, [
+            {'ticker_symbol': ticker, 'long_score': (day + index) % 7, 'short_score': -(index % 3), 'created_at': START + timedelta(days=day)}
+            for index, ticker in enumerate(TICKERS)
+        ])
+
+def sent_by(db, read):
+    # The SELECT a read sends, with its parameters.
+    seen = []
+    listener = lambda conn, cursor, statement, parameters, *args: seen.append((statement, parameters))
+    event.listen(db.bind, 'before_cursor_execute', listener)
+    try:
+        read(db)
+    finally:
+        event.remove(db.bind, 'before_cursor_execute', listener)
+    return [(statement, parameters) for statement, parameters in seen if statement.lstrip().startswith('SELECT')][-1]
+
+def sqlite_plan(db, read):
+    statement, parameters = sent_by(db, read)
+    return ' | '.join(row[-1] for row in db.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters))
+
+@pytest.fixture
+def filled(db):
+    fill(db)
+    db.connection().exec_driver_sql('ANALYZE')
+    return db
+
+@pytest.mark.parametrize('read, expected', [
+    ('listing', 'SCAN latest_ticker_scores USING INDEX ix_latest_ticker_scores_live_created_at'),
+    ('one ticker', 'SEARCH latest_ticker_scores USING INDEX sqlite_autoindex_latest_ticker_scores_1 (ticker_symbol=?)'),
+    ('history', 'SEARCH ticker_scores USING INDEX ix_ticker_scores_history (ticker_symbol=? AND created_at>? AND created_at<?)'),
+])
+def test_sqlite_reads_use_their_index(filled, read, expected):
+    plan = sqlite_plan(filled, READS[read])
+    assert expected in plan
+    # Rows come out of the index already in order.
+    assert 'TEMP B-TREE' not in plan
+
+@pytest.fixture
+def postgres():
+    url = os.environ.get('TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    from database import Base
+    import models.latestTickerScores, models.symbols, models.tickerScores, models.ticker_categories, models.tradeBook # noqa: F401
+
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        fill(session)
+        # Vacuumed, so the visibility map lets history be read from the index alone.
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.exec_driver_sql('VACUUM ANALYZE')
+        # A few thousand rows fit in a page or two; take the planner's
+        # cheapest way to use an index rather than a scan of tiny tables.
+        session.connection().exec_driver_sql('SET enable_seqscan = off')
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+def postgres_plan(db, read):
+    statement, parameters = sent_by(db, read)
+    return '\n'.join(row[0] for row in db.connection().exec_driver_sql('EXPLAIN ' + statement, parameters))
+
+def test_postgres_listing_reads_the_partial_index_in_order(postgres):
+    # Newest first is the ascending index read backward.
+    plan = postgres_plan(postgres, READS['listing'])
+    assert 'Index Scan Backward using ix_latest_ticker_scores_live_created_at' in plan
+    assert 'Sort' not in plan
+
+def test_postgres_history_is_read_from_the_index_alone(postgres):
+    # The INCLUDE columns answer the query without touching the table. (Before
+    # PostgreSQL 17 an IN list of tickers still sorts the index's output.)
+    plan = postgres_plan(postgres, READS['history'])
+    assert 'Index Only Scan using ix_ticker_scores_history' in plan
@@ -0,0 +1,68 @@
+import os
+import sys
+import pandas as pd
+import pytest
+import services.market_data as market_data
+from services.market_data import MarketDataProvider, join_download
+from services.resample import resample_bars, validate_derived
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, FIXTURES)
+from record_resample_fixtures import load # noqa: E402
+
+DERIVED = [('30m', '15m'), ('1h', '15m'), ('90m', '15m'), ('5d', '1d'), ('1wk', '1d')]
+
+def fixture(interval):
+    return load(os.path.join(FIXTURES, 'resample_bars.npz'), interval)
+
+def assert_bars_equal(derived, expected):
+    pd.testing.assert_frame_equal(derived, expected, check_freq=False)
+
+@pytest.mark.parametrize('interval, base', DERIVED)
+def test_derived_bars_match_recorded_bars(interval, base):
+    assert_bars_equal(resample_bars(fixture(base), interval), fixture(interval))
+
+@pytest.mark.parametrize('interval', ['30m', '1h', '90m'])
+def test_window_starting_mid_session_keeps_the_session_bins(interval):
+    # The first day starts at 11:15; the open still comes from the other days.
+    base = fixture('15m').iloc[7:]
+    derived = resample_bars(base, interval)
+    expected = fixture(interval)
+    second_day = pd.Timestamp('2024-02-27', tz='America/New_York')
+    assert_bars_equal(derived[derived.index >= second_day], expected[expected.index >= second_day])
+
+class FixtureProvider(MarketDataProvider):
+    # Serves the recorded bars for every ticker, as yf.download would.
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        if isinstance(tickers, str):
+            return fixture(interval)
+        return join_download({ticker: fixture(interval) for ticker in tickers})
+
+    def info(self, ticker):
+        return {}
+
+    def financials(self, ticker):
+        return pd.DataFrame()
+
+    def recommendations(self, ticker):
+        return pd.DataFrame()
+
+    def cashflow(self, ticker):
+        return pd.DataFrame()
+
+@pytest.mark.parametrize('interval, base', DERIVED)
+@pytest.mark.parametrize('tickers', [['AAA'], ['AAA', 'BBB']])
+def test_validate_derived_reports_a_clean_match(monkeypatch, interval, base, tickers):
+    monkeypatch.setattr(market_data, '_provider', FixtureProvider())
+    report = validate_derived(tickers, interval, None, None)
+
+    for ticker in tickers:
+        result = report[ticker]
+        assert result['missing_bars'] == [] and result['extra_bars'] == []
+        assert result['matched_bars'] == result['upstream_bars'] == len(fixture(interval)) - 1
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            assert result[f'max_{column}_error'] == 0.0
+
+def test_validate_derived_rejects_downloaded_intervals():
+    with pytest.raises(ValueError):
+        validate_derived(['AAA'], '15m', None, None)
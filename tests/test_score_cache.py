@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+from services.score_cache import ScoreCache, bar_close, valid_until
+
+NY = 'America/New_York'
+
+def at(stamp):
+    return pd.Timestamp(stamp, tz=NY)
+
+def unix(stamp):
+    return at(stamp).to_pydatetime().timestamp()
+
+@pytest.mark.parametrize('interval, last_bar, closes', [
+    ('15m', '2024-03-12 10:00', '2024-03-12 10:15'),
+    # The session's last 90m bin is cut short by the close.
+    ('90m', '2024-03-12 15:30', '2024-03-12 16:00'),
+    ('1h', '2024-03-12 15:30', '2024-03-12 16:00'),
+    ('1d', '2024-03-12', '2024-03-12 16:00'),
+    # Across the DST change the close is still 16:00 New York time.
+    ('1d', '2024-03-10', '2024-03-10 16:00'),
+    ('1wk', '2024-03-11', '2024-03-17 16:00'),
+    # The week the clocks go back still ends on its Sunday.
+    ('1wk', '2024-10-28', '2024-11-03 16:00'),
+])
+def test_bar_close(interval, last_bar, closes):
+    assert bar_close(at(last_bar), interval) == at(closes)
+
+def test_forming_intraday_bar_is_good_until_it_closes():
+    until, complete = valid_until(at('2024-03-12 10:00'), '15m', now=at('2024-03-12 10:07'))
+    assert (until, complete) == (unix('2024-03-12 10:15'), False)
+
+def test_forming_daily_bar_expires_at_the_session_close():
+    # Not at midnight: the bar keeps changing until 16:00 and is final after.
+    until, complete = valid_until(at('2024-03-12'), '1d', now=at('2024-03-12 11:00'))
+    assert (until, complete) == (unix('2024-03-12 16:00'), False)
+
+def test_forming_weekly_bar_expires_at_todays_close():
+    until, complete = valid_until(at('2024-03-11'), '1wk', now=at('2024-03-13 11:00'))
+    assert (until, complete) == (unix('2024-03-13 16:00'), False)
+
+@pytest.mark.parametrize('interval, last_bar, now, expires', [
+    # After the close, and after midnight before the next session: the next
+    # bar trades until 16:00, not until the next midnight.
+    ('1d', '2024-03-12', '2024-03-12 18:00', '2024-03-13 16:00'),
+    ('1d', '2024-03-12', '2024-03-13 00:15', '2024-03-13 16:00'),
+    # A day behind: the bar after the last one scored has closed too.
+    ('1d', '2024-03-12', '2024-03-13 17:00', '2024-03-14 16:00'),
+    ('1d', '2024-11-02', '2024-11-04 00:30', '2024-11-04 16:00'),
+    # Scored after the week closed, then early on the Monday.
+    ('1wk', '2024-03-04', '2024-03-10 18:00', '2024-03-17 16:00'),
+    ('1wk', '2024-03-04', '2024-03-11 00:15', '2024-03-17 16:00'),
+    ('15m', '2024-03-12 10:00', '2024-03-12 10:20', '2024-03-12 10:30'),
+])
+def test_closed_bar_is_good_until_the_next_one_closes(interval, last_bar, now, expires):
+    until, complete = valid_until(at(last_bar), interval, now=at(now))
+    assert (until, complete) == (unix(expires), True)
+
+def test_put_records_the_last_bar_and_whether_it_had_closed(tmp_path):
+    cache = ScoreCache(str(tmp_path / 'scores.json')).load()
+    now = pd.Timestamp.now(tz=NY)
+    cache.put(['OLD', 'NEW', 'GONE'], '15m', [('OLD', 3, 'high squeeze'), ('NEW', -2, False)], {
+        'OLD': now.floor('15min') - pd.Timedelta('1D'),
+        'NEW': now.floor('15min'),
+    })
+    cache.save()
+
+    entries = ScoreCache(str(tmp_path / 'scores.json')).load().entries['15m']
+    assert entries['OLD']['complete'] is True
+    assert entries['NEW']['complete'] is False
+    assert entries['NEW']['valid_until'] <= (now.floor('15min') + pd.Timedelta('15min')).timestamp()
+    assert entries['GONE']['absent'] is True
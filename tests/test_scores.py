@@ -0,0 +1,65 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+
+import services.market_data as market_data
+from services.market_data import MarketDataProvider, join_download
+from services.scores import SCORE_COLUMNS, calculate_ticker_scores_multiframe
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, FIXTURES)
+from record_resample_fixtures import load # noqa: E402
+
+def test_no_results_still_unpacks(tmp_path):
+    tickers = tmp_path / 'tickers.txt'
+    tickers.write_text('')
+
+    scores_df, results = calculate_ticker_scores_multiframe(str(tickers), workers=0, use_cache=False)
+
+    assert results == []
+    assert list(scores_df.columns) == SCORE_COLUMNS
+    assert scores_df.to_dict(orient='records') == []
+
+class RecordedBars(MarketDataProvider):
+    # The resample fixtures for every ticker; counts the info lookups.
+    def __init__(self):
+        self.info_calls = []
+
+    def download(self, tickers, start=None, end=None, interval='1d', progress=False):
+        bars = load(os.path.join(FIXTURES, 'resample_bars.npz'), interval)
+        return bars if isinstance(tickers, str) else join_download({ticker: bars for ticker in tickers})
+
+    def info(self, ticker):
+        self.info_calls.append(ticker)
+        return {'currentPrice': 12.5, 'sector': 'Looked up'}
+
+    def financials(self, ticker):
+        return pd.DataFrame()
+
+    def recommendations(self, ticker):
+        return pd.DataFrame()
+
+    def cashflow(self, ticker):
+        return pd.DataFrame()
+
+def test_run_uses_the_ticker_info_it_is_given(tmp_path, monkeypatch):
+    # The endpoints look the info up in the API process; the run in the pool
+    # must not go to its own, cold, fundamentals cache for it.
+    provider = RecordedBars()
+    monkeypatch.setattr(market_data, '_provider', provider)
+    tickers = tmp_path / 'tickers.txt'
+    tickers.write_text('AAA|Aaa Inc|1\nBBB|Bbb Inc|2\n')
+
+    scores_df, results = calculate_ticker_scores_multiframe(
+        str(tickers), intervals=['15m', '1d'], workers=0, use_cache=False,
+        ticker_info=({'AAA': 101.5, 'BBB': None}, {'AAA': 'Technology', 'BBB': 'Energy'}),
+    )
+
+    assert provider.info_calls == []
+    assert [(row['ticker_symbol'], row['current_price'], row['sector']) for row in results] == [
+        ('AAA', 101.5, 'Technology'), ('BBB', 0.0, 'Energy'),
+    ]
+    assert scores_df['current_price'].tolist() == [101.5, 0.0]
@@ -0,0 +1,68 @@
+import io
+from datetime import datetime, timezone
+import numpy as np
+import pyarrow as pa # type: ignore
+from fastapi.encoders import jsonable_encoder
+from models.latestTickerScores import LatestTickerScore
+from services.ticker_score_crud import get_ticker_scores, ticker_scores_to_columns, ticker_scores_to_float64_columns, upsert_ticker_scores
+from utils.binary_encoding import arrow_response, float64_buffers_response
+
+RESULTS = [
+    {'ticker_symbol': 'AAPL', 'ticker_name': 'Apple', 'long_score': 80, 'short_score': -20, 'w_score': 10, 'w_squeeze': 'high squeeze',
+     'long_rank': 'A+', 'short_rank': 'B', 'trend': 'up', 'current_price': 190.25, 'sector': 'Technology',
+     'created_at': datetime(2024, 5, 1, 14, 30, tzinfo=timezone.utc)},
+    {'ticker_symbol': 'MSFT', 'ticker_name': 'Microsoft', 'long_score': -40, 'short_score': 60, 'current_price': None,
+     'created_at': datetime(2024, 5, 1, 15, 0, tzinfo=timezone.utc)},
+]
+
+def stored_json(db):
+    upsert_ticker_scores(db, RESULTS)
+    scores = get_ticker_scores(db)
+    return scores, jsonable_encoder(scores)
+
+def parse_time(value):
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def test_arrow_columns_match_json(db):
+    scores, rows = stored_json(db)
+    response = arrow_response(ticker_scores_to_columns(scores))
+    table = pa.ipc.open_stream(io.BytesIO(response.body)).read_all()
+
+    assert set(table.column_names) == set(rows[0])
+    assert table.schema.field('created_at').type.tz is not None
+    for name in table.column_names:
+        values = table.column(name).to_pylist()
+        if name == 'created_at':
+            assert values == [parse_time(row[name]) for row in rows]
+        elif name == 'score_date':
+            assert [value.isoformat() for value in values] == [row[name] for row in rows]
+        else:
+            assert values == [row[name] for row in rows]
+
+def test_float64_columns_match_json(db):
+    scores, rows = stored_json(db)
+    response = float64_buffers_response(ticker_scores_to_float64_columns(scores))
+    names = response.headers['X-Columns'].split(',')
+    count = int(response.headers['X-Row-Count'])
+    body = np.frombuffer(response.body, dtype='<f8').reshape(len(names), count)
+
+    assert count == len(rows)
+    assert {'id', 'long_score', 'short_score', 'current_price', 'created_at'} <= set(names)
+    for name, values in zip(names, body):
+        if name == 'created_at':
+            expected = [parse_time(row[name]).timestamp() for row in rows]
+        else:
+            expected = [np.nan if row[name] is None else float(row[name]) for row in rows]
+        np.testing.assert_array_equal(values, expected)
+
+def test_naive_created_at_is_utc(db):
+    scores, _ = stored_json(db)
+    # SQLite hands created_at back naive; both layouts still mean UTC.
+    assert scores[0].created_at.tzinfo is None
+    assert ticker_scores_to_columns(scores)['created_at'][0] == datetime(2024, 5, 1, 15, 0, tzinfo=timezone.utc)
+    assert ticker_scores_to_float64_columns(scores)['created_at'][0] == datetime(2024, 5, 1, 15, 0, tzinfo=timezone.utc).timestamp()
+
+def test_empty_result_keeps_the_projection_columns():
+    assert list(ticker_scores_to_columns([])) == [column.name for column in LatestTickerScore.__table__.columns]
+    assert all(values == [] for values in ticker_scores_to_float64_columns([]).values())
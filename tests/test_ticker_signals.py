@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pandas_ta')
+
+from services.ticker import (
+    calculate_rsi_exit_signals, calculate_rsi_exit_signals_reference,
+    calculate_yellow_cross_signals, calculate_yellow_cross_signals_reference,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+CASES = ['calm', 'volatile', 'trending', 'short']
+
+def _load(name):
+    return np.load(os.path.join(FIXTURES, name))
+
+def _frame(fixture, case):
+    return pd.DataFrame({
+        'Close': fixture[f'{case}.close'],
+        'Open': fixture[f'{case}.open'],
+        'RSI': fixture[f'{case}.rsi'],
+        'MACDh_12_26_9': fixture[f'{case}.macdh'],
+    }, index=pd.date_range('2024-01-02 14:30', periods=len(fixture[f'{case}.close']), freq='15min', tz='UTC'))
+
+@pytest.mark.parametrize('case', CASES)
+def test_yellow_cross_matches_recorded_loop(case):
+    fixture = _load('yellow_cross_signals.npz')
+    data = calculate_yellow_cross_signals(_frame(fixture, case))
+    for column in ('upperVwapCrossYellow', 'lowerVwapCrossYellow'):
+        assert data[column].dtype == bool
+        np.testing.assert_array_equal(data[column].to_numpy(), fixture[f'{case}.{column}'])
+
+def test_yellow_cross_reference_reproduces_recording():
+    fixture = _load('yellow_cross_signals.npz')
+    data = calculate_yellow_cross_signals_reference(_frame(fixture, 'volatile'))
+    for column in ('upperVwapCrossYellow', 'lowerVwapCrossYellow'):
+        np.testing.assert_array_equal(data[column].to_numpy(dtype=bool), fixture[f'volatile.{column}'])
+
+def test_yellow_cross_random_inputs_match_reference():
+    # Coarse RSI/price grids so ties and long latches are common.
+    rng = np.random.default_rng(7)
+    for bars in (1, 2, 300):
+        data = pd.DataFrame({
+            'Close': rng.integers(0, 3, bars).astype(float),
+            'Open': rng.integers(0, 3, bars).astype(float),
+            'RSI': rng.choice([np.nan, 20.0, 50.0, 80.0], bars),
+            'MACDh_12_26_9': rng.choice([np.nan, -1.0, 0.0, 1.0], bars),
+        })
+        expected = calculate_yellow_cross_signals_reference(data.copy())
+        actual = calculate_yellow_cross_signals(data.copy())
+        for column in ('upperVwapCrossYellow', 'lowerVwapCrossYellow'):
+            np.testing.assert_array_equal(actual[column].to_numpy(dtype=bool), expected[column].to_numpy(dtype=bool))
+
+@pytest.mark.parametrize('case', CASES)
+def test_rsi_exit_matches_recorded_loop(case):
+    fixture = _load('rsi_exit_signals.npz')
+    data = calculate_rsi_exit_signals(_frame(fixture, case))
+    for column in ('upperRsiOverbought', 'lowerRsiOversold'):
+        assert data[column].dtype == np.int8
+        np.testing.assert_array_equal(data[column].to_numpy(), fixture[f'{case}.{column}'])
+
+def test_rsi_exit_random_inputs_match_reference():
+    rng = np.random.default_rng(11)
+    for bars in (1, 2, 300):
+        data = pd.DataFrame({
+            'Close': rng.integers(0, 3, bars).astype(float),
+            'Open': rng.integers(0, 3, bars).astype(float),
+            'RSI': rng.choice([np.nan, 20.0, 50.0, 80.0], bars),
+            'MACDh_12_26_9': rng.choice([np.nan, -1.0, 0.0, 1.0], bars),
+        })
+        expected = calculate_rsi_exit_signals_reference(data.copy())
+        actual = calculate_rsi_exit_signals(data.copy())
+        for column in ('upperRsiOverbought', 'lowerRsiOversold', 'restup', 'resetlow'):
+            np.testing.assert_array_equal(actual[column].to_numpy(), expected[column].to_numpy())
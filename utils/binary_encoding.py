@@ -0,0 +1,46 @@
+import numpy as np
+import pyarrow as pa # type: ignore
+from fastapi import Response
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+FLOAT64_BUFFERS = 'application/octet-stream'
+
+def negotiate_binary(accept):
+    # First binary layout named in the Accept header, or None for JSON.
+    for part in (accept or '').split(','):
+        media_type = part.split(';')[0].strip().lower()
+        if media_type in (ARROW_STREAM, FLOAT64_BUFFERS):
+            return media_type
+    return None
+
+def arrow_response(columns, dictionaries=None):
+    # dictionaries maps a column of integer codes to its labels, so the column
+    # goes out as an Arrow dictionary array instead of repeated strings.
+    dictionaries = dictionaries or {}
+    arrays = {}
+    for name, values in columns.items():
+        if name in dictionaries:
+            arrays[name] = pa.DictionaryArray.from_arrays(pa.array(values), pa.array(dictionaries[name]))
+        else:
+            arrays[name] = pa.array(values)
+    table = pa.table(arrays)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM)
+
+def float64_buffers_response(columns, headers=None):
+    # Body is every column as little-endian float64, one after another in the
+    # order listed in X-Columns, each X-Row-Count values long.
+    names = list(columns)
+    row_count = len(columns[names[0]]) if names else 0
+    body = np.empty((len(names), row_count), dtype='<f8')
+    for row, name in zip(body, names):
+        row[:] = columns[name]
+
+    return Response(
+        content=body.tobytes(),
+        media_type=FLOAT64_BUFFERS,
+        headers={'X-Columns': ','.join(names), 'X-Row-Count': str(row_count), **(headers or {})}
+    )
@@ -0,0 +1,125 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils.metrics import metrics
+
+# Where async endpoints send blocking work so the event loop (and /health, /ws)
+# keeps running: run_cpu() for pandas-heavy work on a process pool, run_io() for
+# network, database and other blocking calls on a bounded thread pool. Work sent
+# to run_cpu must be a module-level function with picklable arguments.
+CPU_WORKERS = int(os.environ.get('EXECUTOR_CPU_WORKERS', str(min(4, os.cpu_count() or 1))))
+IO_WORKERS = int(os.environ.get('EXECUTOR_IO_WORKERS', '16'))
+
+class _Pool:
+    def __init__(self, name, workers, factory):
+        self.name = name
+        self.workers = workers
+        self.factory = factory
+        self.executor = None
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def _get(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = self.factory(self.workers)
+            return self.executor
+
+    def _track(self, delta):
+        with self.lock:
+            self.in_flight += delta
+            in_flight = self.in_flight
+        metrics.set_gauge(f'executor.{self.name}.in_flight', in_flight)
+        metrics.set_gauge(f'executor.{self.name}.queued', max(0, in_flight - self.workers))
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        self._track(1)
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._get(), functools.partial(fn, *args, **kwargs))
+        finally:
+            self._track(-1)
+            metrics.observe(f'executor.{self.name}.seconds', time.perf_counter() - started)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def _spawn_pool(workers):
+    # spawn rather than fork: the parent has live threads (scheduler, caches,
+    # DB pool) that a forked child would inherit in whatever state they were in.
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+_cpu = _Pool('cpu', CPU_WORKERS, _spawn_pool)
+_io = _Pool('io', IO_WORKERS, lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix='io'))
+# name -> _Pool from process_pool()
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+async def run_cpu(fn, *args, **kwargs):
+    return await _cpu.run(fn, *args, **kwargs)
+
+async def run_io(fn, *args, **kwargs):
+    return await _io.run(fn, *args, **kwargs)
+
+def process_pool(name, workers):
+    # A spawn process pool of `workers` for code that fans out on its own (the
+    # parallel scoring run), started on first use and kept for the next run in
+    # this process. A different worker count, or a pool left broken by a dead
+    # worker, gets a new one. shutdown_executors() closes them.
+    with _process_pools_lock:
+        pool = _process_pools.get(name)
+        if pool is not None and (pool.workers != workers or getattr(pool.executor, '_broken', False)):
+            pool.shutdown()
+            pool = None
+        if pool is None:
+            pool = _process_pools[name] = _Pool(name, workers, _spawn_pool)
+    return pool._get()
+
+def shutdown_executors():
+    _cpu.shutdown()
+    _io.shutdown()
+    with _process_pools_lock:
+        pools = list(_process_pools.values())
+        _process_pools.clear()
+    for pool in pools:
+        pool.shutdown()
+
+class EndpointLimit:
+    # async with EndpointLimit(...): at most `limit` requests of one endpoint run
+    # at once; the rest wait their turn. Waiting and active counts are gauges.
+    def __init__(self, name, limit):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.active = 0
+
+    def _report(self):
+        metrics.set_gauge(f'endpoint.{self.name}.waiting', self.waiting)
+        metrics.set_gauge(f'endpoint.{self.name}.active', self.active)
+
+    async def __aenter__(self):
+        self.waiting += 1
+        self._report()
+        started = time.perf_counter()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self._report()
+        metrics.observe(f'endpoint.{self.name}.wait_seconds', time.perf_counter() - started)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.active -= 1
+        self.semaphore.release()
+        self._report()
+        return False
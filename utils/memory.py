@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import tracemalloc
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; RSS figures come back as None there.
+    resource = None
+
+# tracemalloc is process-wide: the first probe in starts it (unless something
+# else already had), the last one out stops it.
+_tracing_lock = threading.Lock()
+_tracing_probes = 0
+_tracing_owned = False
+
+def _start_tracing():
+    global _tracing_probes, _tracing_owned
+    with _tracing_lock:
+        if _tracing_probes == 0:
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start()
+            # Overlapping probes share the peak, so only a probe running
+            # alone resets it.
+            tracemalloc.reset_peak()
+        _tracing_probes += 1
+        return tracemalloc.get_traced_memory()[0]
+
+def _stop_tracing():
+    global _tracing_probes
+    with _tracing_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        _tracing_probes -= 1
+        if _tracing_probes == 0 and _tracing_owned:
+            tracemalloc.stop()
+        return peak
+
+def frame_memory_report(data):
+    usage = data.memory_usage(deep=True)
+    return {
+        'rows': len(data),
+        'total_bytes': int(usage.sum()),
+        'columns': {str(name): int(size) for name, size in usage.items()},
+        'dtypes': {str(name): str(dtype) for name, dtype in data.dtypes.items()},
+    }
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class MemoryProbe:
+    # Wrap one request's work in `with MemoryProbe() as probe:` and read
+    # probe.report() afterwards. Peak RSS is the process high-water mark, so
+    # peak_rss_growth is only how far this request pushed it; traced_peak_bytes
+    # is the request's own peak of Python and NumPy allocations, or, when
+    # requests overlap, the peak of everything traced while they ran.
+    def __init__(self, trace=True):
+        self.trace = trace
+        self.before = {}
+        self.after = {}
+
+    def __enter__(self):
+        if self.trace:
+            self.traced_start = _start_tracing()
+        self.before = {'rss': current_rss_bytes(), 'peak_rss': peak_rss_bytes()}
+        return self
+
+    def __exit__(self, *exc):
+        self.after = {'rss': current_rss_bytes(), 'peak_rss': peak_rss_bytes()}
+        if self.trace:
+            self.traced_peak = max(0, _stop_tracing() - self.traced_start)
+        return False
+
+    def report(self):
+        growth = None
+        if self.before.get('peak_rss') is not None and self.after.get('peak_rss') is not None:
+            growth = self.after['peak_rss'] - self.before['peak_rss']
+        return {
+            'rss_before': self.before.get('rss'),
+            'rss_after': self.after.get('rss'),
+            'peak_rss': self.after.get('peak_rss'),
+            'peak_rss_growth': growth,
+            'traced_peak_bytes': self.traced_peak if self.trace else None,
+        }
@@ -0,0 +1,36 @@
+import threading
+from collections import defaultdict
+
+class MetricsRegistry:
+    # Process-local counters, gauges and timings, served by /api/v1/metrics.
+    # Names are dotted strings, e.g. 'single_flight.data.coalesced'.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.timings = {}
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            timing = self.timings.setdefault(name, {'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            timing['count'] += 1
+            timing['total_seconds'] += seconds
+            timing['max_seconds'] = max(timing['max_seconds'], seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'timings': {name: dict(timing) for name, timing in self.timings.items()},
+            }
+
+metrics = MetricsRegistry()
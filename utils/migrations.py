@@ -0,0 +1,152 @@
+# migrations.py
+from sqlalchemy import func, inspect, text
+from database import engine, SessionLocal
+from models.tickerScores import TickerScore
+from models.latestTickerScores import LatestTickerScore
+from services.ticker_score_crud import latest_score_row
+
+SCORE_DATE_INDEX = 'uq_ticker_scores_ticker_date'
+CREATED_AT_INDEX = 'ix_ticker_scores_created_at'
+TICKER_CREATED_AT_INDEX = 'ix_ticker_scores_ticker_created_at'
+HISTORY_INDEX = 'ix_ticker_scores_history'
+
+def _has_score_date_index(inspector):
+    names = {index['name'] for index in inspector.get_indexes('ticker_scores')}
+    names.update(constraint['name'] for constraint in inspector.get_unique_constraints('ticker_scores'))
+    return SCORE_DATE_INDEX in names
+
+def _lock_score_date(connection):
+    if connection.dialect.name == 'postgresql':
+        # Every gunicorn worker runs add_score_date at startup; one at a time.
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('ticker_scores.score_date'))"))
+
+def _duplicate_days(connection):
+    # Rows beyond the first for any ticker and day.
+    return connection.execute(text(
+        "SELECT COALESCE(SUM(n - 1), 0) FROM ("
+        "SELECT COUNT(*) AS n FROM ticker_scores GROUP BY ticker_symbol, score_date HAVING COUNT(*) > 1"
+        ") AS duplicates"
+    )).scalar()
+
+def add_score_date(bind=engine):
+    """
+    Bring a ticker_scores table created before score_date existed up to date:
+    add the column and fill it with date(created_at), the day create_ticker_score
+    has always matched rows on (the session time zone's date on PostgreSQL).
+    The unique (ticker_symbol, score_date) index bulk upserts need is added
+    when no ticker has two rows for one day; otherwise nothing is deleted here
+    and the writes stay row by row until dedupe_ticker_scores is run by hand.
+    Does nothing on an up-to-date table.
+    """
+    inspector = inspect(bind)
+    if not inspector.has_table('ticker_scores'):
+        return
+    if 'score_date' in {column['name'] for column in inspector.get_columns('ticker_scores')} and _has_score_date_index(inspector):
+        return
+
+    with bind.begin() as connection:
+        _lock_score_date(connection)
+        if 'score_date' not in {column['name'] for column in inspect(connection).get_columns('ticker_scores')}:
+            connection.execute(text("ALTER TABLE ticker_scores ADD COLUMN score_date DATE"))
+        connection.execute(text("UPDATE ticker_scores SET score_date = DATE(created_at) WHERE score_date IS NULL"))
+        duplicates = _duplicate_days(connection)
+        if duplicates:
+            print(
+                f"ticker_scores has {duplicates} extra rows for a ticker and day; run "
+                "'python -m utils.migrations dedupe_ticker_scores' to keep the newest of each "
+                "and add the unique index bulk upserts need"
+            )
+            return
+        connection.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {SCORE_DATE_INDEX} ON ticker_scores (ticker_symbol, score_date)"
+        ))
+    print("Added score_date to ticker_scores")
+
+def dedupe_ticker_scores(bind=engine):
+    """
+    One-off, run by hand after add_score_date reports duplicate days: keep the
+    newest row of each ticker and day, delete the rest and add the unique
+    (ticker_symbol, score_date) index. Returns how many rows were deleted.
+    """
+    with bind.begin() as connection:
+        _lock_score_date(connection)
+        connection.execute(text("UPDATE ticker_scores SET score_date = DATE(created_at) WHERE score_date IS NULL"))
+        deleted = connection.execute(text(
+            "DELETE FROM ticker_scores WHERE id NOT IN ("
+            "SELECT MAX(id) FROM ticker_scores GROUP BY ticker_symbol, score_date)"
+        )).rowcount
+        connection.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {SCORE_DATE_INDEX} ON ticker_scores (ticker_symbol, score_date)"
+        ))
+    print(f"Deleted {deleted} duplicate ticker_scores rows and added {SCORE_DATE_INDEX}")
+    return deleted
+
+def add_created_at_index(bind=engine):
+    """
+    Index ticker_scores.created_at so the retention job finds old rows
+    without scanning the table, and (ticker_symbol, created_at) for per-ticker
+    lookups in time order. On PostgreSQL the latter includes the history
+    columns; it replaces the plain (ticker_symbol, created_at) index
+    """
+    inspector = inspect(bind)
+    if not inspector.has_table('ticker_scores'):
+        return
+    include = " INCLUDE (long_score, short_score, is_deleted)" if bind.dialect.name == 'postgresql' else ""
+    with bind.begin() as connection:
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {CREATED_AT_INDEX} ON ticker_scores (created_at)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {HISTORY_INDEX} ON ticker_scores (ticker_symbol, created_at){include}"
+        ))
+        connection.execute(text(f"DROP INDEX IF EXISTS {TICKER_CREATED_AT_INDEX}"))
+
+def fill_latest_ticker_scores():
+    """
+    Fill latest_ticker_scores from the history the first time it exists;
+    the score writes keep it current after that
+    """
+    session = SessionLocal()
+    try:
+        if session.bind.dialect.name == 'postgresql':
+            session.execute(text("SELECT pg_advisory_xact_lock(hashtext('latest_ticker_scores'))"))
+        if session.query(LatestTickerScore).first() is not None or session.query(TickerScore).first() is None:
+            session.rollback()
+            return
+        newest = (
+            session.query(TickerScore.ticker_symbol, func.max(TickerScore.created_at).label('max_created_at'))
+            .group_by(TickerScore.ticker_symbol)
+            .subquery()
+        )
+        rows = {}
+        for score in (
+            session.query(TickerScore)
+            .join(newest, (TickerScore.ticker_symbol == newest.c.ticker_symbol) & (TickerScore.created_at == newest.c.max_created_at))
+            .order_by(TickerScore.id)
+        ):
+            rows[score.ticker_symbol] = latest_score_row(score)
+        session.bulk_insert_mappings(LatestTickerScore, list(rows.values()))
+        session.commit()
+        print(f"Filled latest_ticker_scores with {len(rows)} tickers")
+    finally:
+        session.close()
+
+def run_migrations():
+    """
+    Schema changes create_all can't make on existing tables
+    """
+    try:
+        add_score_date()
+        add_created_at_index()
+        fill_latest_ticker_scores()
+    except Exception as e:
+        print(f"Error during migrations: {e}")
+
+if __name__ == '__main__':
+    # One-off migrations that are never run at startup, e.g.
+    #   python -m utils.migrations dedupe_ticker_scores
+    import sys
+    one_off = {'dedupe_ticker_scores': dedupe_ticker_scores}
+    if len(sys.argv) != 2 or sys.argv[1] not in one_off:
+        sys.exit(f"usage: python -m utils.migrations {{{','.join(one_off)}}}")
+    one_off[sys.argv[1]]()
@@ -5,6 +5,7 @@ from models.symbols import Symbols  # Adjust import based on your project struct
 from database import engine, SessionLocal
 from sqlalchemy import inspect
 from utils.symbols import get_symbols
+from utils.migrations import run_migrations
 
 def is_database_empty(session: Session, model):
     """
@@ -47,6 +48,7 @@ def seed_database():
     # Create all tables
     from database import Base  # Import your base model
     Base.metadata.create_all(bind=engine)
+    run_migrations()
     
     # Create a session
     session = SessionLocal()
@@ -0,0 +1,47 @@
+import threading
+import time
+from utils.metrics import metrics
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    # Concurrent do() calls with the same key share one run of fn: the first
+    # caller runs it, the rest wait and get the same result (or exception).
+    # Nothing is cached once the run finishes.
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            metrics.set_gauge(f'single_flight.{self.name}.in_flight', len(self.calls))
+
+        if not leader:
+            metrics.increment(f'single_flight.{self.name}.coalesced')
+            call.done.wait()
+        else:
+            metrics.increment(f'single_flight.{self.name}.executed')
+            started = time.perf_counter()
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                    metrics.set_gauge(f'single_flight.{self.name}.in_flight', len(self.calls))
+                metrics.observe(f'single_flight.{self.name}.seconds', time.perf_counter() - started)
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
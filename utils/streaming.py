@@ -0,0 +1,28 @@
+import json
+from fastapi.encoders import jsonable_encoder
+
+NDJSON = 'application/x-ndjson'
+EVENT_STREAM = 'text/event-stream'
+
+def negotiate_stream(accept, stream=None):
+    # NDJSON or EVENT_STREAM when asked for with ?stream=ndjson|sse or in the
+    # Accept header, None for one JSON body.
+    if stream == 'ndjson':
+        return NDJSON
+    if stream == 'sse':
+        return EVENT_STREAM
+    for part in (accept or '').split(','):
+        media_type = part.split(';')[0].strip().lower()
+        if media_type in (NDJSON, EVENT_STREAM):
+            return media_type
+    return None
+
+def _dumps(value):
+    return json.dumps(jsonable_encoder(value), separators=(',', ':'), default=str)
+
+def encode_stream_item(media_type, value, event=None):
+    # One NDJSON line, or one SSE event (named `event` when given).
+    if media_type == EVENT_STREAM:
+        prefix = f'event: {event}\n' if event else ''
+        return f'{prefix}data: {_dumps(value)}\n\n'
+    return _dumps(value) + '\n'